@@ -0,0 +1,131 @@
+import contextvars
+import os
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import List, Optional, Tuple
+
+from app import geocoding, hazard_api_client, metrics
+
+
+# 住所の座標を解決する方法
+STRATEGY_CLIENT = 'client'  # Google Geocoding APIで座標を求めてからハザード情報APIを呼ぶ（2往復）
+STRATEGY_SERVER = 'server'  # ハザード情報APIに住所を渡し、サーバー側でジオコーディングする（1往復）
+STRATEGY_RACE = 'race'      # 両方を同時に行い、先に得られた結果を使う
+STRATEGIES = (STRATEGY_CLIENT, STRATEGY_SERVER, STRATEGY_RACE)
+
+# 座標をどこから得たか（メトリクスの ResolvedBy ディメンション）
+RESOLVED_BY_LOCAL = 'local'
+RESOLVED_BY_CLIENT = 'client'
+RESOLVED_BY_SERVER = 'server'
+
+
+def get_strategy() -> str:
+    """
+    環境変数ADDRESS_RESOLUTION_STRATEGYで設定された解決方法を返す（デフォルト: client）。
+    """
+    strategy = os.environ.get('ADDRESS_RESOLUTION_STRATEGY', STRATEGY_CLIENT).lower()
+    if strategy not in STRATEGIES:
+        print(f"Unknown address resolution strategy: {strategy}. Falling back to {STRATEGY_CLIENT}.")
+        return STRATEGY_CLIENT
+    return strategy
+
+
+def _resolve_on_client(address: str) -> Optional[Tuple[float, float]]:
+    with metrics.span('geocode', Strategy=STRATEGY_CLIENT):
+        return geocoding.geocode(address)
+
+
+def _resolve_on_server(
+    address: str,
+    hazard_types: Optional[List[str]],
+    precision: Optional[str]
+) -> Optional[Tuple[float, float]]:
+    """
+    ハザード情報APIの input パラメータで住所を渡し、レスポンスの座標を返す。
+    ハザード情報は get_hazard_info_by_input が解決後の座標でキャッシュに登録するため、
+    続く get_hazard_info の呼び出しはAPIを呼ばずに応答する。
+    """
+    with metrics.span('geocode_server', Strategy=STRATEGY_SERVER) as server_span:
+        try:
+            client = hazard_api_client.HazardAPIClient()
+        except ValueError as e:
+            print(f"Server-side geocoding unavailable: {e}")
+            server_span.set(Outcome='error')
+            return None
+        response = client.get_hazard_info_by_input(address, hazard_types=hazard_types, precision=precision)
+        coordinates = hazard_api_client.get_response_coordinates(response)
+        if response.get('status') == 'error' or coordinates is None:
+            server_span.set(Outcome='not_found' if response.get('status') != 'error' else 'error')
+            return None
+    return coordinates
+
+
+def _race(address: str, hazard_types: Optional[List[str]], precision: Optional[str]) -> Tuple[Optional[Tuple[float, float]], str]:
+    """
+    クライアント側とサーバー側の解決を同時に行い、先に座標が得られた方を返す。
+    先に終わった方が失敗した場合は、もう一方の完了を待つ。
+    """
+    executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='address-race')
+    # 期限やメトリクスの計測区間はContextVarで保持しているため、タスクごとにコンテキストを複製して渡す
+    futures = {
+        executor.submit(contextvars.copy_context().run, _resolve_on_client, address): RESOLVED_BY_CLIENT,
+        executor.submit(contextvars.copy_context().run, _resolve_on_server, address, hazard_types, precision): RESOLVED_BY_SERVER,
+    }
+    pending = set(futures)
+    try:
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    coordinates = future.result()
+                except Exception as e:
+                    print(f"Error resolving address on {futures[future]}: {e}")
+                    continue
+                if coordinates is not None:
+                    return coordinates, futures[future]
+        return None, RESOLVED_BY_CLIENT
+    finally:
+        # 負けた方は待たずに返す（完了すれば結果はキャッシュに登録される）
+        executor.shutdown(wait=False)
+
+
+def resolve_address(
+    address: str,
+    hazard_types: Optional[List[str]] = None,
+    precision: Optional[str] = None,
+    strategy: Optional[str] = None
+) -> Optional[Tuple[float, float]]:
+    """
+    設定された方法で住所を緯度・経度に変換する。
+    地名辞書やキャッシュで解決できる住所は、方法によらずネットワークを使わずに解決する。
+    サーバー側で解決した場合、続けて同じ hazard_types・precision で get_hazard_info を呼ぶとキャッシュから応答する。
+
+    Args:
+        address: 日本語の住所文字列
+        hazard_types: 続けて取得するハザードタイプ（サーバー側で解決する場合に使用）
+        precision: 続けて取得する検索精度（サーバー側で解決する場合に使用）
+        strategy: 'client', 'server', 'race' のいずれか。Noneの場合は環境変数から取得。
+
+    Returns:
+        (緯度, 経度) のタプル。解決できなかった場合はNone。
+    """
+    strategy = strategy or get_strategy()
+    if strategy == STRATEGY_CLIENT:
+        # 既定の方法では従来どおりジオコーディングの計測区間だけにし、リクエストごとの処理を増やさない
+        return _resolve_on_client(address)
+    with metrics.span('resolve_address', Strategy=strategy) as resolve_span:
+        coordinates = geocoding.geocode_local(address)
+        if coordinates is not None:
+            resolved_by = RESOLVED_BY_LOCAL
+        elif strategy == STRATEGY_SERVER:
+            coordinates, resolved_by = _resolve_on_server(address, hazard_types, precision), RESOLVED_BY_SERVER
+            if coordinates is None:
+                # サーバー側で解決できない・API障害の場合は、Geocoding APIで解決する
+                coordinates, resolved_by = _resolve_on_client(address), RESOLVED_BY_CLIENT
+        else:
+            coordinates, resolved_by = _race(address, hazard_types, precision)
+        if coordinates is not None and resolved_by == RESOLVED_BY_SERVER:
+            # 次回以降はクライアント側（キャッシュ）で解決できるよう、採用したサーバーの座標を登録しておく。
+            # 競争で負けたサーバー側の結果は登録しない（クライアント側の座標を上書きしないため）。
+            geocoding.prime_cache(address, coordinates)
+        resolve_span.set(ResolvedBy=resolved_by, Found=coordinates is not None)
+    return coordinates
@@ -0,0 +1,139 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+
+class TTLCache:
+    """
+    LRU方式で追い出しを行い、エントリごとに有効期限(TTL)を持つインメモリキャッシュ。
+    Lambdaのウォームコンテナ内で呼び出し間にまたがって再利用されることを想定している。
+    複数スレッドから同時に利用できるようにロックで保護している。
+    """
+
+    def __init__(
+        self,
+        maxsize: int = 512,
+        ttl: float = 3600.0,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        """
+        Args:
+            maxsize: 保持する最大エントリ数。0以下の場合はキャッシュを無効化する。
+            ttl: エントリの既定の有効期限（秒）。
+            clock: 現在時刻を返す関数（テスト用に差し替え可能）。
+        """
+        self.maxsize = int(maxsize)
+        self.ttl = float(ttl)
+        self._clock = clock
+        self._data: 'OrderedDict[Hashable, tuple[float, Any]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """
+        キャッシュから値を取得する。期限切れまたは未登録の場合はdefaultを返す。
+        """
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+
+            expires_at, value = entry
+            if expires_at <= self._clock():
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return default
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        """
+        値をキャッシュに登録する。上限を超えた場合は最も古く使われたエントリを追い出す。
+
+        Args:
+            key: キャッシュキー
+            value: 登録する値
+            ttl: このエントリの有効期限（秒）。Noneの場合は既定値を使用。
+        """
+        if self.maxsize <= 0:
+            return
+
+        expires_at = self._clock() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key: Hashable) -> None:
+        """
+        指定したキーのエントリを削除する。
+        """
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        """
+        すべてのエントリと統計情報をリセットする。
+        """
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+            self.expirations = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        ヒット・ミス数などの統計情報を返す。
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._data),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'hit_rate': (self.hits / lookups) if lookups else 0.0
+            }
+
+    def __contains__(self, key: Hashable) -> bool:
+        """
+        有効期限内のエントリがあるかどうかを返す（ヒット・ミス数には数えない）。
+        """
+        with self._lock:
+            entry = self._data.get(key)
+            return entry is not None and entry[0] > self._clock()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._data)
+
+
+def quantize_coordinates(lat: float, lon: float, grid_size: float) -> tuple[int, int]:
+    """
+    緯度経度を指定したグリッド幅にスナップし、グリッドのインデックスを返す。
+    浮動小数点の誤差でキーが揺れないよう、整数インデックスをキーとして使う。
+
+    Args:
+        lat: 緯度
+        lon: 経度
+        grid_size: グリッド幅（度）
+
+    Returns:
+        (緯度インデックス, 経度インデックス) のタプル
+    """
+    if grid_size <= 0:
+        raise ValueError("grid_size must be positive.")
+    return round(lat / grid_size), round(lon / grid_size)
@@ -0,0 +1,198 @@
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, Optional
+
+import requests
+
+from app.config import get_env_int, get_env_number
+
+
+STATE_CLOSED = 'closed'
+STATE_OPEN = 'open'
+STATE_HALF_OPEN = 'half_open'
+
+# サーキットブレーカーを適用する外部APIと、遅い呼び出しとみなす所要時間（秒）。
+# 環境変数 <NAME>_SLOW_CALL_SECONDS で上書き可能。LINEへの返信は対象外。
+CIRCUIT_BREAKER_UPSTREAMS = {
+    'hazard': ('HAZARD_API_SLOW_CALL_SECONDS', 10.0),
+    'geocoding': ('GEOCODING_API_SLOW_CALL_SECONDS', 3.0),
+}
+
+# サーキットブレーカーの設定（環境変数で上書き可能）
+CIRCUIT_WINDOW_SIZE = get_env_int('CIRCUIT_WINDOW_SIZE', 20)
+CIRCUIT_MINIMUM_CALLS = get_env_int('CIRCUIT_MINIMUM_CALLS', 5)
+CIRCUIT_FAILURE_RATE_THRESHOLD = get_env_number('CIRCUIT_FAILURE_RATE_THRESHOLD', 0.5)
+CIRCUIT_SLOW_CALL_RATE_THRESHOLD = get_env_number('CIRCUIT_SLOW_CALL_RATE_THRESHOLD', 0.8)
+CIRCUIT_OPEN_SECONDS = get_env_number('CIRCUIT_OPEN_SECONDS', 30.0)
+CIRCUIT_HALF_OPEN_MAX_CALLS = get_env_int('CIRCUIT_HALF_OPEN_MAX_CALLS', 1)
+
+
+class CircuitOpenError(requests.exceptions.RequestException):
+    """
+    サーキットが開いているため、外部APIを呼び出さずに失敗させる場合に送出される。
+    RequestExceptionのサブクラスなので、既存の通信エラーの処理でそのまま扱える。
+    """
+
+
+class CircuitBreaker:
+    """
+    外部APIごとのサーキットブレーカー。
+    直近の呼び出し（件数ベースのウィンドウ）のエラー率または遅い呼び出しの割合が閾値を超えると開き（open）、
+    一定時間は外部APIを呼ばずに即座に失敗させる。その後は試行の呼び出しだけを通し（half_open）、
+    成功すれば閉じ（closed）、失敗すれば再び開く。
+    """
+
+    def __init__(
+        self,
+        name: str,
+        slow_call_seconds: float,
+        window_size: int = CIRCUIT_WINDOW_SIZE,
+        minimum_calls: int = CIRCUIT_MINIMUM_CALLS,
+        failure_rate_threshold: float = CIRCUIT_FAILURE_RATE_THRESHOLD,
+        slow_call_rate_threshold: float = CIRCUIT_SLOW_CALL_RATE_THRESHOLD,
+        open_seconds: float = CIRCUIT_OPEN_SECONDS,
+        half_open_max_calls: int = CIRCUIT_HALF_OPEN_MAX_CALLS,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        """
+        Args:
+            name: 外部APIの識別子
+            slow_call_seconds: これ以上かかった呼び出しを遅い呼び出しとして数える（秒）
+            window_size: 判定に使う直近の呼び出し件数
+            minimum_calls: 判定を始めるのに必要な呼び出し件数
+            failure_rate_threshold: サーキットを開くエラー率（0〜1）
+            slow_call_rate_threshold: サーキットを開く遅い呼び出しの割合（0〜1）
+            open_seconds: サーキットを開いたままにする時間（秒）
+            half_open_max_calls: half_open状態で同時に通す試行の呼び出し数
+            clock: 現在時刻を返す関数（テスト用に差し替え可能）
+        """
+        self.name = name
+        self.slow_call_seconds = slow_call_seconds
+        self.minimum_calls = max(1, minimum_calls)
+        self.failure_rate_threshold = failure_rate_threshold
+        self.slow_call_rate_threshold = slow_call_rate_threshold
+        self.open_seconds = open_seconds
+        self.half_open_max_calls = max(1, half_open_max_calls)
+        self._clock = clock
+        self._lock = threading.Lock()
+        # (失敗したかどうか, 遅かったかどうか) の直近の記録
+        self._outcomes: deque = deque(maxlen=max(1, window_size))
+        self._state = STATE_CLOSED
+        self._opened_at = 0.0
+        self._half_open_calls = 0
+        self.rejected = 0
+        self.times_opened = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self) -> str:
+        if self._state == STATE_OPEN and self._clock() - self._opened_at >= self.open_seconds:
+            self._state = STATE_HALF_OPEN
+            self._half_open_calls = 0
+        return self._state
+
+    def allow_request(self) -> bool:
+        """
+        外部APIを呼び出してよいかどうかを返す。Trueを返した場合は、結果をrecord_*で必ず記録すること。
+        """
+        with self._lock:
+            state = self._current_state()
+            if state == STATE_CLOSED:
+                return True
+            if state == STATE_HALF_OPEN and self._half_open_calls < self.half_open_max_calls:
+                self._half_open_calls += 1
+                return True
+            self.rejected += 1
+            return False
+
+    def record_success(self, elapsed: float) -> None:
+        self._record(False, elapsed)
+
+    def record_failure(self, elapsed: float) -> None:
+        self._record(True, elapsed)
+
+    def _record(self, failed: bool, elapsed: float) -> None:
+        slow = elapsed >= self.slow_call_seconds
+        with self._lock:
+            state = self._current_state()
+            if state == STATE_HALF_OPEN:
+                self._half_open_calls = max(0, self._half_open_calls - 1)
+                if failed or slow:
+                    self._open()
+                else:
+                    self._state = STATE_CLOSED
+                    self._outcomes.clear()
+                return
+            if state == STATE_OPEN:
+                return
+
+            self._outcomes.append((failed, slow))
+            calls = len(self._outcomes)
+            if calls < self.minimum_calls:
+                return
+            failure_rate = sum(1 for f, _ in self._outcomes if f) / calls
+            slow_rate = sum(1 for _, s in self._outcomes if s) / calls
+            if failure_rate >= self.failure_rate_threshold or slow_rate >= self.slow_call_rate_threshold:
+                self._open()
+
+    def _open(self) -> None:
+        print(f"Circuit for {self.name} opened for {self.open_seconds}s.")
+        self._state = STATE_OPEN
+        self._opened_at = self._clock()
+        self._half_open_calls = 0
+        self._outcomes.clear()
+        self.times_opened += 1
+
+    def stats(self) -> Dict:
+        with self._lock:
+            calls = len(self._outcomes)
+            return {
+                'state': self._current_state(),
+                'window_calls': calls,
+                'failure_rate': (sum(1 for f, _ in self._outcomes if f) / calls) if calls else 0.0,
+                'slow_call_rate': (sum(1 for _, s in self._outcomes if s) / calls) if calls else 0.0,
+                'rejected': self.rejected,
+                'times_opened': self.times_opened
+            }
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(upstream: str) -> Optional[CircuitBreaker]:
+    """
+    外部APIのサーキットブレーカーを返す。対象外の外部APIの場合はNone。
+    """
+    if upstream not in CIRCUIT_BREAKER_UPSTREAMS:
+        return None
+    breaker = _breakers.get(upstream)
+    if breaker is not None:
+        return breaker
+    with _breakers_lock:
+        breaker = _breakers.get(upstream)
+        if breaker is None:
+            env_name, default = CIRCUIT_BREAKER_UPSTREAMS[upstream]
+            breaker = _breakers[upstream] = CircuitBreaker(upstream, get_env_number(env_name, default))
+        return breaker
+
+
+def get_circuit_stats() -> Dict[str, Dict]:
+    """
+    外部APIごとのサーキットの状態と統計情報を返す。
+    """
+    with _breakers_lock:
+        breakers = dict(_breakers)
+    return {upstream: breaker.stats() for upstream, breaker in breakers.items()}
+
+
+def reset_breakers() -> None:
+    """
+    すべてのサーキットブレーカーを破棄する（テスト用）。
+    """
+    with _breakers_lock:
+        _breakers.clear()
@@ -0,0 +1,29 @@
+import os
+
+
+def get_env_number(name: str, default: float) -> float:
+    """
+    環境変数から数値設定を読み込む。未設定または不正な値の場合はデフォルト値を返す。
+
+    Args:
+        name: 環境変数名
+        default: デフォルト値
+
+    Returns:
+        設定値
+    """
+    value = os.environ.get(name)
+    if value is None or value == '':
+        return default
+    try:
+        return float(value)
+    except ValueError:
+        print(f"Invalid value for {name}: {value}. Using default {default}.")
+        return default
+
+
+def get_env_int(name: str, default: int) -> int:
+    """
+    環境変数から整数設定を読み込む。未設定または不正な値の場合はデフォルト値を返す。
+    """
+    return int(get_env_number(name, default))
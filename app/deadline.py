@@ -0,0 +1,105 @@
+import contextvars
+import time
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+from app.config import get_env_number
+
+
+# LINEへの返信のために残しておく時間（秒）
+DEADLINE_REPLY_RESERVE_SECONDS = get_env_number('DEADLINE_REPLY_RESERVE_SECONDS', 2.0)
+# LINEへの返信後、Lambdaが応答を返すために残しておく時間（秒）
+DEADLINE_SAFETY_MARGIN_SECONDS = get_env_number('DEADLINE_SAFETY_MARGIN_SECONDS', 0.2)
+# これより短いタイムアウトしか割り当てられない場合は外部APIを呼び出さない
+DEADLINE_MIN_TIMEOUT_SECONDS = get_env_number('DEADLINE_MIN_TIMEOUT_SECONDS', 0.5)
+
+TIMEOUT_MESSAGE = "時間内にハザード情報を取得できませんでした。しばらくしてから再度お試しください。"
+
+
+class DeadlineExceeded(Exception):
+    """
+    リクエストの残り時間が不足し、外部APIを呼び出せない場合に送出される。
+    """
+
+
+# リクエストの期限（time.monotonic基準の絶対時刻）。Noneの場合は期限なし。
+_deadline: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar('request_deadline', default=None)
+
+
+@contextmanager
+def request_deadline(context) -> Iterator[Optional[float]]:
+    """
+    Lambdaのcontextから残り時間を取得し、ブロック内のリクエスト期限として設定する。
+    contextがNoneまたはget_remaining_time_in_millisを持たない場合は期限を設定しない。
+
+    Args:
+        context: AWS Lambdaのコンテキストオブジェクト
+    """
+    deadline = None
+    get_remaining = getattr(context, 'get_remaining_time_in_millis', None)
+    if callable(get_remaining):
+        deadline = time.monotonic() + get_remaining() / 1000
+    token = _deadline.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _deadline.reset(token)
+
+
+@contextmanager
+def time_budget(seconds: float) -> Iterator[float]:
+    """
+    ブロック内のリクエスト期限を、現在から指定した秒数後に設定する（Lambdaのcontextがない初期化処理などで使用）。
+
+    Args:
+        seconds: 期限までの秒数
+    """
+    deadline = time.monotonic() + seconds
+    token = _deadline.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _deadline.reset(token)
+
+
+def remaining() -> Optional[float]:
+    """
+    リクエスト期限までの残り秒数を返す。期限が設定されていない場合はNone。
+    """
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+def timeout_for(default: float, reserve: Optional[float] = None) -> float:
+    """
+    外部API呼び出しに割り当てるタイムアウトを返す。
+    min(既定のタイムアウト, 残り時間 - 予備時間) を使い、足りない場合はDeadlineExceededを送出する。
+
+    Args:
+        default: 外部APIごとの既定のタイムアウト（秒）
+        reserve: 後続処理のために残しておく時間（秒）。Noneの場合はLINE返信用の予備時間。
+
+    Returns:
+        タイムアウト秒数
+    """
+    left = remaining()
+    if left is None:
+        return default
+
+    budget = left - (DEADLINE_REPLY_RESERVE_SECONDS if reserve is None else reserve)
+    if budget < DEADLINE_MIN_TIMEOUT_SECONDS:
+        raise DeadlineExceeded(f"Request deadline exceeded ({left:.2f}s left)")
+    return min(default, budget)
+
+
+def is_exhausted(reserve: Optional[float] = None) -> bool:
+    """
+    予備時間を除いた残り時間が、外部API呼び出しの最小タイムアウトを下回っているかどうかを返す。
+    """
+    left = remaining()
+    if left is None:
+        return False
+    budget = left - (DEADLINE_REPLY_RESERVE_SECONDS if reserve is None else reserve)
+    return budget < DEADLINE_MIN_TIMEOUT_SECONDS
@@ -1,5 +1,13 @@
 import math
-from typing import Dict, Any, Optional
+import time
+from typing import Dict, Any, Iterable, Optional
+
+from app.hazard_spec import HAZARD_SPECS, KIND_LANDSLIDE, KIND_PROBABILITY, LANDSLIDE_SUB_KEYS, HazardSpec
+
+
+# 並行取得で期限までに得られなかった項目の表示
+PENDING_MARKER = '取得中'
+FAILED_MARKER = '取得失敗'
 
 
 def _format_jshis_probability(prob_value: Optional[float]) -> str:
@@ -16,15 +24,24 @@ def _format_jshis_probability(prob_value: Optional[float]) -> str:
     return 'データなし'
 
 
-def _format_hazard_output_string(max_val: Any, center_val: Any, no_data_str: str = 'データなし') -> str:
+def _format_hazard_output_string(
+    max_val: Any,
+    center_val: Any,
+    no_data_str: str = 'データなし',
+    show_center: bool = True
+) -> str:
     """
     ハザード情報の最大値と中心点の値をフォーマットして返す。
     max_val, center_valは既にフォーマット済みの文字列、またはNone/データなし相当の値。
+    show_centerがFalseの場合は最大値のみ表示する（スナップショットの近似値など）。
     """
     # max_valとcenter_valがNoneの場合を考慮
     max_val_display = max_val if max_val is not None else no_data_str
     center_val_display = center_val if center_val is not None else no_data_str
 
+    if not show_center:
+        return no_data_str if max_val_display == no_data_str else f" 周辺100mの最大: {max_val_display}"
+
     if max_val_display == no_data_str and center_val_display == no_data_str:
         return no_data_str
     
@@ -32,115 +49,161 @@ def _format_hazard_output_string(max_val: Any, center_val: Any, no_data_str: str
     return f" 周辺100mの最大: {max_val_display}\n 中心点: {center_val_display}"
 
 
-def format_all_hazard_info_for_display(hazards: Dict[str, Any]) -> Dict[str, str]:
+def _format_landslide(data: Dict[str, Any], no_data_str: str, show_center: bool = True) -> str:
+    """
+    土石流・急傾斜地・地すべりの該当区域をまとめて表示用に整形する。
     """
-    REST APIから取得したハザードデータを表示用に整形する。
+    max_descriptions = []
+    center_descriptions = []
+    for sub_key in LANDSLIDE_SUB_KEYS:
+        sub_data = data.get(sub_key) or {}
+        max_info = sub_data.get('max_info')
+        if max_info and max_info != '該当なし':
+            max_descriptions.append(max_info)
+        center_info = sub_data.get('center_info')
+        if center_info and center_info != '該当なし':
+            center_descriptions.append(center_info)
+
+    max_str = ", ".join(max_descriptions) if max_descriptions else no_data_str
+    center_str = ", ".join(center_descriptions) if center_descriptions else no_data_str
+    return _format_hazard_output_string(max_str, center_str, no_data_str, show_center)
+
+
+def _format_entry(spec: HazardSpec, data: Dict[str, Any], show_center: bool = True) -> str:
     """
+    定義表の1項目を表示用の文字列に整形する。
+    REST APIのレスポンスと旧フォーマットは項目内の構造が同じため、どちらのデータも扱える。
+    """
+    if spec.kind == KIND_PROBABILITY:
+        return _format_hazard_output_string(
+            _format_jshis_probability(data.get('max_prob')),
+            _format_jshis_probability(data.get('center_prob')),
+            spec.no_data,
+            show_center
+        )
+    if spec.kind == KIND_LANDSLIDE:
+        return _format_landslide(data, spec.no_data, show_center)
+    return _format_hazard_output_string(data.get('max_info'), data.get('center_info'), spec.no_data, show_center)
+
+
+def _format_hazards(
+    hazards: Dict[str, Any],
+    use_api_keys: bool,
+    hazard_types: Optional[Iterable[str]] = None,
+    partial: Optional[Dict[str, Iterable[str]]] = None,
+    show_center: bool = True
+) -> Dict[str, str]:
+    selected = set(hazard_types) if hazard_types else None
+    # 得られなかった項目は「データなし」と誤解されないよう、取得中・取得失敗と表示する
+    markers = {}
+    if partial:
+        markers.update((hazard_type, FAILED_MARKER) for hazard_type in partial.get('failed') or ())
+        markers.update((hazard_type, PENDING_MARKER) for hazard_type in partial.get('pending') or ())
     display_info = {}
+    for spec in HAZARD_SPECS:
+        if selected is not None and spec.hazard_type not in selected:
+            continue
+        if markers and spec.hazard_type in markers:
+            display_info[spec.label] = markers[spec.hazard_type]
+            continue
+        data = hazards.get(spec.api_key if use_api_keys else spec.legacy_key) or {}
+        if not data and not spec.always_show:
+            continue
+        display_info[spec.label] = _format_entry(spec, data, show_center)
+    return display_info
+
+
+def format_api_response_for_display(
+    api_response: Dict[str, Any],
+    hazard_types: Optional[Iterable[str]] = None
+) -> Dict[str, str]:
+    """
+    REST APIのレスポンスを、旧フォーマットへの変換を経ずに1回の走査で表示用に整形する。
 
-    # 地震発生確率
-    prob_50_data = hazards.get('jshis_prob_50', {})
-    prob_50_str = _format_hazard_output_string(
-        _format_jshis_probability(prob_50_data.get('max_prob')),
-        _format_jshis_probability(prob_50_data.get('center_prob'))
-    )
-    display_info['30年以内に震度5強以上の地震が起こる確率'] = prob_50_str
+    Args:
+        api_response: REST APIからのレスポンス
+        hazard_types: 表示するハザードタイプ。Noneの場合はすべての項目を表示する。
 
-    prob_60_data = hazards.get('jshis_prob_60', {})
-    prob_60_str = _format_hazard_output_string(
-        _format_jshis_probability(prob_60_data.get('max_prob')),
-        _format_jshis_probability(prob_60_data.get('center_prob'))
-    )
-    display_info['30年以内に震度6強以上の地震が起こる確率'] = prob_60_str
-
-    # 想定最大浸水深
-    inundation_data = hazards.get('inundation_depth', {})
-    display_info['想定最大浸水深'] = _format_hazard_output_string(
-        inundation_data.get('max_info'),
-        inundation_data.get('center_info'),
-        no_data_str="浸水なし"
+    Returns:
+        表示ラベルをキー、表示文字列を値とする辞書（表示順）。
+        並行取得で得られなかった項目（partial）は「取得中」「取得失敗」と表示する。
+        スナップショットによる近似値の場合は、中心点の値を表示しない。
+    """
+    if api_response.get('status') == 'error':
+        return _format_hazards({}, use_api_keys=True, hazard_types=hazard_types)
+    return _format_hazards(
+        api_response.get('hazard_info') or {}, use_api_keys=True, hazard_types=hazard_types,
+        partial=api_response.get('partial'), show_center=not api_response.get('snapshot')
     )
 
-    # 津波浸水想定
-    tsunami_data = hazards.get('tsunami_inundation', {})
-    display_info['津波浸水想定'] = _format_hazard_output_string(
-        tsunami_data.get('max_info'),
-        tsunami_data.get('center_info'),
-        no_data_str="浸水想定なし"
-    )
 
-    # 高潮浸水想定
-    hightide_data = hazards.get('hightide_inundation', {})
-    display_info['高潮浸水想定'] = _format_hazard_output_string(
-        hightide_data.get('max_info'),
-        hightide_data.get('center_info'),
-        no_data_str="浸水想定なし"
-    )
+def format_all_hazard_info_for_display(
+    hazards: Dict[str, Any],
+    hazard_types: Optional[Iterable[str]] = None
+) -> Dict[str, str]:
+    """
+    旧フォーマット（convert_api_response_to_legacy_formatの出力）のハザードデータを表示用に整形する。
+    hazard_typesを指定した場合は、そのハザードタイプの項目だけを表示する。
+    """
+    return _format_hazards(hazards, use_api_keys=False, hazard_types=hazard_types)
 
-    # 大規模盛土造成地
-    large_fill_land_data = hazards.get('large_fill_land', {})
-    if large_fill_land_data:
-        display_info['大規模盛土造成地'] = _format_hazard_output_string(
-            large_fill_land_data.get("max_info"),
-            large_fill_land_data.get("center_info"),
-            no_data_str="該当なし")
-
-    # 浸水継続時間
-    flood_keizoku_data = hazards.get('flood_keizoku', {})
-    if flood_keizoku_data:
-        display_info['浸水継続時間'] = _format_hazard_output_string(
-            flood_keizoku_data.get('max_info'),
-            flood_keizoku_data.get('center_info'),
-            no_data_str="浸水想定なし"
-        )
 
-    # 家屋倒壊等氾濫想定区域
-    kaokutoukai_data = hazards.get('kaokutoukai_hanran', {})
-    if kaokutoukai_data:
-        display_info['家屋倒壊等氾濫想定区域'] = _format_hazard_output_string(
-            kaokutoukai_data.get('max_info'),
-            kaokutoukai_data.get('center_info'),
-            no_data_str="該当なし"
-        )
+def _format_age(seconds: float) -> str:
+    if seconds < 60 * 60:
+        return f"{max(1, int(seconds // 60))}分"
+    if seconds < 24 * 60 * 60:
+        return f"{int(seconds // (60 * 60))}時間"
+    return f"{int(seconds // (24 * 60 * 60))}日"
 
-    # 雪崩危険箇所
-    avalanche_data = hazards.get('avalanche', {})
-    if avalanche_data:
-        display_info['雪崩危険箇所'] = _format_hazard_output_string(
-            avalanche_data.get('max_info'),
-            avalanche_data.get('center_info'),
-            no_data_str="該当なし"
-        )
 
-    # 土砂災害警戒・特別警戒区域
-    landslide_hazard_data = hazards.get('landslide_hazard', {})
-    max_landslide_descriptions = []
-    center_landslide_descriptions = []
-
-    # 土石流
-    debris_flow_data = landslide_hazard_data.get('debris_flow', {})
-    if debris_flow_data.get('max_info') and debris_flow_data.get('max_info') != '該当なし':
-        max_landslide_descriptions.append(debris_flow_data['max_info'])
-    if debris_flow_data.get('center_info') and debris_flow_data.get('center_info') != '該当なし':
-        center_landslide_descriptions.append(debris_flow_data['center_info'])
-
-    # 急傾斜地
-    steep_slope_data = landslide_hazard_data.get('steep_slope', {})
-    if steep_slope_data.get('max_info') and steep_slope_data.get('max_info') != '該当なし':
-        max_landslide_descriptions.append(steep_slope_data['max_info'])
-    if steep_slope_data.get('center_info') and steep_slope_data.get('center_info') != '該当なし':
-        center_landslide_descriptions.append(steep_slope_data['center_info'])
-
-    # 地すべり
-    landslide_data = landslide_hazard_data.get('landslide', {})
-    if landslide_data.get('max_info') and landslide_data.get('max_info') != '該当なし':
-        max_landslide_descriptions.append(landslide_data['max_info'])
-    if landslide_data.get('center_info') and landslide_data.get('center_info') != '該当なし':
-        center_landslide_descriptions.append(landslide_data['center_info'])
-
-    max_landslide_str = ", ".join(max_landslide_descriptions) if max_landslide_descriptions else "該当なし"
-    center_landslide_str = ", ".join(center_landslide_descriptions) if center_landslide_descriptions else "該当なし"
-
-    display_info['土砂災害警戒・特別警戒区域'] = _format_hazard_output_string(max_landslide_str, center_landslide_str, "該当なし")
-
-    return display_info
\ No newline at end of file
+def format_stale_notice(api_response: Dict[str, Any], now: Optional[float] = None) -> Optional[str]:
+    """
+    外部APIの障害時に最後に取得できた結果が返された場合、その旨の注記を返す。
+
+    Args:
+        api_response: HazardAPIClientからのレスポンス
+        now: 現在時刻（UNIX時間）。Noneの場合はtime.time()。
+
+    Returns:
+        注記の文字列。最新の結果の場合はNone。
+    """
+    stale = api_response.get('stale')
+    if not stale:
+        return None
+    age = (time.time() if now is None else now) - stale.get('fetched_at', 0)
+    return f"※ハザード情報APIに接続できないため、約{_format_age(age)}前に取得した情報を表示しています。"
+
+
+def format_partial_notice(api_response: Dict[str, Any]) -> Optional[str]:
+    """
+    並行取得で一部のハザード情報を得られなかった場合、その旨の注記を返す。
+
+    Args:
+        api_response: HazardAPIClient.get_hazard_info_fanoutからのレスポンス
+
+    Returns:
+        注記の文字列。すべて得られた場合はNone。
+    """
+    partial = api_response.get('partial')
+    if not partial or not (partial.get('pending') or partial.get('failed')):
+        return None
+    return f"※一部のハザード情報を時間内に取得できませんでした（「{PENDING_MARKER}」「{FAILED_MARKER}」の項目）。"
+
+
+def format_snapshot_notice(api_response: Dict[str, Any]) -> Optional[str]:
+    """
+    スナップショット（格子の代表点の値）から応答した場合、近似値である旨の注記を返す。
+
+    Args:
+        api_response: HazardAPIClientからのレスポンス
+
+    Returns:
+        注記の文字列。APIから取得した結果の場合はNone。
+    """
+    snapshot = api_response.get('snapshot')
+    if not snapshot:
+        return None
+    step = snapshot.get('step')
+    # 緯度1度は約111km
+    size = f"約{int(round(step * 111_000, -1))}m四方の" if step else ""
+    return f"※事前に取得した{size}格子の代表点の情報による近似のため、中心点の値は表示していません。"
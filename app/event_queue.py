@@ -0,0 +1,285 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, List, Optional
+
+from app.config import get_env_number
+
+
+# dequeueで取り出したメッセージに付ける、削除（ack）用の受信ハンドルのキー
+RECEIPT_HANDLE_KEY = '_receipt_handle'
+# SQLiteのキューで、取り出したメッセージがackされない場合に再び取り出せるようになるまでの時間（秒）
+EVENT_QUEUE_VISIBILITY_TIMEOUT_SECONDS = get_env_number('EVENT_QUEUE_VISIBILITY_TIMEOUT_SECONDS', 60.0)
+
+
+class EventQueueStats:
+    """
+    キューの投入・取り出し件数とキュー滞留時間を集計する。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.enqueued = 0
+            self.dequeued = 0
+            self.total_time_in_queue = 0.0
+            self.max_time_in_queue = 0.0
+
+    def record_enqueue(self, count: int = 1) -> None:
+        with self._lock:
+            self.enqueued += count
+
+    def record_dequeue(self, message: Dict, now: Optional[float] = None) -> float:
+        """
+        取り出したメッセージのキュー滞留時間（秒）を記録して返す。
+        """
+        now = time.time() if now is None else now
+        waited = max(now - message.get('enqueued_at', now), 0.0)
+        with self._lock:
+            self.dequeued += 1
+            self.total_time_in_queue += waited
+            self.max_time_in_queue = max(self.max_time_in_queue, waited)
+        return waited
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {
+                'enqueued': self.enqueued,
+                'dequeued': self.dequeued,
+                'avg_time_in_queue_ms': (self.total_time_in_queue / self.dequeued * 1000) if self.dequeued else 0.0,
+                'max_time_in_queue_ms': self.max_time_in_queue * 1000
+            }
+
+
+class InMemoryEventQueue:
+    """
+    プロセス内のメモリ上に保持するキュー。ローカル実行・テスト用。
+    投入したコンテナでしか取り出せないため、非同期モードのワーカーには使えない（durable=False）。
+    """
+
+    durable = False
+
+    def __init__(self):
+        self._messages = deque()
+        self._lock = threading.Lock()
+        self.stats = EventQueueStats()
+
+    def enqueue(self, message: Dict) -> None:
+        with self._lock:
+            self._messages.append(json.dumps(message, ensure_ascii=False))
+        self.stats.record_enqueue()
+
+    def dequeue(self, max_messages: int = 10) -> List[Dict]:
+        with self._lock:
+            count = min(max_messages, len(self._messages))
+            bodies = [self._messages.popleft() for _ in range(count)]
+        return [json.loads(body) for body in bodies]
+
+    def ack(self, message: Dict) -> None:
+        """
+        処理が完了したメッセージを削除する（取り出し時に削除済みのため何もしない）。
+        """
+
+    def depth(self) -> int:
+        with self._lock:
+            return len(self._messages)
+
+
+class SQLiteEventQueue:
+    """
+    SQLiteファイルに保持するキュー。複数プロセスでのローカル検証用。
+    SQSと同様に、dequeueではメッセージを削除せず可視性タイムアウトの間だけ取り出せなくし、ackで削除する。
+    処理中にワーカーが異常終了した場合は、可視性タイムアウトの経過後に再び取り出される。
+    """
+
+    durable = True
+
+    def __init__(
+        self,
+        path: str,
+        visibility_timeout: Optional[float] = None,
+        clock: Callable[[], float] = time.time
+    ):
+        """
+        Args:
+            path: SQLiteデータベースファイルのパス
+            visibility_timeout: 取り出したメッセージを再び取り出せるようになるまでの秒数。
+                Noneの場合は環境変数EVENT_QUEUE_VISIBILITY_TIMEOUT_SECONDSの値。
+            clock: 現在時刻（UNIX時間）を返す関数（テスト用）
+        """
+        self.path = path
+        self.visibility_timeout = (
+            EVENT_QUEUE_VISIBILITY_TIMEOUT_SECONDS if visibility_timeout is None else visibility_timeout
+        )
+        self._clock = clock
+        self._lock = threading.Lock()
+        self.stats = EventQueueStats()
+        self._conn = sqlite3.connect(path, timeout=10, check_same_thread=False)
+        with self._conn as conn:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS event_queue ('
+                'id INTEGER PRIMARY KEY AUTOINCREMENT, body TEXT NOT NULL, visible_at REAL NOT NULL DEFAULT 0)'
+            )
+            # 可視性タイムアウト導入前に作成されたファイルには列を追加する
+            columns = {row[1] for row in conn.execute('PRAGMA table_info(event_queue)')}
+            if 'visible_at' not in columns:
+                conn.execute('ALTER TABLE event_queue ADD COLUMN visible_at REAL NOT NULL DEFAULT 0')
+
+    def enqueue(self, message: Dict) -> None:
+        with self._lock, self._conn as conn:
+            conn.execute('INSERT INTO event_queue (body) VALUES (?)', (json.dumps(message, ensure_ascii=False),))
+        self.stats.record_enqueue()
+
+    def dequeue(self, max_messages: int = 10) -> List[Dict]:
+        now = self._clock()
+        with self._lock, self._conn as conn:
+            rows = conn.execute(
+                'SELECT id, body FROM event_queue WHERE visible_at <= ? ORDER BY id LIMIT ?', (now, max_messages)
+            ).fetchall()
+            if rows:
+                conn.executemany(
+                    'UPDATE event_queue SET visible_at = ? WHERE id = ?',
+                    [(now + self.visibility_timeout, row[0]) for row in rows]
+                )
+        messages = []
+        for row_id, body in rows:
+            message = json.loads(body)
+            message[RECEIPT_HANDLE_KEY] = row_id
+            messages.append(message)
+        return messages
+
+    def ack(self, message: Dict) -> None:
+        """
+        処理が完了したメッセージをキューから削除する。
+        """
+        row_id = message.get(RECEIPT_HANDLE_KEY)
+        if row_id is None:
+            return
+        with self._lock, self._conn as conn:
+            conn.execute('DELETE FROM event_queue WHERE id = ?', (row_id,))
+
+    def depth(self) -> int:
+        """
+        取り出せるメッセージの件数を返す（SQSのApproximateNumberOfMessagesと同様に処理中のものは含めない）。
+        """
+        with self._lock:
+            return self._conn.execute(
+                'SELECT COUNT(*) FROM event_queue WHERE visible_at <= ?', (self._clock(),)
+            ).fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class SQSEventQueue:
+    """
+    Amazon SQSを利用するキュー。本番環境用。
+    ワーカーはSQSトリガーのLambdaとして起動するか、dequeueでポーリングする。
+    dequeueではメッセージを削除せず、処理が完了したメッセージをackで削除する。
+    処理中にワーカーが異常終了した場合は、可視性タイムアウトの経過後に再配信される。
+    """
+
+    durable = True
+
+    def __init__(self, queue_url: str, client=None):
+        """
+        Args:
+            queue_url: SQSキューのURL
+            client: boto3のSQSクライアント。Noneの場合は初回利用時に生成する。
+        """
+        self.queue_url = queue_url
+        self._client = client
+        self.stats = EventQueueStats()
+
+    @property
+    def client(self):
+        if self._client is None:
+            import boto3
+            self._client = boto3.client('sqs')
+        return self._client
+
+    def enqueue(self, message: Dict) -> None:
+        self.client.send_message(QueueUrl=self.queue_url, MessageBody=json.dumps(message, ensure_ascii=False))
+        self.stats.record_enqueue()
+
+    def dequeue(self, max_messages: int = 10) -> List[Dict]:
+        response = self.client.receive_message(
+            QueueUrl=self.queue_url,
+            MaxNumberOfMessages=min(max_messages, 10),
+            WaitTimeSeconds=0
+        )
+        messages = []
+        for sqs_message in response.get('Messages', []):
+            message = json.loads(sqs_message['Body'])
+            message[RECEIPT_HANDLE_KEY] = sqs_message['ReceiptHandle']
+            messages.append(message)
+        return messages
+
+    def ack(self, message: Dict) -> None:
+        """
+        処理が完了したメッセージをキューから削除する。
+        """
+        receipt_handle = message.get(RECEIPT_HANDLE_KEY)
+        if receipt_handle:
+            self.client.delete_message(QueueUrl=self.queue_url, ReceiptHandle=receipt_handle)
+
+    def depth(self) -> int:
+        response = self.client.get_queue_attributes(
+            QueueUrl=self.queue_url,
+            AttributeNames=['ApproximateNumberOfMessages']
+        )
+        return int(response['Attributes']['ApproximateNumberOfMessages'])
+
+
+_event_queue = None
+_event_queue_lock = threading.Lock()
+
+
+def create_event_queue(backend: Optional[str] = None):
+    """
+    環境変数EVENT_QUEUE_BACKENDの設定に応じてキューを生成する。
+
+    Args:
+        backend: 'memory', 'sqlite', 'sqs' のいずれか。Noneの場合は環境変数から取得。
+
+    Returns:
+        キューのインスタンス
+    """
+    backend = backend or os.environ.get('EVENT_QUEUE_BACKEND', 'memory')
+    if backend == 'memory':
+        return InMemoryEventQueue()
+    if backend == 'sqlite':
+        return SQLiteEventQueue(os.environ.get('EVENT_QUEUE_SQLITE_PATH', '/tmp/event_queue.db'))
+    if backend == 'sqs':
+        queue_url = os.environ.get('EVENT_QUEUE_SQS_URL')
+        if not queue_url:
+            raise ValueError("EVENT_QUEUE_SQS_URL is required for the sqs backend.")
+        return SQSEventQueue(queue_url)
+    raise ValueError(f"Unknown event queue backend: {backend}")
+
+
+def get_event_queue():
+    """
+    コンテナ内で共有されるキューを返す。
+    """
+    global _event_queue
+    with _event_queue_lock:
+        if _event_queue is None:
+            _event_queue = create_event_queue()
+        return _event_queue
+
+
+def set_event_queue(queue) -> None:
+    """
+    共有キューを差し替える（テストやローカル実行用）。Noneを渡すと次回利用時に再生成する。
+    """
+    global _event_queue
+    with _event_queue_lock:
+        _event_queue = queue
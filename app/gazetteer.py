@@ -0,0 +1,212 @@
+import json
+import mmap
+import os
+import struct
+import threading
+from typing import Dict, NamedTuple, Optional
+
+
+# 地名辞書の既定パス（tools/build_gazetteer.pyで生成する）
+DEFAULT_GAZETTEER_PATH = os.path.join(os.path.dirname(__file__), 'data', 'gazetteer.bin')
+
+# ファイル形式:
+#   MAGIC (4バイト) | ヘッダー長 (uint32) | ヘッダー (JSON) |
+#   インデックス (RECORD × count, キーのバイト列の昇順) | キー文字列 (UTF-8を連結)
+MAGIC = b'GZT1'
+_HEADER_LENGTH = struct.Struct('<I')
+# キーのオフセット, キーの長さ, 緯度×10^precision, 経度×10^precision, 地名の階層
+RECORD = struct.Struct('<IHiiB')
+
+# キーの正規化方式（geocoding.canonicalize_address）の版。正規化を変えた場合は上げ、古い辞書は使わない。
+# 2: 丁目を「2丁目」として残す（番地だけの住所「2番地」が丁目の代表点に一致しないようにする）
+KEY_FORMAT = 2
+
+# 地名の階層
+LEVEL_CITY = 2   # 市区町村
+LEVEL_TOWN = 3   # 大字・町
+LEVEL_CHOME = 4  # 丁目
+
+LEVEL_NAMES = {LEVEL_CITY: 'city', LEVEL_TOWN: 'town', LEVEL_CHOME: 'chome'}
+
+
+class GazetteerMatch(NamedTuple):
+    """
+    地名辞書の検索結果。
+    """
+    lat: float
+    lon: float
+    level: int  # 地名の階層（LEVEL_*）
+    key: str    # 一致したキー（正規化済みの地名）
+
+
+class Gazetteer:
+    """
+    市区町村・大字・丁目の代表点を引く地名辞書。
+    ソート済みのキーを持つバイナリファイルをmmapで開き、二分探索で検索する。
+    ファイル全体を読み込まないため、コールドスタート時の初期化はヘッダーの読み込みだけで済む。
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        """
+        Args:
+            path: 地名辞書のパス。Noneの場合は環境変数GAZETTEER_PATHまたは既定パスを使用。
+        """
+        self.path = path or os.environ.get('GAZETTEER_PATH', DEFAULT_GAZETTEER_PATH)
+        self.header: Dict = {}
+        self._file = None
+        self._mmap = None
+        self._count = 0
+        self._index_offset = 0
+        self._keys_offset = 0
+        self._scale = 1.0
+        self._loaded = False
+        self._available = False
+        self._lock = threading.Lock()
+
+    def load(self) -> bool:
+        """
+        地名辞書をmmapで開く。開いている場合は何もしない。
+
+        Returns:
+            地名辞書が利用可能かどうか
+        """
+        if self._loaded:
+            return self._available
+
+        with self._lock:
+            if self._loaded:
+                return self._available
+            try:
+                self._file = open(self.path, 'rb')
+                self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+                if self._mmap[:len(MAGIC)] != MAGIC:
+                    raise ValueError(f"unexpected file signature {self._mmap[:len(MAGIC)]!r}")
+                header_start = len(MAGIC) + _HEADER_LENGTH.size
+                (header_length,) = _HEADER_LENGTH.unpack_from(self._mmap, len(MAGIC))
+                self.header = json.loads(self._mmap[header_start:header_start + header_length])
+                if self.header.get('key_format', 1) != KEY_FORMAT:
+                    raise ValueError(
+                        f"key format {self.header.get('key_format', 1)} is outdated (expected {KEY_FORMAT}); "
+                        "rebuild it with tools/build_gazetteer.py"
+                    )
+                self._count = self.header['count']
+                self._scale = 10 ** self.header.get('precision', 6)
+                self._index_offset = header_start + header_length
+                self._keys_offset = self._index_offset + self._count * RECORD.size
+                self._available = True
+            except FileNotFoundError:
+                print(f"Gazetteer not found: {self.path}")
+            except (ValueError, KeyError, OSError, struct.error) as e:
+                print(f"Error loading gazetteer: {e}")
+                self.close()
+            self._loaded = True
+            return self._available
+
+    def close(self) -> None:
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        self._available = False
+
+    def __len__(self) -> int:
+        return self._count if self.load() else 0
+
+    def _key_at(self, position: int) -> bytes:
+        key_offset, key_length, _, _, _ = RECORD.unpack_from(self._mmap, self._index_offset + position * RECORD.size)
+        start = self._keys_offset + key_offset
+        return self._mmap[start:start + key_length]
+
+    def lookup(self, key: str) -> Optional[GazetteerMatch]:
+        """
+        正規化済みの住所（geocoding.canonicalize_address の結果）に完全一致する地名を検索する。
+        番地まで含む住所は代表点では精度が足りないため、一致しない（呼び出し側でGoogleにフォールバックする）。
+
+        Args:
+            key: 正規化済みの住所文字列
+
+        Returns:
+            GazetteerMatch。一致する地名がない場合や地名辞書が未配置の場合はNone。
+        """
+        if not key or not self.load():
+            return None
+
+        target = key.encode('utf-8')
+        low, high = 0, self._count
+        while low < high:
+            middle = (low + high) // 2
+            if self._key_at(middle) < target:
+                low = middle + 1
+            else:
+                high = middle
+        if low >= self._count or self._key_at(low) != target:
+            return None
+
+        _, _, lat, lon, level = RECORD.unpack_from(self._mmap, self._index_offset + low * RECORD.size)
+        return GazetteerMatch(lat / self._scale, lon / self._scale, level, key)
+
+
+def write_gazetteer(path: str, entries: Dict[str, tuple], header: Dict, precision: int = 6) -> int:
+    """
+    地名辞書ファイルを書き出す。
+
+    Args:
+        path: 出力先のパス
+        entries: {正規化済みの地名: (緯度, 経度, 階層)}
+        header: ヘッダーに記録する情報（出典・バージョンなど）
+        precision: 座標を保持する小数点以下の桁数
+
+    Returns:
+        書き出した件数
+    """
+    scale = 10 ** precision
+    encoded = sorted((key.encode('utf-8'), value) for key, value in entries.items())
+    header = {**header, 'count': len(encoded), 'precision': precision, 'key_format': KEY_FORMAT}
+    header_bytes = json.dumps(header, ensure_ascii=False, sort_keys=True).encode('utf-8')
+
+    index = bytearray()
+    keys = bytearray()
+    for key, (lat, lon, level) in encoded:
+        index += RECORD.pack(len(keys), len(key), round(lat * scale), round(lon * scale), level)
+        keys += key
+
+    with open(path, 'wb') as f:
+        f.write(MAGIC)
+        f.write(_HEADER_LENGTH.pack(len(header_bytes)))
+        f.write(header_bytes)
+        f.write(index)
+        f.write(keys)
+    return len(encoded)
+
+
+_gazetteer: Optional[Gazetteer] = None
+_gazetteer_lock = threading.Lock()
+
+
+def get_gazetteer() -> Gazetteer:
+    """
+    コンテナ内で共有される地名辞書を返す。
+    """
+    global _gazetteer
+    with _gazetteer_lock:
+        if _gazetteer is None:
+            _gazetteer = Gazetteer()
+        return _gazetteer
+
+
+def set_gazetteer(gazetteer: Optional[Gazetteer]) -> None:
+    """
+    共有の地名辞書を差し替える（テスト用）。Noneを渡すと次回利用時に再生成する。
+    """
+    global _gazetteer
+    with _gazetteer_lock:
+        _gazetteer = gazetteer
+
+
+def lookup(key: str) -> Optional[GazetteerMatch]:
+    """
+    正規化済みの住所に完全一致する地名を共有の地名辞書から検索する。
+    """
+    return get_gazetteer().lookup(key)
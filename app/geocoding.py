@@ -1,6 +1,14 @@
 import os
+import re
+import threading
+import unicodedata
 import requests
 
+from app import gazetteer, http_client, metrics, pref_resolver, shared_cache
+from app.cache import TTLCache
+from app.config import get_env_int, get_env_number
+from app.singleflight import SingleFlight
+
 # 環境変数からAPIキーを取得
 API_KEY = os.environ.get('GOOGLE_API_KEY')
 
@@ -57,6 +65,123 @@ PREF_CODES = {
 
 GEOCODING_API_URL = "https://maps.googleapis.com/maps/api/geocode/json"
 
+# ジオコーディング結果キャッシュの設定（環境変数で上書き可能）
+GEOCODE_CACHE_MAX_ENTRIES = get_env_int('GEOCODE_CACHE_MAX_ENTRIES', 1024)
+GEOCODE_CACHE_TTL_SECONDS = get_env_number('GEOCODE_CACHE_TTL_SECONDS', 24 * 60 * 60)
+# ZERO_RESULTSの否定キャッシュは短めに保持する
+GEOCODE_NEGATIVE_CACHE_TTL_SECONDS = get_env_number('GEOCODE_NEGATIVE_CACHE_TTL_SECONDS', 10 * 60)
+
+# コンテナ間で共有するキャッシュ（shared_cache）での保持期間
+GEOCODE_SHARED_CACHE_TTL_SECONDS = get_env_number('GEOCODE_SHARED_CACHE_TTL_SECONDS', 7 * 24 * 60 * 60)
+
+# Geocoding APIの障害時に使う、住所ごとに最後に取得できた座標の保持期間
+GEOCODE_STALE_TTL_SECONDS = get_env_number('GEOCODE_STALE_TTL_SECONDS', 30 * 24 * 60 * 60)
+
+_geocode_cache = TTLCache(maxsize=GEOCODE_CACHE_MAX_ENTRIES, ttl=GEOCODE_CACHE_TTL_SECONDS)
+_last_known_good = TTLCache(maxsize=GEOCODE_CACHE_MAX_ENTRIES, ttl=GEOCODE_STALE_TTL_SECONDS)
+_CACHE_MISS = object()
+# 同じ住所に対する同時のジオコーディングを1回の呼び出しにまとめる
+_geocode_flight = SingleFlight()
+
+# ジオコーディングの結果の取得元
+SOURCE_GAZETTEER = 'gazetteer'
+SOURCE_CACHE = 'cache'
+SOURCE_SHARED = 'shared'
+SOURCE_GOOGLE = 'google'
+# 共有キャッシュでのキーの種類
+SHARED_CACHE_NAMESPACE = 'geocode'
+_source_counts: dict[str, int] = {}
+_source_lock = threading.Lock()
+
+# NFKC変換後も残るハイフン類（長音記号「ー」は数字に挟まれた場合のみ対象）
+_HYPHEN_PATTERN = re.compile(r'[\u2010-\u2015\u2212\uFE63\uFF0D]')
+_DIGIT_HYPHEN_PATTERN = re.compile(r'(?<=\d)ー(?=\d)')
+_KANJI_NUMBER_PATTERN = re.compile(r'([〇一二三四五六七八九十百千]+)(?=丁目|番地|番|号)')
+_BLOCK_NOTATION_PATTERN = re.compile(r'(\d+)(?:丁目|番地の?|番の?|の)(?=\d)')
+# 末尾の番地・号は、丁目などに続く番号（「2-8番」「2-8-1号」）の場合と号の場合だけ取り除く。
+# 先頭の番号の「丁目」「番地」「番」は別の場所を指すため（本町2丁目・本町2番地・本町2番）、そのまま残す。
+_TRAILING_NOTATION_PATTERN = re.compile(r'(?:(?<=-)(\d+)(?:番地|番|号)|(\d+)号)$')
+
+_KANJI_DIGITS = {'〇': 0, '一': 1, '二': 2, '三': 3, '四': 4, '五': 5, '六': 6, '七': 7, '八': 8, '九': 9}
+_KANJI_UNITS = {'十': 10, '百': 100, '千': 1000}
+
+
+def _kanji_to_number(kanji: str) -> int:
+    """
+    漢数字（例: 二十三、百五）を整数に変換する。
+    """
+    total = 0
+    current = 0
+    for char in kanji:
+        if char in _KANJI_DIGITS:
+            current = current * 10 + _KANJI_DIGITS[char]
+        else:
+            total += (current or 1) * _KANJI_UNITS[char]
+            current = 0
+    return total + current
+
+
+def canonicalize_address(address: str) -> str:
+    """
+    表記揺れを吸収したキャッシュキー用の住所文字列を返す。
+    全角・半角、空白、ハイフンの種類、丁目・番地・号の表記、漢数字の違いを正規化する。
+    例: 「西新宿二丁目８番１号」→「西新宿2-8-1」、「西新宿二丁目」→「西新宿2丁目」
+    丁目だけの住所と番地だけの住所（「本町2丁目」「本町2番地」「本町2番」）は区別する。
+
+    Args:
+        address: 日本語の住所文字列。
+
+    Returns:
+        str: 正規化された住所文字列。
+    """
+    text = unicodedata.normalize('NFKC', address)
+    text = ''.join(text.split())
+    text = _DIGIT_HYPHEN_PATTERN.sub('-', text)
+    text = _HYPHEN_PATTERN.sub('-', text)
+    text = _KANJI_NUMBER_PATTERN.sub(lambda m: str(_kanji_to_number(m.group(1))), text)
+    text = _BLOCK_NOTATION_PATTERN.sub(r'\1-', text)
+    text = _TRAILING_NOTATION_PATTERN.sub(lambda m: m.group(1) or m.group(2), text)
+    text = re.sub(r'-{2,}', '-', text)
+    return text.strip('-')
+
+
+def get_geocode_cache() -> TTLCache:
+    """
+    コンテナ内で共有されるジオコーディング結果キャッシュを返す。
+    """
+    return _geocode_cache
+
+
+def get_geocode_cache_stats() -> dict:
+    """
+    ジオコーディング結果キャッシュのヒット・ミス数などの統計情報を返す。
+    """
+    return _geocode_cache.stats()
+
+def get_last_known_good_store() -> TTLCache:
+    """
+    Geocoding APIの障害時に使う、住所ごとの最後に取得できた座標の保存先を返す。
+    """
+    return _last_known_good
+
+def get_geocode_coalescing_stats() -> dict:
+    """
+    同時リクエストの合流による実行回数・省略回数（coalesced）の統計情報を返す。
+    """
+    return _geocode_flight.stats()
+
+def prime_cache(address: str, coordinates: tuple[float, float]) -> None:
+    """
+    事前に解決済みの住所の座標をキャッシュに登録する（コンテナ初期化時の事前読み込み用）。
+
+    Args:
+        address: 住所文字列
+        coordinates: (緯度, 経度) のタプル
+    """
+    cache_key = canonicalize_address(address)
+    _geocode_cache.set(cache_key, tuple(coordinates))
+    _last_known_good.set(cache_key, tuple(coordinates))
+
 def geocode(address: str) -> tuple[float, float] | None:
     """
     住所文字列を緯度・経度に変換する（ジオコーディング）。
@@ -67,12 +192,104 @@ def geocode(address: str) -> tuple[float, float] | None:
     Returns:
         tuple[float, float] | None: (緯度, 経度) のタプル。変換失敗時はNone。
     """
+    return geocode_with_source(address)[0]
+
+def geocode_with_source(address: str) -> tuple[tuple[float, float] | None, str | None]:
+    """
+    住所文字列を緯度・経度に変換し、どこから結果を得たかを合わせて返す。
+    市区町村・町丁目までの住所はローカルの地名辞書で解決し、それ以外はGoogle Geocoding APIに問い合わせる。
+
+    Args:
+        address: 日本語の住所文字列。
+
+    Returns:
+        ((緯度, 経度) または None, 結果の取得元) のタプル。
+        取得元は 'gazetteer'（地名辞書）, 'cache'（キャッシュ）, 'shared'（コンテナ間の共有キャッシュ）,
+        'google'（Geocoding API）, 変換失敗時はNone。
+    """
+    cache_key = canonicalize_address(address)
+    match = gazetteer.lookup(cache_key)
+    if match is not None:
+        _record_source(SOURCE_GAZETTEER, GazetteerLevel=gazetteer.LEVEL_NAMES.get(match.level, str(match.level)))
+        return (match.lat, match.lon), SOURCE_GAZETTEER
+
     api_key = os.environ.get('GOOGLE_API_KEY')
     
     if not api_key:
         print("Google Geocoding API key is not configured.")
-        return None
+        return None, None
+
+    cached = _geocode_cache.get(cache_key, _CACHE_MISS)
+    if cached is not _CACHE_MISS:
+        metrics.annotate(CacheStatus='hit' if cached else 'negative_hit')
+        _record_source(SOURCE_CACHE)
+        return cached, SOURCE_CACHE if cached else None
+
+    # 正規化後の住所が同じ同時の問い合わせは、実行中の1回の呼び出しの結果を共有する
+    (result, source), shared = _geocode_flight.do(cache_key, lambda: _geocode_uncached(address, cache_key, api_key))
+    metrics.annotate(CacheStatus='coalesced' if shared else 'shared_hit' if source == SOURCE_SHARED else 'miss')
+    _record_source(source)
+    return result, source if result else None
+
+def geocode_local(address: str) -> tuple[float, float] | None:
+    """
+    ネットワークを使わずに、地名辞書とインメモリキャッシュだけで住所を緯度・経度に変換する。
 
+    Args:
+        address: 日本語の住所文字列。
+
+    Returns:
+        (緯度, 経度) のタプル。ローカルで解決できない場合（否定キャッシュを含む）はNone。
+    """
+    cache_key = canonicalize_address(address)
+    match = gazetteer.lookup(cache_key)
+    if match is not None:
+        _record_source(SOURCE_GAZETTEER, GazetteerLevel=gazetteer.LEVEL_NAMES.get(match.level, str(match.level)))
+        return match.lat, match.lon
+    # ミスをキャッシュの統計に数えないよう、エントリの有無を先に確認する
+    if cache_key in _geocode_cache:
+        cached = _geocode_cache.get(cache_key)
+        if cached:
+            metrics.annotate(CacheStatus='hit')
+            _record_source(SOURCE_CACHE)
+            return cached
+    return None
+
+def _record_source(source: str, **dimensions) -> None:
+    metrics.annotate(GeocodeSource=source, **dimensions)
+    with _source_lock:
+        _source_counts[source] = _source_counts.get(source, 0) + 1
+
+def get_geocode_source_stats() -> dict:
+    """
+    ジオコーディングの結果の取得元（地名辞書・キャッシュ・Google）ごとの件数を返す。
+    """
+    with _source_lock:
+        return dict(_source_counts)
+
+def reset_geocode_source_stats() -> None:
+    with _source_lock:
+        _source_counts.clear()
+
+def _geocode_uncached(address: str, cache_key: str, api_key: str) -> tuple[tuple[float, float] | None, str]:
+    """
+    インメモリキャッシュにない住所を、共有キャッシュ、Geocoding APIの順に解決する。
+    (結果, 取得元) のタプルを返す。
+    """
+    shared_store = shared_cache.get_shared_cache()
+    if shared_store is not None:
+        values = shared_store.get_many(SHARED_CACHE_NAMESPACE, [cache_key])
+        if cache_key in values:
+            result = tuple(values[cache_key]) if values[cache_key] else None
+            _geocode_cache.set(cache_key, result, ttl=None if result else GEOCODE_NEGATIVE_CACHE_TTL_SECONDS)
+            return result, SOURCE_SHARED
+    return _geocode_upstream(address, cache_key, api_key, shared_store), SOURCE_GOOGLE
+
+def _geocode_upstream(address: str, cache_key: str, api_key: str, shared_store=None) -> tuple[float, float] | None:
+    """
+    Geocoding APIを呼び出し、結果をキャッシュに登録する。
+    shared_storeを指定した場合は、共有キャッシュにも書き込む（バックグラウンドで書き込む）。
+    """
     params = {
         'address': address,
         'key': api_key,
@@ -80,20 +297,35 @@ def geocode(address: str) -> tuple[float, float] | None:
     }
     
     try:
-        response = requests.get(GEOCODING_API_URL, params=params, timeout=10)
+        response = http_client.request('geocoding', 'GET', GEOCODING_API_URL, params=params)
         response.raise_for_status()
         data = response.json()
         
         if data['status'] == 'OK':
             location = data['results'][0]['geometry']['location']
-            return location['lat'], location['lng']
+            result = location['lat'], location['lng']
+            _geocode_cache.set(cache_key, result)
+            _last_known_good.set(cache_key, result)
+            if shared_store is not None:
+                shared_store.put(SHARED_CACHE_NAMESPACE, cache_key, result, GEOCODE_SHARED_CACHE_TTL_SECONDS)
+            return result
         else:
             print(f"Geocoding API Error: {data['status']}")
+            # 該当なしの住所は短時間だけ否定キャッシュし、一時的なエラーはキャッシュしない
+            if data['status'] == 'ZERO_RESULTS':
+                _geocode_cache.set(cache_key, None, ttl=GEOCODE_NEGATIVE_CACHE_TTL_SECONDS)
+                if shared_store is not None:
+                    shared_store.put(SHARED_CACHE_NAMESPACE, cache_key, None, GEOCODE_NEGATIVE_CACHE_TTL_SECONDS)
             return None
             
     except requests.exceptions.RequestException as e:
         print(f"Error calling Geocoding API: {e}")
-        return None
+        # サーキットが開いている・タイムアウトしたなどの場合は、最後に取得できた座標を使う
+        # （住所の座標はほとんど変わらないため、注記は付けない）
+        stale = _last_known_good.get(cache_key)
+        if stale is not None:
+            metrics.annotate(Stale=True)
+        return stale
 
 def reverse_geocode(lat: float, lon: float) -> str | None:
     """
@@ -119,7 +351,7 @@ def reverse_geocode(lat: float, lon: float) -> str | None:
     }
 
     try:
-        response = requests.get(GEOCODING_API_URL, params=params, timeout=10)
+        response = http_client.request('geocoding', 'GET', GEOCODING_API_URL, params=params)
         response.raise_for_status()
         data = response.json()
 
@@ -145,6 +377,11 @@ def get_pref_code(lat: float, lon: float) -> str | None:
     Returns:
         str | None: 都道府県コード。取得失敗時はNone。
     """
+    # ローカルの境界データで判定できない場合（境界付近・海上など）のみ逆ジオコーディングを使う
+    pref_code = pref_resolver.resolve_pref_code(lat, lon)
+    if pref_code:
+        return pref_code
+
     address = reverse_geocode(lat, lon)
     if not address:
         return None
@@ -1,6 +1,138 @@
+import contextvars
 import os
+import time
 import requests
-from typing import Dict, Optional, List
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Dict, NamedTuple, Optional, List, Sequence, Tuple
+
+from app import deadline, hazard_grid, http_client, metrics, shared_cache
+from app.cache import TTLCache, quantize_coordinates
+from app.config import get_env_int, get_env_number
+from app.hazard_spec import HAZARD_SPECS, KIND_LANDSLIDE, KIND_PROBABILITY, LANDSLIDE_SUB_KEYS
+from app.singleflight import SingleFlight
+
+
+# ハザード情報キャッシュの設定（環境変数で上書き可能）
+HAZARD_CACHE_MAX_ENTRIES = get_env_int('HAZARD_CACHE_MAX_ENTRIES', 512)
+HAZARD_CACHE_TTL_SECONDS = get_env_number('HAZARD_CACHE_TTL_SECONDS', 6 * 60 * 60)
+# 約11m四方のグリッドにスナップしてキャッシュキーとする
+HAZARD_CACHE_GRID_DEGREES = get_env_number('HAZARD_CACHE_GRID_DEGREES', 0.0001)
+
+# コンテナ間で共有するキャッシュ（shared_cache）での保持期間
+HAZARD_SHARED_CACHE_TTL_SECONDS = get_env_number('HAZARD_SHARED_CACHE_TTL_SECONDS', 24 * 60 * 60)
+
+# 外部APIの障害時に返す、最後に取得できた結果の保持期間と件数
+HAZARD_STALE_TTL_SECONDS = get_env_number('HAZARD_STALE_TTL_SECONDS', 7 * 24 * 60 * 60)
+HAZARD_STALE_MAX_ENTRIES = get_env_int('HAZARD_STALE_MAX_ENTRIES', 2048)
+
+# 一括取得時の同時リクエスト数の上限
+HAZARD_BATCH_MAX_WORKERS = get_env_int('HAZARD_BATCH_MAX_WORKERS', 8)
+
+# ハザードタイプをグループに分けて並行に取得する場合のグループ（「;」でグループ、「,」でタイプを区切る）。
+# 「タイプ,タイプ:秒」のようにグループごとのタイムアウトを指定できる。
+DEFAULT_FANOUT_GROUPS = 'earthquake;flood,flood_keizoku,kaokutoukai_hanran;tsunami,high_tide;landslide;avalanche,large_fill_land'
+# タイムアウトを指定していないグループのタイムアウト（秒）
+HAZARD_FANOUT_GROUP_TIMEOUT_SECONDS = get_env_number('HAZARD_FANOUT_GROUP_TIMEOUT_SECONDS', 10.0)
+
+# ウォームコンテナ内で全クライアントが共有するキャッシュ
+_hazard_cache = TTLCache(maxsize=HAZARD_CACHE_MAX_ENTRIES, ttl=HAZARD_CACHE_TTL_SECONDS)
+# 地点ごとに最後に取得できた結果（取得時刻, レスポンス）。通常のキャッシュより長く保持する。
+_last_known_good = TTLCache(maxsize=HAZARD_STALE_MAX_ENTRIES, ttl=HAZARD_STALE_TTL_SECONDS)
+# 同じキャッシュキーに対する同時のAPI呼び出しを1回にまとめる
+_hazard_flight = SingleFlight()
+# 共有キャッシュでのキーの種類
+SHARED_CACHE_NAMESPACE = 'hazard'
+
+
+def get_hazard_cache() -> TTLCache:
+    """
+    コンテナ内で共有されるハザード情報キャッシュを返す。
+    """
+    return _hazard_cache
+
+
+def get_hazard_cache_stats() -> Dict:
+    """
+    ハザード情報キャッシュのヒット・ミス数などの統計情報を返す。
+    """
+    return _hazard_cache.stats()
+
+
+def get_last_known_good_store() -> TTLCache:
+    """
+    外部APIの障害時に返す、地点ごとの最後に取得できた結果の保存先を返す。
+    """
+    return _last_known_good
+
+
+def get_hazard_coalescing_stats() -> Dict:
+    """
+    同時リクエストの合流による実行回数・省略回数（coalesced）の統計情報を返す。
+    """
+    return _hazard_flight.stats()
+
+
+def make_hazard_cache_key(
+    lat: float,
+    lon: float,
+    datum: str,
+    hazard_types: Optional[List[str]],
+    precision: Optional[str] = None,
+    grid_size: Optional[float] = None
+) -> tuple:
+    """
+    座標をグリッドにスナップし、ハザードタイプ・座標系・精度と組み合わせたキャッシュキーを作る。
+    """
+    lat_index, lon_index = quantize_coordinates(lat, lon, grid_size or HAZARD_CACHE_GRID_DEGREES)
+    types_key = tuple(sorted(hazard_types)) if hazard_types else ()
+    return (lat_index, lon_index, datum, types_key, precision)
+
+
+class FanoutGroup(NamedTuple):
+    """
+    並行取得の1グループ。
+    """
+    hazard_types: Tuple[str, ...]
+    timeout: float  # このグループのリクエストのタイムアウト（秒）
+
+
+def parse_fanout_groups(spec: str, default_timeout: float = HAZARD_FANOUT_GROUP_TIMEOUT_SECONDS) -> List[FanoutGroup]:
+    """
+    「earthquake;flood,flood_keizoku:5;landslide:12」の形式のグループ指定を解析する。
+
+    Raises:
+        ValueError: タイムアウトが数値でない・正でない場合
+    """
+    groups = []
+    for part in spec.split(';'):
+        types, sep, timeout = part.partition(':')
+        hazard_types = tuple(t.strip() for t in types.split(',') if t.strip())
+        if not hazard_types:
+            continue
+        timeout_seconds = float(timeout) if sep else default_timeout
+        if timeout_seconds <= 0:
+            raise ValueError(f"fan-out group timeout must be positive: {part}")
+        groups.append(FanoutGroup(hazard_types, timeout_seconds))
+    return groups
+
+
+def is_fanout_enabled() -> bool:
+    """
+    ハザードタイプのグループごとの並行取得が有効かどうか（環境変数HAZARD_FANOUT）。
+    """
+    return os.environ.get('HAZARD_FANOUT', '').lower() in ('1', 'true', 'yes')
+
+
+def get_fanout_groups() -> List[FanoutGroup]:
+    """
+    環境変数HAZARD_FANOUT_GROUPSで設定されたグループを返す。未設定・不正な場合は既定のグループ。
+    """
+    spec = os.environ.get('HAZARD_FANOUT_GROUPS') or DEFAULT_FANOUT_GROUPS
+    try:
+        return parse_fanout_groups(spec)
+    except ValueError as e:
+        print(f"Invalid HAZARD_FANOUT_GROUPS: {e}. Using the default groups.")
+        return parse_fanout_groups(DEFAULT_FANOUT_GROUPS)
 
 
 class HazardAPIClient:
@@ -9,29 +141,35 @@ class HazardAPIClient:
     HazardInfo_RESTAPI.mdで定義された仕様に基づいてハザード情報を取得する。
     """
     
-    def __init__(self, api_url: Optional[str] = None):
+    def __init__(self, api_url: Optional[str] = None, cache: Optional[TTLCache] = None, use_snapshot: bool = True):
         """
         Args:
             api_url: ハザード情報APIのベースURL。Noneの場合は環境変数HAZARD_MAP_API_URLから取得。
+            cache: 座標ベースのレスポンスキャッシュ。Noneの場合はコンテナ共有のキャッシュを使用。
+            use_snapshot: カバー範囲内の地点を事前計算のスナップショット（hazard_grid）から返すかどうか
         """
         self.api_url = api_url or os.environ.get('HAZARD_MAP_API_URL')
         self.api_key = os.environ.get('HAZARD_MAP_API_KEY')
+        self.cache = cache if cache is not None else _hazard_cache
+        self.use_snapshot = use_snapshot
         if not self.api_url:
             raise ValueError("API URL is required. Set HAZARD_MAP_API_URL environment variable or pass api_url parameter.")
 
-    def _make_request(self, params: Dict) -> Dict:
+    def _make_request(self, params: Dict, timeout: Optional[float] = None) -> Dict:
         """
         APIへのリクエストを送信する共通メソッド。
+        timeoutがNoneの場合は外部APIごとの既定のタイムアウトを使う。
+        リクエスト期限までの残り時間が足りない場合も、呼び出し側で最後に取得できた結果を返せるようエラーレスポンスにする。
         """
         headers = {}
         if self.api_key:
             headers['x-api-key'] = self.api_key
 
         try:
-            response = requests.get(self.api_url, params=params, headers=headers, timeout=30)
+            response = http_client.request('hazard', 'GET', self.api_url, timeout=timeout, params=params, headers=headers)
             response.raise_for_status()
             return response.json()
-        except requests.exceptions.RequestException as e:
+        except (requests.exceptions.RequestException, deadline.DeadlineExceeded) as e:
             print(f"Error fetching hazard info from API: {e}")
             return self._get_error_response(str(e))
 
@@ -59,7 +197,9 @@ class HazardAPIClient:
         lat: float, 
         lon: float, 
         datum: str = 'wgs84',
-        hazard_types: Optional[List[str]] = None
+        hazard_types: Optional[List[str]] = None,
+        precision: Optional[str] = None,
+        timeout: Optional[float] = None
     ) -> Dict:
         """
         指定された座標のハザード情報を取得する。
@@ -70,6 +210,8 @@ class HazardAPIClient:
             datum: 座標系 ('wgs84' または 'tokyo')
             hazard_types: 取得するハザード情報のタイプリスト。Noneの場合はデフォルトリストを使用。
                          利用可能: earthquake, flood, flood_keizoku, kaokutoukai_hanran, tsunami, high_tide, landslide, avalanche, large_fill_land
+            precision: 検索精度 ('low' または 'high')。Noneの場合はAPIのデフォルト（low）。
+            timeout: APIリクエストのタイムアウト（秒）。Noneの場合は既定値。
         
         Returns:
             APIからのレスポンス辞書
@@ -86,21 +228,271 @@ class HazardAPIClient:
         if hazard_types:
             params['hazard_types'] = ','.join(hazard_types)
         
-        return self._make_request(params)
+        if precision:
+            params['precision'] = precision
+        
+        # 事前計算のスナップショットのカバー範囲内であれば、APIを呼ばずに返す
+        if self.use_snapshot:
+            snapshot = hazard_grid.get_hazard_grid().lookup(lat, lon, datum, hazard_types, precision)
+            if snapshot is not None:
+                metrics.annotate(CacheStatus='snapshot')
+                return snapshot
+
+        cache_key = make_hazard_cache_key(lat, lon, datum, hazard_types, precision)
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            metrics.annotate(CacheStatus='hit')
+            return cached
+
+        def fetch() -> Tuple[Dict, str]:
+            # 他のコンテナが取得した結果があれば、APIを呼ばずに使う
+            shared_store = shared_cache.get_shared_cache()
+            if shared_store is not None:
+                shared_response = shared_store.get(SHARED_CACHE_NAMESPACE, cache_key)
+                if shared_response is not None:
+                    self.cache.set(cache_key, shared_response)
+                    _last_known_good.set(cache_key, (time.time(), shared_response))
+                    return shared_response, 'shared_hit'
+
+            response = self._make_request(params, timeout)
+            # エラーレスポンスはキャッシュせず、次回の呼び出しで再取得する
+            if response.get('status') != 'error':
+                self.cache.set(cache_key, response)
+                _last_known_good.set(cache_key, (time.time(), response))
+                if shared_store is not None:
+                    shared_store.put(SHARED_CACHE_NAMESPACE, cache_key, response, HAZARD_SHARED_CACHE_TTL_SECONDS)
+                return response, 'miss'
+            # サーキットが開いている・タイムアウトしたなどの場合は、最後に取得できた結果を返す
+            return self._get_stale_response(cache_key, response), 'miss'
+
+        # 同じ地点への同時の問い合わせは、実行中の1回の呼び出しの結果を共有する
+        (response, cache_status), shared = _hazard_flight.do((self.api_url, cache_key), fetch)
+        metrics.annotate(CacheStatus='coalesced' if shared else cache_status)
+        return response
     
+    def get_hazard_info_fanout(
+        self,
+        lat: float,
+        lon: float,
+        datum: str = 'wgs84',
+        hazard_types: Optional[List[str]] = None,
+        precision: Optional[str] = None,
+        groups: Optional[List[FanoutGroup]] = None
+    ) -> Dict:
+        """
+        ハザードタイプをグループに分けて並行に取得し、hazard_info をまとめて返す。
+        グループごとにタイムアウトを設定し、1つの遅いハザードタイプで全体の応答が遅れないようにする。
+        期限までに得られなかったグループのタイプは partial に記録し、得られた分だけで応答する。
+
+        Args:
+            lat: 緯度
+            lon: 経度
+            datum: 座標系 ('wgs84' または 'tokyo')
+            hazard_types: 取得するハザード情報のタイプリスト。Noneの場合はデフォルトリストを使用。
+            precision: 検索精度 ('low' または 'high')。Noneの場合はAPIのデフォルト（low）。
+            groups: 並行取得のグループ。Noneの場合は環境変数HAZARD_FANOUT_GROUPSまたは既定のグループ。
+                    どのグループにも含まれないタイプは、まとめて1グループとして取得する。
+
+        Returns:
+            APIからのレスポンスと同じ形式の辞書。一部のグループを取得できなかった場合は
+            partial: {'pending': 期限までに応答がなかったタイプ, 'failed': 取得に失敗したタイプ} を含む。
+            すべてのグループを取得できなかった場合はエラーレスポンス。
+        """
+        if hazard_types is None:
+            hazard_types = self._get_default_hazard_types()
+
+        # スナップショットや、まとめて取得した結果（サーバー側ジオコーディングなど）があればそれを使う
+        if self.use_snapshot:
+            snapshot = hazard_grid.get_hazard_grid().lookup(lat, lon, datum, hazard_types, precision)
+            if snapshot is not None:
+                metrics.annotate(CacheStatus='snapshot')
+                return snapshot
+        cache_key = make_hazard_cache_key(lat, lon, datum, hazard_types, precision)
+        if cache_key in self.cache:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                metrics.annotate(CacheStatus='hit')
+                return cached
+
+        plan: List[FanoutGroup] = []
+        assigned = set()
+        for group in groups if groups is not None else get_fanout_groups():
+            types = tuple(t for t in group.hazard_types if t in hazard_types and t not in assigned)
+            if types:
+                plan.append(FanoutGroup(types, group.timeout))
+                assigned.update(types)
+        rest = tuple(t for t in hazard_types if t not in assigned)
+        if rest:
+            plan.append(FanoutGroup(rest, HAZARD_FANOUT_GROUP_TIMEOUT_SECONDS))
+        if len(plan) <= 1:
+            timeout = plan[0].timeout if plan else None
+            return self.get_hazard_info(lat, lon, datum, hazard_types, precision, timeout=timeout)
+
+        def fetch_group(group: FanoutGroup) -> Dict:
+            with metrics.span('hazard_group', Group='+'.join(group.hazard_types)) as group_span:
+                try:
+                    response = self.get_hazard_info(
+                        lat, lon, datum, list(group.hazard_types), precision, timeout=group.timeout
+                    )
+                except Exception as e:
+                    print(f"Error fetching hazard group {','.join(group.hazard_types)}: {e}")
+                    response = self._get_error_response(str(e))
+                group_span.set(ResponseStatus=response.get('status', 'unknown'))
+                return response
+
+        # 各グループはそれぞれのタイムアウトまで待つ（リクエスト期限がある場合は、LINE返信用の予備時間を残す）
+        started = time.monotonic()
+        left = deadline.remaining()
+        max_wait = None if left is None else max(0.0, left - deadline.DEADLINE_REPLY_RESERVE_SECONDS)
+
+        executor = ThreadPoolExecutor(max_workers=len(plan), thread_name_prefix='hazard-fanout')
+        # 期限やメトリクスの計測区間はContextVarで保持しているため、タスクごとにコンテキストを複製して渡す
+        futures = [executor.submit(contextvars.copy_context().run, fetch_group, group) for group in plan]
+        for group, future in sorted(zip(plan, futures), key=lambda item: item[0].timeout):
+            wait_seconds = group.timeout if max_wait is None else min(group.timeout, max_wait)
+            wait([future], timeout=max(0.0, started + wait_seconds - time.monotonic()))
+        done = {future for future in futures if future.done()}
+        # 間に合わなかったグループは待たずに返す（完了すれば結果はキャッシュに登録される）
+        executor.shutdown(wait=False)
+
+        merged: Optional[Dict] = None
+        pending: List[str] = []
+        failed: List[str] = []
+        errors: List[str] = []
+        stale: List[Dict] = []
+        for group, future in zip(plan, futures):
+            if future not in done:
+                pending.extend(group.hazard_types)
+                continue
+            response = future.result()
+            if response.get('status') == 'error':
+                failed.extend(group.hazard_types)
+                errors.append(str(response.get('error_message')))
+                continue
+            if merged is None:
+                merged = {**response, 'hazard_info': {}, 'requested_hazard_types': list(hazard_types)}
+                merged.pop('stale', None)
+            merged['hazard_info'].update(response.get('hazard_info') or {})
+            if response.get('stale'):
+                stale.append(response['stale'])
+
+        metrics.annotate(FanoutGroups=len(plan), Partial=bool(pending or failed))
+        if merged is None:
+            return self._get_error_response('; '.join(errors) or "Hazard info not received within the group timeouts")
+        if stale:
+            merged['stale'] = min(stale, key=lambda entry: entry.get('fetched_at', 0))
+        if pending or failed:
+            merged['partial'] = {'pending': pending, 'failed': failed}
+        return merged
+
+    def get_hazard_info_batch(
+        self,
+        points: Sequence[Tuple[float, float]],
+        datum: str = 'wgs84',
+        hazard_types: Optional[List[str]] = None,
+        max_workers: Optional[int] = None,
+        precision: Optional[str] = None
+    ) -> List[Dict]:
+        """
+        複数地点のハザード情報をまとめて取得する。
+        同一地点やキャッシュのグリッド上で同じセルに入る地点は1回だけ問い合わせ、
+        上限付きの並行数でAPIに問い合わせる。1地点の失敗でバッチ全体が中断されることはない。
+        
+        Args:
+            points: (緯度, 経度) のタプルのリスト
+            datum: 座標系 ('wgs84' または 'tokyo')
+            hazard_types: 取得するハザード情報のタイプリスト。Noneの場合はデフォルトリストを使用。
+            max_workers: 同時リクエスト数の上限。Noneの場合は環境変数HAZARD_BATCH_MAX_WORKERSを使用。
+            precision: 検索精度 ('low' または 'high')。Noneの場合はAPIのデフォルト。
+        
+        Returns:
+            入力と同じ順序の結果リスト。各要素は以下のキーを持つ辞書:
+            lat, lon, status ('success' または 'error'),
+            hazard_info (convert_api_response_to_legacy_format で変換済み), error_message
+        """
+        if hazard_types is None:
+            hazard_types = self._get_default_hazard_types()
+
+        # グリッド上で同じセルに入る地点をまとめる
+        unique_points: Dict[tuple, Tuple[float, float]] = {}
+        point_keys: List[Optional[tuple]] = []
+        invalid_messages: Dict[int, str] = {}
+        for index, point in enumerate(points):
+            try:
+                lat, lon = float(point[0]), float(point[1])
+            except (TypeError, ValueError, IndexError):
+                point_keys.append(None)
+                invalid_messages[index] = f"Invalid coordinates: {point!r}"
+                continue
+            key = make_hazard_cache_key(lat, lon, datum, hazard_types, precision)
+            unique_points.setdefault(key, (lat, lon))
+            point_keys.append(key)
+
+        def fetch(key: tuple) -> Dict:
+            lat, lon = unique_points[key]
+            try:
+                return self.get_hazard_info(lat, lon, datum=datum, hazard_types=hazard_types, precision=precision)
+            except Exception as e:
+                print(f"Error fetching hazard info for ({lat}, {lon}): {e}")
+                return self._get_error_response(str(e))
+
+        # インメモリキャッシュにない地点は、共有キャッシュからまとめて読み込んでおく
+        shared_store = shared_cache.get_shared_cache()
+        if shared_store is not None:
+            missing = [key for key in unique_points if key not in self.cache]
+            for key, response in shared_store.get_many(SHARED_CACHE_NAMESPACE, missing).items():
+                self.cache.set(key, response)
+
+        responses_by_key: Dict[tuple, Dict] = {}
+        if unique_points:
+            workers = max(1, min(max_workers or HAZARD_BATCH_MAX_WORKERS, len(unique_points)))
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                keys = list(unique_points)
+                for key, response in zip(keys, executor.map(fetch, keys)):
+                    responses_by_key[key] = response
+
+        results = []
+        for index, point in enumerate(points):
+            key = point_keys[index]
+            if key is None:
+                results.append({
+                    'lat': None,
+                    'lon': None,
+                    'status': 'error',
+                    'hazard_info': {},
+                    'error_message': invalid_messages[index]
+                })
+                continue
+
+            response = responses_by_key[key]
+            is_error = response.get('status') == 'error'
+            results.append({
+                'lat': float(point[0]),
+                'lon': float(point[1]),
+                'status': 'error' if is_error else 'success',
+                'hazard_info': convert_api_response_to_legacy_format(response),
+                'error_message': response.get('error_message') if is_error else None
+            })
+        return results
+
     def get_hazard_info_by_input(
         self, 
         input_text: str, 
         datum: str = 'wgs84',
-        hazard_types: Optional[List[str]] = None
+        hazard_types: Optional[List[str]] = None,
+        precision: Optional[str] = None,
+        timeout: Optional[float] = None
     ) -> Dict:
         """
         住所または座標文字列からハザード情報を取得する。
+        同じ入力への同時の問い合わせは、実行中の1回の呼び出しの結果を共有する。
         
         Args:
             input_text: 住所または緯度経度の文字列
             datum: 座標系 ('wgs84' または 'tokyo')
             hazard_types: 取得するハザード情報のタイプリスト。Noneの場合はデフォルトリストを使用。
+            precision: 検索精度 ('low' または 'high')。Noneの場合はAPIのデフォルト（low）。
+            timeout: タイムアウト（秒）。Noneの場合は住所の解決を兼ねるため、ジオコーディングと同じタイムアウト。
         
         Returns:
             APIからのレスポンス辞書
@@ -116,8 +508,51 @@ class HazardAPIClient:
         if hazard_types:
             params['hazard_types'] = ','.join(hazard_types)
         
-        return self._make_request(params)
+        if precision:
+            params['precision'] = precision
+        
+        if timeout is None:
+            timeout = http_client.get_timeout('geocoding')
+
+        def fetch() -> Dict:
+            response = self._make_request(params, timeout)
+            # サーバー側で解決された座標のキャッシュキーで登録し、同じ地点の get_hazard_info ではAPIを呼ばずに済むようにする
+            coordinates = get_response_coordinates(response)
+            if response.get('status') != 'error' and coordinates is not None:
+                cache_key = make_hazard_cache_key(*coordinates, datum, hazard_types, precision)
+                self.cache.set(cache_key, response)
+                _last_known_good.set(cache_key, (time.time(), response))
+                shared_store = shared_cache.get_shared_cache()
+                if shared_store is not None:
+                    shared_store.put(SHARED_CACHE_NAMESPACE, cache_key, response, HAZARD_SHARED_CACHE_TTL_SECONDS)
+            return response
+
+        flight_key = ('input', self.api_url, input_text, datum, tuple(hazard_types), precision)
+        response, shared = _hazard_flight.do(flight_key, fetch)
+        if shared:
+            metrics.annotate(CacheStatus='coalesced')
+        return response
     
+    def _get_stale_response(self, cache_key: tuple, error_response: Dict) -> Dict:
+        """
+        エラー時に、同じ地点で最後に取得できた結果を古い情報である旨を付けて返す。
+        保存された結果がない場合はエラーレスポンスをそのまま返す。
+        """
+        entry = _last_known_good.get(cache_key)
+        if entry is None:
+            return error_response
+
+        fetched_at, response = entry
+        print(f"Serving stale hazard info fetched at {fetched_at:.0f}: {error_response.get('error_message')}")
+        metrics.annotate(Stale=True)
+        return {
+            **response,
+            'stale': {
+                'fetched_at': fetched_at,
+                'error_message': error_response.get('error_message')
+            }
+        }
+
     def _get_error_response(self, error_message: str) -> Dict:
         """
         エラー時のレスポンスフォーマットを統一する。
@@ -136,9 +571,21 @@ class HazardAPIClient:
         }
 
 
+def get_response_coordinates(api_response: Dict) -> Optional[Tuple[float, float]]:
+    """
+    APIレスポンスの coordinates から (緯度, 経度) を取り出す。含まれていない場合はNone。
+    """
+    coordinates = api_response.get('coordinates') or {}
+    try:
+        return float(coordinates['latitude']), float(coordinates['longitude'])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
 def convert_api_response_to_legacy_format(api_response: Dict) -> Dict:
     """
     REST APIのレスポンスを既存のhazard_info.pyのフォーマットに変換する。
+    キーの対応はhazard_spec.HAZARD_SPECSの定義表に従う。
     
     Args:
         api_response: REST APIからのレスポンス
@@ -152,93 +599,28 @@ def convert_api_response_to_legacy_format(api_response: Dict) -> Dict:
     hazard_info = api_response.get('hazard_info', {})
     legacy_format = {}
     
-    # 地震発生確率の変換
-    jshis_50 = hazard_info.get('jshis_prob_50', {})
-    if jshis_50:
-        legacy_format['jshis_prob_50'] = {
-            'max_prob': jshis_50.get('max_prob'),
-            'center_prob': jshis_50.get('center_prob')
-        }
-    
-    jshis_60 = hazard_info.get('jshis_prob_60', {})
-    if jshis_60:
-        legacy_format['jshis_prob_60'] = {
-            'max_prob': jshis_60.get('max_prob'),
-            'center_prob': jshis_60.get('center_prob')
-        }
-    
-    # 浸水深情報の変換 (APIレスポンスキー: flood -> 旧キー: inundation_depth)
-    flood = hazard_info.get('flood', {})
-    if flood:
-        legacy_format['inundation_depth'] = {
-            'max_info': flood.get('max_info'),
-            'center_info': flood.get('center_info')
-        }
-    
-    # 浸水継続時間の変換
-    flood_keizoku = hazard_info.get('flood_keizoku', {})
-    if flood_keizoku:
-        legacy_format['flood_keizoku'] = {
-            'max_info': flood_keizoku.get('max_info'),
-            'center_info': flood_keizoku.get('center_info')
-        }
-
-    # 家屋倒壊等氾濫想定区域の変換
-    kaokutoukai = hazard_info.get('kaokutoukai_hanran', {})
-    if kaokutoukai:
-        legacy_format['kaokutoukai_hanran'] = {
-            'max_info': kaokutoukai.get('max_info'),
-            'center_info': kaokutoukai.get('center_info')
-        }
+    for spec in HAZARD_SPECS:
+        data = hazard_info.get(spec.api_key)
+        if not data:
+            continue
 
-    # 津波浸水想定の変換 (APIレスポンスキー: tsunami -> 旧キー: tsunami_inundation)
-    tsunami = hazard_info.get('tsunami', {})
-    if tsunami:
-        legacy_format['tsunami_inundation'] = {
-            'max_info': tsunami.get('max_info'),
-            'center_info': tsunami.get('center_info')
-        }
-    
-    # 高潮浸水想定の変換 (APIレスポンスキー: high_tide -> 旧キー: hightide_inundation)
-    high_tide = hazard_info.get('high_tide', {})
-    if high_tide:
-        legacy_format['hightide_inundation'] = {
-            'max_info': high_tide.get('max_info'),
-            'center_info': high_tide.get('center_info')
-        }
-    
-    # 大規模盛土造成地の変換
-    large_fill = hazard_info.get('large_fill_land', {})
-    if large_fill:
-        legacy_format['large_fill_land'] = {
-            'max_info': large_fill.get('max_info'),
-            'center_info': large_fill.get('center_info')
-        }
-    
-    # 土砂災害情報の変換 (APIレスポンスキー: landslide -> 旧キー: landslide_hazard)
-    landslide = hazard_info.get('landslide', {})
-    if landslide:
-        legacy_format['landslide_hazard'] = {
-            'debris_flow': {
-                'max_info': landslide.get('debris_flow', {}).get('max_info'),
-                'center_info': landslide.get('debris_flow', {}).get('center_info')
-            },
-            'steep_slope': {
-                'max_info': landslide.get('steep_slope', {}).get('max_info'),
-                'center_info': landslide.get('steep_slope', {}).get('center_info')
-            },
-            'landslide': {
-                'max_info': landslide.get('landslide', {}).get('max_info'),
-                'center_info': landslide.get('landslide', {}).get('center_info')
+        if spec.kind == KIND_PROBABILITY:
+            legacy_format[spec.legacy_key] = {
+                'max_prob': data.get('max_prob'),
+                'center_prob': data.get('center_prob')
+            }
+        elif spec.kind == KIND_LANDSLIDE:
+            legacy_format[spec.legacy_key] = {
+                sub_key: {
+                    'max_info': data.get(sub_key, {}).get('max_info'),
+                    'center_info': data.get(sub_key, {}).get('center_info')
+                }
+                for sub_key in LANDSLIDE_SUB_KEYS
+            }
+        else:
+            legacy_format[spec.legacy_key] = {
+                'max_info': data.get('max_info'),
+                'center_info': data.get('center_info')
             }
-        }
-    
-    # 雪崩危険箇所の変換
-    avalanche = hazard_info.get('avalanche', {})
-    if avalanche:
-        legacy_format['avalanche'] = {
-            'max_info': avalanche.get('max_info'),
-            'center_info': avalanche.get('center_info')
-        }
     
-    return legacy_format
\ No newline at end of file
+    return legacy_format
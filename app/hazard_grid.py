@@ -0,0 +1,372 @@
+import json
+import math
+import mmap
+import os
+import struct
+import threading
+from typing import Dict, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+from app.hazard_spec import HAZARD_SPECS, KIND_LANDSLIDE, KIND_PROBABILITY, LANDSLIDE_SUB_KEYS
+
+
+# ハザード情報スナップショットの既定パス（tools/build_hazard_grid.pyで生成する）
+DEFAULT_HAZARD_GRID_PATH = os.path.join(os.path.dirname(__file__), 'data', 'hazard_grid.bin')
+
+# ファイル形式:
+#   MAGIC (4バイト) | ヘッダー長 (uint32) | ヘッダー (JSON) | セルの配列 (領域ごとに行優先)
+# 各セルは uint16 × (1 + 項目数)。先頭は構築できたかどうか（1: 構築済み、0: 未構築）、
+# 続いて項目ごとの値のコード（ヘッダーの値の表の位置 + 1。0はその項目がないことを表す）。
+MAGIC = b'HZG1'
+_HEADER_LENGTH = struct.Struct('<I')
+CODE_MISSING = 0
+MAX_VALUES = 0xFFFF
+# 中心点の値はセルの代表点のものであり問い合わせ地点の値ではないため、検索結果には含めない
+CENTER_VALUE_KEYS = ('center_info', 'center_prob')
+
+
+class Region(NamedTuple):
+    """
+    スナップショットがカバーする矩形領域。セル(row, col)の代表点は南西端から(row + 0.5, col + 0.5)ステップの位置。
+    """
+    name: str
+    south: float
+    west: float
+    step: float
+    rows: int
+    cols: int
+    offset: int = 0  # ファイル先頭からのセル配列の位置（書き出し時に決まる）
+
+    def cell_index(self, lat: float, lon: float) -> Optional[Tuple[int, int]]:
+        row = math.floor((lat - self.south) / self.step)
+        col = math.floor((lon - self.west) / self.step)
+        if 0 <= row < self.rows and 0 <= col < self.cols:
+            return row, col
+        return None
+
+    def cell_center(self, row: int, col: int) -> Tuple[float, float]:
+        return (round(self.south + (row + 0.5) * self.step, 7),
+                round(self.west + (col + 0.5) * self.step, 7))
+
+
+def make_region(name: str, south: float, west: float, north: float, east: float, step: float) -> Region:
+    """
+    南西端・北東端と刻み幅（度）から領域を作る。
+    """
+    if north <= south or east <= west or step <= 0:
+        raise ValueError(f"invalid bounding box for {name}: {(south, west, north, east)} step={step}")
+    return Region(name, south, west, step, math.ceil(round((north - south) / step, 9)),
+                  math.ceil(round((east - west) / step, 9)))
+
+
+def snapshot_fields() -> List[Tuple[str, Optional[str], str]]:
+    """
+    スナップショットに保存する項目 (hazard_infoのキー, 土砂災害のサブキー, 値のキー) の一覧。
+    ハザード情報の定義表（hazard_spec.HAZARD_SPECS）から作る。
+    """
+    fields = []
+    for spec in HAZARD_SPECS:
+        value_keys = ('max_prob', 'center_prob') if spec.kind == KIND_PROBABILITY else ('max_info', 'center_info')
+        sub_keys = LANDSLIDE_SUB_KEYS if spec.kind == KIND_LANDSLIDE else (None,)
+        for sub_key in sub_keys:
+            for value_key in value_keys:
+                fields.append((spec.api_key, sub_key, value_key))
+    return fields
+
+
+class HazardGridWriter:
+    """
+    APIレスポンスを値のコードに変換してスナップショットを組み立てる。
+    """
+
+    def __init__(self, regions: Sequence[Region]):
+        self.fields = snapshot_fields()
+        self.cell = struct.Struct(f'<{1 + len(self.fields)}H')
+        self.regions = list(regions)
+        self.values: List = []
+        self._codes: Dict[str, int] = {}
+        self._cells = [bytearray(region.rows * region.cols * self.cell.size) for region in self.regions]
+
+    def _code(self, value) -> int:
+        if value is None:
+            return CODE_MISSING
+        key = json.dumps(value, ensure_ascii=False)
+        code = self._codes.get(key)
+        if code is None:
+            if len(self.values) >= MAX_VALUES - 1:
+                raise ValueError("too many distinct hazard values for a uint16 code")
+            self.values.append(value)
+            code = self._codes[key] = len(self.values)
+        return code
+
+    def set_cell(self, region_index: int, row: int, col: int, response: Dict) -> None:
+        """
+        1セル分のAPIレスポンスを書き込む。エラーレスポンスのセルは未構築のままにする（実行時はAPIにフォールバックする）。
+        """
+        if response.get('status') == 'error':
+            return
+        hazard_info = response.get('hazard_info') or {}
+        codes = []
+        for api_key, sub_key, value_key in self.fields:
+            data = hazard_info.get(api_key)
+            if sub_key is not None and isinstance(data, dict):
+                data = data.get(sub_key)
+            codes.append(self._code(data.get(value_key) if isinstance(data, dict) else None))
+        region = self.regions[region_index]
+        self.cell.pack_into(self._cells[region_index], (row * region.cols + col) * self.cell.size, 1, *codes)
+
+    def write(self, path: str, header: Dict) -> Dict:
+        """
+        スナップショットを書き出す。
+
+        Args:
+            path: 出力先のパス
+            header: ヘッダーに記録する情報（データセットのバージョンなど）
+
+        Returns:
+            書き出したヘッダー
+        """
+        regions = []
+        offset = 0
+        for region, cells in zip(self.regions, self._cells):
+            regions.append({**region._asdict(), 'offset': offset})
+            offset += len(cells)
+        header = {
+            **header,
+            'fields': [list(field) for field in self.fields],
+            'values': self.values,
+            'regions': regions,
+            'built_cells': sum(
+                1 for cells in self._cells for position in range(0, len(cells), self.cell.size) if cells[position]
+            )
+        }
+        header_bytes = json.dumps(header, ensure_ascii=False, sort_keys=True).encode('utf-8')
+        with open(path, 'wb') as f:
+            f.write(MAGIC)
+            f.write(_HEADER_LENGTH.pack(len(header_bytes)))
+            f.write(header_bytes)
+            for cells in self._cells:
+                f.write(cells)
+        return header
+
+
+def iter_cells(regions: Sequence[Region]) -> Iterator[Tuple[int, int, int, float, float]]:
+    """
+    すべてのセルの (領域の番号, 行, 列, 代表点の緯度, 代表点の経度) を返す。
+    """
+    for region_index, region in enumerate(regions):
+        for row in range(region.rows):
+            for col in range(region.cols):
+                yield (region_index, row, col) + region.cell_center(row, col)
+
+
+class HazardGrid:
+    """
+    主要な都市圏のハザード情報を格子状に事前計算したスナップショット。
+    ファイルをmmapで開き、カバー範囲内の地点はセルの位置を計算するだけで（O(1)）結果を返す。
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        """
+        Args:
+            path: スナップショットのパス。Noneの場合は環境変数HAZARD_GRID_PATHまたは既定パスを使用。
+        """
+        self.path = path or os.environ.get('HAZARD_GRID_PATH', DEFAULT_HAZARD_GRID_PATH)
+        self.header: Dict = {}
+        self.regions: List[Region] = []
+        self._file = None
+        self._mmap = None
+        self._data_offset = 0
+        self._fields: List[Tuple[str, Optional[str], str]] = []
+        self._values: List = []
+        self._cell: Optional[struct.Struct] = None
+        self._loaded = False
+        self._available = False
+        self._lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.lookups = 0
+        self.hits = 0
+        self.outside = 0
+
+    def load(self) -> bool:
+        """
+        スナップショットをmmapで開く。開いている場合は何もしない。
+
+        Returns:
+            スナップショットが利用可能かどうか
+        """
+        if self._loaded:
+            return self._available
+
+        with self._lock:
+            if self._loaded:
+                return self._available
+            try:
+                self._file = open(self.path, 'rb')
+                self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+                if self._mmap[:len(MAGIC)] != MAGIC:
+                    raise ValueError(f"unexpected file signature {self._mmap[:len(MAGIC)]!r}")
+                header_start = len(MAGIC) + _HEADER_LENGTH.size
+                (header_length,) = _HEADER_LENGTH.unpack_from(self._mmap, len(MAGIC))
+                self.header = json.loads(self._mmap[header_start:header_start + header_length])
+                self._data_offset = header_start + header_length
+                self._fields = [tuple(field) for field in self.header['fields']]
+                self._values = self.header['values']
+                self._cell = struct.Struct(f'<{1 + len(self._fields)}H')
+                self.regions = [Region(**region) for region in self.header['regions']]
+                expected = self._data_offset + sum(r.rows * r.cols for r in self.regions) * self._cell.size
+                if len(self._mmap) < expected:
+                    raise ValueError(f"truncated file ({len(self._mmap)} < {expected} bytes)")
+                self._available = True
+            except FileNotFoundError:
+                print(f"Hazard grid snapshot not found: {self.path}")
+            except (ValueError, KeyError, TypeError, OSError, struct.error) as e:
+                print(f"Error loading hazard grid snapshot: {e}")
+                self.close()
+            self._loaded = True
+            return self._available
+
+    def close(self) -> None:
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        self._available = False
+
+    def covers(self, datum: str, precision: Optional[str]) -> bool:
+        """
+        要求された座標系・検索精度がスナップショットの構築条件と同じかどうかを返す。
+        """
+        built_precision = self.header.get('precision') or 'low'
+        return datum == self.header.get('datum', 'wgs84') and (precision or 'low') == built_precision
+
+    def lookup(
+        self,
+        lat: float,
+        lon: float,
+        datum: str = 'wgs84',
+        hazard_types: Optional[List[str]] = None,
+        precision: Optional[str] = None
+    ) -> Optional[Dict]:
+        """
+        スナップショットから地点のハザード情報を取得する。
+
+        Args:
+            lat: 緯度
+            lon: 経度
+            datum: 座標系
+            hazard_types: 取得するハザード情報のタイプリスト。Noneまたは空の場合はすべて。
+            precision: 検索精度
+
+        Returns:
+            APIと同じ形式のレスポンス辞書。値はセルの代表点のものによる近似で、中心点の値は含まない。
+            カバー範囲外・未構築のセル・構築条件が異なる場合はNone。
+        """
+        if not self.load() or not self.covers(datum, precision):
+            return None
+
+        cells = None
+        for region in self.regions:
+            cell = region.cell_index(lat, lon)
+            if cell is not None:
+                row, col = cell
+                center_lat, center_lon = region.cell_center(row, col)
+                step = region.step
+                cells = self._cell.unpack_from(
+                    self._mmap, self._data_offset + region.offset + (row * region.cols + col) * self._cell.size
+                )
+                break
+
+        with self._stats_lock:
+            self.lookups += 1
+            if cells is None:
+                self.outside += 1
+            elif cells[0]:
+                self.hits += 1
+        if cells is None or not cells[0]:
+            return None
+
+        wanted = set(hazard_types) if hazard_types else None
+        api_keys = {spec.api_key for spec in HAZARD_SPECS if wanted is None or spec.hazard_type in wanted}
+        hazard_info: Dict = {}
+        for (api_key, sub_key, value_key), code in zip(self._fields, cells[1:]):
+            if code == CODE_MISSING or api_key not in api_keys or value_key in CENTER_VALUE_KEYS:
+                continue
+            target = hazard_info.setdefault(api_key, {})
+            if sub_key is not None:
+                target = target.setdefault(sub_key, {})
+            target[value_key] = self._values[code - 1]
+
+        return {
+            'coordinates': {'latitude': lat, 'longitude': lon},
+            'source': f'格子の代表点: {center_lat}, {center_lon} (入力座標系: {datum}, 刻み幅: {step}度)',
+            'input_type': 'latlon',
+            'hazard_info': hazard_info,
+            'status': 'success',
+            'snapshot': {
+                'version': self.header.get('version'),
+                'built_at': self.header.get('built_at'),
+                'approximate': True,
+                'cell_center': {'latitude': center_lat, 'longitude': center_lon},
+                'step': step
+            }
+        }
+
+    def stats(self) -> Dict:
+        """
+        カバー範囲（領域数・セル数・構築済みの割合）と、検索のヒット率を返す。
+        """
+        available = self.load()
+        cells = sum(region.rows * region.cols for region in self.regions)
+        built = self.header.get('built_cells', 0)
+        with self._stats_lock:
+            return {
+                'available': available,
+                'version': self.header.get('version'),
+                'regions': [region.name for region in self.regions],
+                'cells': cells,
+                'built_cells': built,
+                'coverage': built / cells if cells else 0.0,
+                'lookups': self.lookups,
+                'hits': self.hits,
+                'outside': self.outside,
+                'hit_rate': self.hits / self.lookups if self.lookups else 0.0
+            }
+
+    def reset_stats(self) -> None:
+        with self._stats_lock:
+            self.lookups = 0
+            self.hits = 0
+            self.outside = 0
+
+
+_hazard_grid: Optional[HazardGrid] = None
+_hazard_grid_lock = threading.Lock()
+
+
+def get_hazard_grid() -> HazardGrid:
+    """
+    コンテナ内で共有されるハザード情報スナップショットを返す。
+    """
+    global _hazard_grid
+    with _hazard_grid_lock:
+        if _hazard_grid is None:
+            _hazard_grid = HazardGrid()
+        return _hazard_grid
+
+
+def set_hazard_grid(hazard_grid: Optional[HazardGrid]) -> None:
+    """
+    共有のスナップショットを差し替える（テスト用）。Noneを渡すと次回利用時に再生成する。
+    """
+    global _hazard_grid
+    with _hazard_grid_lock:
+        _hazard_grid = hazard_grid
+
+
+def get_snapshot_stats() -> Dict:
+    """
+    共有のスナップショットのカバー範囲とヒット率を返す。
+    """
+    return get_hazard_grid().stats()
@@ -0,0 +1,48 @@
+from typing import NamedTuple, Tuple
+
+
+# 値の種類
+KIND_PROBABILITY = 'probability'  # max_prob / center_prob を百分率で表示する
+KIND_INFO = 'info'                # max_info / center_info をそのまま表示する
+KIND_LANDSLIDE = 'landslide'      # 土石流・急傾斜地・地すべりのサブ構造をまとめて表示する
+
+# 土砂災害のサブ構造のキー（表示順）
+LANDSLIDE_SUB_KEYS = ('debris_flow', 'steep_slope', 'landslide')
+
+
+class HazardSpec(NamedTuple):
+    """
+    ハザード情報1項目の定義。
+    """
+    api_key: str       # REST APIレスポンスのhazard_info内のキー
+    legacy_key: str    # 旧フォーマット（hazard_info.py互換）のキー
+    label: str         # 表示ラベル
+    no_data: str       # データがない場合の表示
+    kind: str          # 値の種類
+    hazard_type: str   # hazard_typesパラメータで指定する種類
+    always_show: bool  # データがなくても表示するかどうか
+
+
+# ハザード情報の定義表（表示順）。新しいハザードタイプはここに追加する。
+HAZARD_SPECS: Tuple[HazardSpec, ...] = (
+    HazardSpec('jshis_prob_50', 'jshis_prob_50', '30年以内に震度5強以上の地震が起こる確率',
+               'データなし', KIND_PROBABILITY, 'earthquake', True),
+    HazardSpec('jshis_prob_60', 'jshis_prob_60', '30年以内に震度6強以上の地震が起こる確率',
+               'データなし', KIND_PROBABILITY, 'earthquake', True),
+    HazardSpec('flood', 'inundation_depth', '想定最大浸水深',
+               '浸水なし', KIND_INFO, 'flood', True),
+    HazardSpec('tsunami', 'tsunami_inundation', '津波浸水想定',
+               '浸水想定なし', KIND_INFO, 'tsunami', True),
+    HazardSpec('high_tide', 'hightide_inundation', '高潮浸水想定',
+               '浸水想定なし', KIND_INFO, 'high_tide', True),
+    HazardSpec('large_fill_land', 'large_fill_land', '大規模盛土造成地',
+               '該当なし', KIND_INFO, 'large_fill_land', False),
+    HazardSpec('flood_keizoku', 'flood_keizoku', '浸水継続時間',
+               '浸水想定なし', KIND_INFO, 'flood_keizoku', False),
+    HazardSpec('kaokutoukai_hanran', 'kaokutoukai_hanran', '家屋倒壊等氾濫想定区域',
+               '該当なし', KIND_INFO, 'kaokutoukai_hanran', False),
+    HazardSpec('avalanche', 'avalanche', '雪崩危険箇所',
+               '該当なし', KIND_INFO, 'avalanche', False),
+    HazardSpec('landslide', 'landslide_hazard', '土砂災害警戒・特別警戒区域',
+               '該当なし', KIND_LANDSLIDE, 'landslide', True),
+)
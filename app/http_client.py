@@ -0,0 +1,173 @@
+import threading
+import time
+from typing import Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from app import circuit_breaker, deadline, metrics
+from app.config import get_env_int, get_env_number
+
+
+# 外部APIごとの既定タイムアウト（秒）。環境変数 <NAME>_TIMEOUT_SECONDS で上書き可能。
+UPSTREAM_TIMEOUTS = {
+    'hazard': ('HAZARD_API_TIMEOUT_SECONDS', 30.0),
+    'geocoding': ('GEOCODING_API_TIMEOUT_SECONDS', 10.0),
+    'line': ('LINE_API_TIMEOUT_SECONDS', 5.0),
+}
+
+# 応答の最終段となる外部API。リクエスト期限の直前まで時間を使ってよい。
+FINAL_STAGE_UPSTREAMS = {'line'}
+
+# コネクションプールの設定（環境変数で上書き可能）
+HTTP_POOL_CONNECTIONS = get_env_int('HTTP_POOL_CONNECTIONS', 4)
+HTTP_POOL_MAXSIZE = get_env_int('HTTP_POOL_MAXSIZE', 10)
+
+_sessions: Dict[str, requests.Session] = {}
+_request_counts: Dict[str, int] = {}
+_lock = threading.Lock()
+
+
+def get_timeout(upstream: str) -> float:
+    """
+    外部APIごとのタイムアウト（秒）を返す。
+
+    Args:
+        upstream: 外部APIの識別子（'hazard', 'geocoding', 'line'）
+
+    Returns:
+        タイムアウト秒数
+    """
+    env_name, default = UPSTREAM_TIMEOUTS.get(upstream, (None, 10.0))
+    if env_name is None:
+        return default
+    return get_env_number(env_name, default)
+
+
+def get_session(upstream: str) -> requests.Session:
+    """
+    外部APIごとのkeep-aliveセッションを返す。
+    セッションはコンテナ内で一度だけ生成され、ウォーム起動時の呼び出しで再利用される。
+
+    Args:
+        upstream: 外部APIの識別子
+
+    Returns:
+        requests.Session
+    """
+    session = _sessions.get(upstream)
+    if session is not None:
+        return session
+
+    with _lock:
+        session = _sessions.get(upstream)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(
+                pool_connections=HTTP_POOL_CONNECTIONS,
+                pool_maxsize=HTTP_POOL_MAXSIZE
+            )
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            _sessions[upstream] = session
+            _request_counts[upstream] = 0
+        return session
+
+
+def request(upstream: str, method: str, url: str, timeout: Optional[float] = None, **kwargs) -> requests.Response:
+    """
+    共有セッションを使ってHTTPリクエストを送信する。
+
+    Args:
+        upstream: 外部APIの識別子
+        method: HTTPメソッド
+        url: リクエスト先URL
+        timeout: タイムアウト秒数。Noneの場合は外部APIごとの設定値を使用。
+            リクエスト期限が設定されている場合は、残り時間に収まるよう短縮される。
+        **kwargs: requests.Session.requestに渡す追加引数
+
+    Returns:
+        requests.Response
+
+    Raises:
+        deadline.DeadlineExceeded: リクエスト期限までの残り時間が不足している場合
+        circuit_breaker.CircuitOpenError: 外部APIのサーキットが開いている場合
+    """
+    if timeout is None:
+        timeout = get_timeout(upstream)
+    reserve = deadline.DEADLINE_SAFETY_MARGIN_SECONDS if upstream in FINAL_STAGE_UPSTREAMS else None
+    timeout = deadline.timeout_for(timeout, reserve)
+
+    breaker = circuit_breaker.get_breaker(upstream)
+    if breaker is not None and not breaker.allow_request():
+        metrics.record_upstream_call(upstream, 'CircuitOpen')
+        raise circuit_breaker.CircuitOpenError(f"Circuit for {upstream} is open")
+
+    session = get_session(upstream)
+    with _lock:
+        _request_counts[upstream] += 1
+    started = time.monotonic()
+    try:
+        response = session.request(method, url, timeout=timeout, **kwargs)
+    except requests.exceptions.RequestException as e:
+        if breaker is not None:
+            breaker.record_failure(time.monotonic() - started)
+        metrics.record_upstream_call(upstream, type(e).__name__)
+        raise
+    if breaker is not None:
+        # 5xxと429は外部APIの障害・過負荷として数える
+        elapsed = time.monotonic() - started
+        if response.status_code >= 500 or response.status_code == 429:
+            breaker.record_failure(elapsed)
+        else:
+            breaker.record_success(elapsed)
+    metrics.record_upstream_call(upstream, response.status_code)
+    return response
+
+
+def _count_new_connections(session: requests.Session) -> int:
+    """
+    セッション配下のコネクションプールで新規に確立された接続数を集計する。
+    """
+    total = 0
+    for adapter in set(session.adapters.values()):
+        pools = getattr(getattr(adapter, 'poolmanager', None), 'pools', None)
+        if pools is None:
+            continue
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            total += getattr(pool, 'num_connections', 0)
+    return total
+
+
+def get_connection_stats() -> Dict[str, Dict[str, int]]:
+    """
+    外部APIごとのリクエスト数と接続の再利用状況を返す。
+
+    Returns:
+        {upstream: {'requests': 件数, 'new_connections': 新規接続数, 'reused_connections': 再利用数}}
+    """
+    stats = {}
+    with _lock:
+        items = list(_sessions.items())
+        counts = dict(_request_counts)
+    for upstream, session in items:
+        requests_sent = counts.get(upstream, 0)
+        new_connections = _count_new_connections(session)
+        stats[upstream] = {
+            'requests': requests_sent,
+            'new_connections': new_connections,
+            'reused_connections': max(requests_sent - new_connections, 0)
+        }
+    return stats
+
+
+def close_sessions() -> None:
+    """
+    すべての共有セッションを閉じて破棄する。
+    """
+    with _lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
+        _request_counts.clear()
@@ -0,0 +1,143 @@
+import json
+import os
+import sys
+import threading
+import time
+from typing import Dict, List, Optional
+
+
+class _TimedLoader:
+    """
+    モジュールのexec_moduleの所要時間を計測するローダーのラッパー。
+    それ以外の属性は元のローダーに委譲する。
+    """
+
+    def __init__(self, loader, profiler: 'ImportProfiler', name: str):
+        self._loader = loader
+        self._profiler = profiler
+        self._name = name
+
+    def create_module(self, spec):
+        return self._loader.create_module(spec)
+
+    def exec_module(self, module):
+        self._profiler._enter()
+        started = time.perf_counter()
+        try:
+            self._loader.exec_module(module)
+        finally:
+            self._profiler._leave(self._name, time.perf_counter() - started)
+
+    def __getattr__(self, name):
+        return getattr(self._loader, name)
+
+
+class ImportProfiler:
+    """
+    sys.meta_pathに登録し、モジュールごとのインポート時間（自身のみ・配下を含む累計）を記録する。
+    """
+
+    def __init__(self):
+        self.records: Dict[str, Dict[str, float]] = {}
+        self._local = threading.local()
+        self._reported = set()
+
+    def _stack(self) -> List[float]:
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def _enter(self) -> None:
+        self._stack().append(0.0)
+
+    def _leave(self, name: str, elapsed: float) -> None:
+        stack = self._stack()
+        children = stack.pop()
+        if stack:
+            stack[-1] += elapsed
+        self.records[name] = {
+            'self_ms': round((elapsed - children) * 1000, 3),
+            'cumulative_ms': round(elapsed * 1000, 3)
+        }
+
+    def find_spec(self, fullname, path, target=None):
+        if getattr(self._local, 'finding', False):
+            return None
+        self._local.finding = True
+        try:
+            for finder in sys.meta_path:
+                if finder is self or not hasattr(finder, 'find_spec'):
+                    continue
+                spec = finder.find_spec(fullname, path, target)
+                if spec is not None:
+                    if spec.loader is not None and hasattr(spec.loader, 'exec_module'):
+                        spec.loader = _TimedLoader(spec.loader, self, fullname)
+                    return spec
+            return None
+        finally:
+            self._local.finding = False
+
+    def install(self) -> None:
+        if self not in sys.meta_path:
+            sys.meta_path.insert(0, self)
+
+    def uninstall(self) -> None:
+        if self in sys.meta_path:
+            sys.meta_path.remove(self)
+
+    def report(self, phase: str, top: int = 20) -> Optional[Dict]:
+        """
+        前回のレポート以降に読み込まれたモジュールのインポート時間を、自身の所要時間の降順で出力する。
+
+        Args:
+            phase: レポートの区切り（'init' など）
+            top: 出力するモジュール数
+
+        Returns:
+            出力したレポート。新しく読み込まれたモジュールがない場合はNone。
+        """
+        new_names = [name for name in self.records if name not in self._reported]
+        if not new_names:
+            return None
+        self._reported.update(new_names)
+
+        top_level = [name for name in new_names if '.' not in name or name.startswith('app.')]
+        report = {
+            'import_profile': phase,
+            'modules': len(new_names),
+            'total_ms': round(sum(self.records[name]['self_ms'] for name in new_names), 3),
+            'top_self_ms': [
+                {'module': name, **self.records[name]}
+                for name in sorted(new_names, key=lambda n: self.records[n]['self_ms'], reverse=True)[:top]
+            ],
+            'top_cumulative_ms': [
+                {'module': name, **self.records[name]}
+                for name in sorted(top_level, key=lambda n: self.records[n]['cumulative_ms'], reverse=True)[:top]
+            ]
+        }
+        print(json.dumps(report, ensure_ascii=False))
+        return report
+
+
+_profiler: Optional[ImportProfiler] = None
+
+
+def install_from_env() -> Optional[ImportProfiler]:
+    """
+    環境変数IMPORT_PROFILEが有効な場合にインポートプロファイラを登録する。
+    """
+    global _profiler
+    if _profiler is None and os.environ.get('IMPORT_PROFILE', '').lower() in ('1', 'true', 'yes'):
+        _profiler = ImportProfiler()
+        _profiler.install()
+    return _profiler
+
+
+def report(phase: str) -> Optional[Dict]:
+    """
+    インポートプロファイラが有効な場合、新しく読み込まれたモジュールのインポート時間を出力する。
+    """
+    if _profiler is None:
+        return None
+    return _profiler.report(phase, top=int(os.environ.get('IMPORT_PROFILE_TOP', '20')))
@@ -1,24 +1,273 @@
 import re
+import unicodedata
+from urllib.parse import parse_qs, unquote, urlsplit
 
 # 緯度経度の正規表現パターン（例: 35.6586, 139.7454）
 LATLON_PATTERN = re.compile(r'^\s*(-?\d{1,2}(\.\d+)?)\s*,\s*(-?\d{1,3}(\.\d+)?)\s*$')
 
 OTHER_URL_PATTERN = re.compile(r'^https?://[^\s/$.?#].[^\s]*$')
 
+# 文中のURL
+URL_IN_TEXT_PATTERN = re.compile(r'https?://[^\s]+')
+
+# 地図サービスのURLから座標を取り出すパターン
+_NUMBER = r'[-+]?\d{1,3}(?:\.\d+)?'
+# Google マップの地点データ（!3d緯度!4d経度）。表示範囲の中心（@）より地点そのものに近い。
+_GOOGLE_PLACE_PATTERN = re.compile(rf'!3d({_NUMBER})!4d({_NUMBER})')
+# Google マップの表示範囲の中心（/@緯度,経度,ズーム）
+_GOOGLE_CENTER_PATTERN = re.compile(rf'/@({_NUMBER}),({_NUMBER})')
+# 地理院地図のフラグメント（#ズーム/緯度/経度/）
+_GSI_FRAGMENT_PATTERN = re.compile(rf'^\d{{1,2}}/({_NUMBER})/({_NUMBER})(?:/|$)')
+# クエリパラメータの「緯度,経度」
+_QUERY_PAIR_PATTERN = re.compile(rf'^\s*(?:loc:)?\s*({_NUMBER})\s*,\s*({_NUMBER})\s*$')
+# 「緯度,経度」を値に持つクエリパラメータ（優先順）
+_COORDINATE_QUERY_KEYS = ('q', 'query', 'll', 'center', 'destination', 'daddr', 'sll')
+
+# 度分秒・漢字表記（例: 35°39'31"N 139°44'43"E、北緯35度39分31秒 東経139度44分43秒）
+_DMS_PATTERN = re.compile(
+    r'(北緯|南緯|東経|西経|[NSEW](?![A-Za-z]))?\s*'
+    r'(\d{1,3}(?:\.\d+)?)\s*[°º度]\s*'
+    r'(?:(\d{1,2}(?:\.\d+)?)\s*(?:[\'′分](?![\'′]))\s*)?'
+    r'(?:(\d{1,2}(?:\.\d+)?)\s*(?:"|″|′′|\'\'|秒)\s*)?'
+    r'([NSEW](?![A-Za-z]))?'
+)
+_DMS_MARKERS = ('°', 'º', '度')
+# 度分秒の記号、または全角の数字・小数点・カンマ（NFKC正規化が必要な入力）
+_COORDINATE_HINT_PATTERN = re.compile('[°º度０-９．，－]')
+_LATITUDE_HEMISPHERES = {'北緯': 1, 'N': 1, '南緯': -1, 'S': -1}
+_LONGITUDE_HEMISPHERES = {'東経': 1, 'E': 1, '西経': -1, 'W': -1}
+
+# メッセージ中のキーワードと、対応するhazard_typesパラメータの値
+HAZARD_KEYWORDS = {
+    '地震': ('earthquake',),
+    '震度': ('earthquake',),
+    '洪水': ('flood', 'flood_keizoku', 'kaokutoukai_hanran'),
+    '浸水': ('flood', 'flood_keizoku', 'kaokutoukai_hanran'),
+    '氾濫': ('flood', 'flood_keizoku', 'kaokutoukai_hanran'),
+    '水害': ('flood', 'flood_keizoku', 'kaokutoukai_hanran'),
+    '津波浸水': ('tsunami',),
+    '津波': ('tsunami',),
+    '高潮浸水': ('high_tide',),
+    '高潮': ('high_tide',),
+    '土砂災害': ('landslide',),
+    '土砂': ('landslide',),
+    '土石流': ('landslide',),
+    'がけ崩れ': ('landslide',),
+    '崖崩れ': ('landslide',),
+    '地すべり': ('landslide',),
+    '地滑り': ('landslide',),
+    '雪崩': ('avalanche',),
+    'なだれ': ('avalanche',),
+    '大規模盛土': ('large_fill_land',),
+    '盛土': ('large_fill_land',),
+}
+
+# 長いキーワードを先に照合する（「津波浸水」を「津波」と「浸水」に分けない）
+_HAZARD_KEYWORD_PATTERN = re.compile(
+    '(' + '|'.join(sorted(map(re.escape, HAZARD_KEYWORDS), key=len, reverse=True)) + ')'
+    r'(?:リスク|情報|想定|危険度|の危険性)?'
+)
+# キーワードを取り除いた後に前後に残る区切りや助詞
+_LEADING_SEPARATORS = re.compile(r'^[\s、,，・とや]+')
+_TRAILING_SEPARATORS = re.compile(r'[\s、,，・とやのはを?？]+$')
+
+
+def extract_hazard_types(text: str) -> tuple[str, list[str] | None]:
+    """
+    メッセージからハザードの種類を表すキーワードを取り出し、場所を表す部分と分ける。
+
+    Args:
+        text: ユーザーからの入力文字列。
+
+    Returns:
+        (str, list[str] | None): キーワードを取り除いた文字列と、hazard_typesのリストのタプル。
+        キーワードが含まれない場合やURLの場合は、元のテキストとNoneを返す。
+    """
+    if OTHER_URL_PATTERN.match(text) or not _HAZARD_KEYWORD_PATTERN.search(text):
+        return text, None
+
+    hazard_types = []
+    for match in _HAZARD_KEYWORD_PATTERN.finditer(text):
+        for hazard_type in HAZARD_KEYWORDS[match.group(1)]:
+            if hazard_type not in hazard_types:
+                hazard_types.append(hazard_type)
+    if not hazard_types:
+        return text, None
+
+    location = _HAZARD_KEYWORD_PATTERN.sub(' ', text)
+    location = _TRAILING_SEPARATORS.sub('', _LEADING_SEPARATORS.sub('', location))
+    return re.sub(r'\s+', ' ', location), hazard_types
+
+
+def _valid_coordinates(lat: float, lon: float) -> tuple[float, float] | None:
+    if -90 <= lat <= 90 and -180 <= lon <= 180:
+        return lat, lon
+    return None
+
+
+def parse_latlon(value: str) -> tuple[float, float] | None:
+    """
+    「緯度, 経度」形式の文字列を数値に変換する。形式や範囲が不正な場合はNone。
+    """
+    try:
+        lat, lon = map(float, value.split(','))
+    except ValueError:
+        return None
+    return _valid_coordinates(lat, lon)
+
+
+def _is_map_host(host: str, path: str) -> bool:
+    host = host.lower()
+    if host.startswith('www.'):
+        host = host[4:]
+    if host == 'maps.gsi.go.jp' or host == 'map.yahoo.co.jp' or host == 'maps.apple.com':
+        return True
+    if host.startswith('maps.google.'):
+        return True
+    return host.startswith('google.') and path.startswith('/maps')
+
+
+def _extract_from_url(url: str) -> tuple[float, float] | None:
+    """
+    Google マップ・地理院地図などの地図URLから座標を取り出す。
+    短縮URL（maps.app.goo.gl など）はリダイレクト先を取得しないと座標が分からないため対象外。
+    """
+    try:
+        parts = urlsplit(url)
+    except ValueError:
+        return None
+    if not _is_map_host(parts.hostname or '', parts.path):
+        return None
+
+    path = unquote(parts.path)
+    for pattern in (_GOOGLE_PLACE_PATTERN, _GOOGLE_CENTER_PATTERN):
+        match = pattern.search(path) or pattern.search(unquote(parts.query))
+        if match:
+            return _valid_coordinates(float(match.group(1)), float(match.group(2)))
+
+    match = _GSI_FRAGMENT_PATTERN.match(parts.fragment)
+    if match:
+        return _valid_coordinates(float(match.group(1)), float(match.group(2)))
+
+    query = parse_qs(parts.query)
+    for key in _COORDINATE_QUERY_KEYS:
+        for value in query.get(key, ()):
+            match = _QUERY_PAIR_PATTERN.match(value)
+            if match:
+                return _valid_coordinates(float(match.group(1)), float(match.group(2)))
+
+    lat = query.get('lat')
+    lon = query.get('lon') or query.get('lng')
+    if lat and lon:
+        try:
+            return _valid_coordinates(float(lat[0]), float(lon[0]))
+        except ValueError:
+            return None
+    return None
+
+
+def _extract_from_dms(text: str) -> tuple[float, float] | None:
+    """
+    度分秒・漢字表記の座標を取り出す。北緯/南緯・東経/西経やN/S/E/Wがあれば順序は問わない。
+    """
+    matches = [match for match in _DMS_PATTERN.finditer(text)]
+    if len(matches) != 2:
+        return None
+
+    values = {}
+    unassigned = []
+    for match in matches:
+        prefix, degrees, minutes, seconds, suffix = match.groups()
+        minutes = float(minutes) if minutes else 0.0
+        seconds = float(seconds) if seconds else 0.0
+        if minutes >= 60 or seconds >= 60:
+            return None
+        value = float(degrees) + minutes / 60 + seconds / 3600
+
+        hemisphere = prefix or suffix
+        if hemisphere in _LATITUDE_HEMISPHERES:
+            axis, sign = 'lat', _LATITUDE_HEMISPHERES[hemisphere]
+        elif hemisphere in _LONGITUDE_HEMISPHERES:
+            axis, sign = 'lon', _LONGITUDE_HEMISPHERES[hemisphere]
+        else:
+            unassigned.append(value)
+            continue
+        if axis in values:
+            return None
+        values[axis] = sign * value
+
+    # 方位の指定がない値は、緯度・経度の順に割り当てる
+    for axis in ('lat', 'lon'):
+        if axis not in values and unassigned:
+            values[axis] = unassigned.pop(0)
+    if 'lat' not in values or 'lon' not in values:
+        return None
+    return _valid_coordinates(values['lat'], values['lon'])
+
+
+def extract_coordinates(text: str) -> tuple[float, float] | None:
+    """
+    地図URL・度分秒表記・漢字表記（北緯/東経）・全角数字の「緯度, 経度」から座標を取り出す。
+    これらの入力はジオコーディングを経ずに座標として扱える。
+
+    Args:
+        text: ユーザーからの入力文字列。
+
+    Returns:
+        (緯度, 経度) のタプル。座標が見つからない場合や範囲外の場合はNone。
+    """
+    # 地図サービスのURLはいずれもホスト名かパスに「map」を含む
+    if 'http' in text and 'map' in text:
+        match = URL_IN_TEXT_PATTERN.search(text)
+        if match:
+            return _extract_from_url(match.group(0))
+
+    # 度分秒の記号や全角数字はいずれも非ASCII文字なので、ASCIIのみの入力はここで打ち切る
+    if text.isascii():
+        return None
+    hint = _COORDINATE_HINT_PATTERN.search(text)
+    if hint is None:
+        return None
+
+    if hint.group(0) not in _DMS_MARKERS:
+        text = unicodedata.normalize('NFKC', text)
+        if LATLON_PATTERN.match(text):
+            return parse_latlon(text)
+    return _extract_from_dms(text)
+
+
+def _format_coordinates(coordinates: tuple[float, float]) -> str:
+    return f"{round(coordinates[0], 6)}, {round(coordinates[1], 6)}"
+
+
 def parse_input_type(text: str) -> tuple[str, str]:
     """
     ユーザーの入力テキストを解析し、タイプと値を返す。
+    ハザードの種類を表すキーワード（「津波 東京駅」の「津波」など）は値から取り除く。
 
     Args:
         text: ユーザーからの入力文字列。
 
     Returns:
-        (str, str): 入力のタイプ（'latlon', 'address', 'invalid_url'）と元のテキストのタプル。
+        (str, str): 入力のタイプ（'latlon', 'address', 'invalid_url'）と場所を表すテキストのタプル。
+        地図URLや度分秒表記から座標を取り出せた場合は 'latlon' と「緯度, 経度」形式の文字列を返す。
     """
     if LATLON_PATTERN.match(text):
         return 'latlon', text
+
+    coordinates = extract_coordinates(text)
+    if coordinates:
+        return 'latlon', _format_coordinates(coordinates)
         
     if OTHER_URL_PATTERN.match(text):
         return 'invalid_url', text
 
-    return 'address', text
+    location, hazard_types = extract_hazard_types(text)
+    if hazard_types:
+        if LATLON_PATTERN.match(location):
+            return 'latlon', location
+        coordinates = extract_coordinates(location)
+        if coordinates:
+            return 'latlon', _format_coordinates(coordinates)
+
+    return 'address', location
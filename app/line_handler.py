@@ -1,37 +1,57 @@
 import os
-import requests
 import hmac
 import hashlib
 import base64
 import json
+import time
+import contextvars
 
-# 環境変数からLINEの認証情報を取得
-def get_line_credentials():
-    access_token = os.environ.get('LINE_CHANNEL_ACCESS_TOKEN')
-    channel_secret = os.environ.get('LINE_CHANNEL_SECRET')
-    
-    if not access_token or not channel_secret:
-        print("LINE Channel Access Token or Channel Secret is not set in environment variables.")
-            
-    return access_token, channel_secret
-
-LINE_CHANNEL_ACCESS_TOKEN, LINE_CHANNEL_SECRET = get_line_credentials()
+from app import deadline, metrics
+from app.config import get_env_int
 
 LINE_REPLY_API_URL = "https://api.line.me/v2/bot/message/reply"
+LINE_PUSH_API_URL = "https://api.line.me/v2/bot/message/push"
+
+# 処理中のWebhookリクエストの署名（スレッド・リクエストごとに独立して保持する）
+_request_signature: contextvars.ContextVar[str] = contextvars.ContextVar('line_request_signature', default='')
+# 処理中のWebhookイベント（応答関数からプッシュ送信先を参照するために保持する）
+_current_event: contextvars.ContextVar[dict | None] = contextvars.ContextVar('line_current_event', default=None)
+
+def get_current_event() -> dict | None:
+    """
+    処理中のWebhookイベントを返す。イベント処理の外から呼ばれた場合はNone。
+    """
+    return _current_event.get()
+
+def get_push_target(event: dict | None) -> str | None:
+    """
+    イベントの送信元から、プッシュメッセージの送信先ID（グループ・トークルーム・ユーザー）を返す。
+    """
+    source = (event or {}).get('source') or {}
+    return source.get('groupId') or source.get('roomId') or source.get('userId')
 
-def validate_signature(body: str, signature: str, channel_secret: str) -> bool:
+def is_test_signature(signature: str) -> bool:
+    """
+    署名がテスト用の署名（環境変数LINE_TEST_SIGNATURE）と完全に一致するかどうかを返す。
+    部分一致では受け付けない。LINE_TEST_SIGNATUREが未設定または空の場合、テストモードは無効（デフォルト）。
+    """
+    test_signature = os.environ.get('LINE_TEST_SIGNATURE', '')
+    if not test_signature or not signature:
+        return False
+    return hmac.compare_digest(signature.encode('utf-8'), test_signature.encode('utf-8'))
+
+def validate_signature(body: str | bytes, signature: str, channel_secret: str) -> bool:
     """
     LINEからのWebhookリクエストの署名を検証する。
+    bytesの場合は受信したバイト列そのものに対してHMACを計算する（再エンコードしない）。
     """
-    test_signature = os.environ.get('LINE_TEST_SIGNATURE', 'test_signature')
-    
     # テスト署名の場合は検証をスキップ
-    if test_signature in signature:
+    if is_test_signature(signature):
         return True
     
-    hash = hmac.new(channel_secret.encode('utf-8'),
-                    body.encode('utf-8'),
-                    hashlib.sha256).digest()
+    if isinstance(body, str):
+        body = body.encode('utf-8')
+    hash = hmac.new(channel_secret.encode('utf-8'), body, hashlib.sha256).digest()
     return hmac.compare_digest(signature.encode('utf-8'), base64.b64encode(hash))
 
 def reply_message(reply_token: str, text: str) -> dict:
@@ -39,13 +59,6 @@ def reply_message(reply_token: str, text: str) -> dict:
     LINE Messaging APIを使ってメッセージを返信する。
     テスト署名の場合は実際の送信はスキップしてペイロードを返す。
     """
-    access_token = os.environ.get('LINE_CHANNEL_ACCESS_TOKEN')
-    test_signature = os.environ.get('LINE_TEST_SIGNATURE', 'test_signature')
-    
-    if not access_token:
-        print("LINE Channel Access Token is not configured.")
-        return {'error': 'LINE Channel Access Token not configured'}
-
     payload = {
         'replyToken': reply_token,
         'messages': [
@@ -55,9 +68,47 @@ def reply_message(reply_token: str, text: str) -> dict:
             }
         ]
     }
+    return _send_messages('reply', LINE_REPLY_API_URL, payload, reply_token.startswith('test_'))
+
+def push_message(to: str, text: str) -> dict:
+    """
+    LINE Messaging APIを使ってプッシュメッセージを送信する。
+    返信トークンの有効期限後に追加の情報を送るために使う。
+    テスト署名の場合やテスト用の送信先の場合は実際の送信はスキップしてペイロードを返す。
+    """
+    payload = {
+        'to': to,
+        'messages': [
+            {
+                'type': 'text',
+                'text': text
+            }
+        ]
+    }
+    return _send_messages('push', LINE_PUSH_API_URL, payload, to.startswith('test_'))
+
+def _send_messages(kind: str, api_url: str, payload: dict, is_test_target: bool) -> dict:
+    """
+    返信・プッシュ共通の送信処理。
+
+    Args:
+        kind: 'reply' または 'push'（ログ出力用）
+        api_url: 送信先のLINE APIのURL
+        payload: 送信するペイロード
+        is_test_target: テスト用の返信トークン・送信先かどうか
+    """
+    # HTTPクライアントは実際に送信するときだけ読み込む（署名エラー時のコールドスタート短縮）
+    import requests
+    from app import http_client
+
+    access_token = os.environ.get('LINE_CHANNEL_ACCESS_TOKEN')
     
+    if not access_token:
+        print("LINE Channel Access Token is not configured.")
+        return {'error': 'LINE Channel Access Token not configured'}
+
     # テスト署名の場合は実際の送信をスキップ
-    if reply_token.startswith('test_') or test_signature in globals().get('_current_signature', ''):
+    if is_test_target or is_test_signature(_request_signature.get()):
         print(f"Test mode: Skipping LINE API call. Payload: {json.dumps(payload, ensure_ascii=False)}")
         return {'test_mode': True, 'line_payload': payload}
     
@@ -68,51 +119,172 @@ def reply_message(reply_token: str, text: str) -> dict:
     
     try:
         # ペイロードをUTF-8でエンコードして送信
-        response = requests.post(LINE_REPLY_API_URL, headers=headers, data=json.dumps(payload, ensure_ascii=False).encode('utf-8'), timeout=5)
+        response = http_client.request('line', 'POST', api_url, headers=headers, data=json.dumps(payload, ensure_ascii=False).encode('utf-8'))
         response.raise_for_status()
-        print(f"LINE reply API response: {response.status_code} {response.text}")
+        print(f"LINE {kind} API response: {response.status_code} {response.text}")
         return {'success': True, 'status_code': response.status_code}
-    except requests.exceptions.RequestException as e:
-        print(f"Error replying to LINE: {e}")
+    except (requests.exceptions.RequestException, deadline.DeadlineExceeded) as e:
+        print(f"Error sending {kind} message to LINE: {e}")
         return {'error': str(e)}
 
-def handle_line_event(event_body: str, signature: str, response_function) -> dict:
+def _process_event(event: dict, response_function) -> dict | None:
+    """
+    1件のWebhookイベントを処理する。テキストメッセージ以外の場合はNoneを返す。
+    """
+    if event['type'] == 'message' and event['message']['type'] == 'text':
+        reply_token = event['replyToken']
+        user_message = event['message']['text']
+        token = _current_event.set(event)
+        try:
+            response_text = response_function(user_message)
+        finally:
+            _current_event.reset(token)
+        with metrics.span('reply') as reply_span:
+            line_result = reply_message(reply_token, response_text)
+            if 'test_mode' in line_result:
+                reply_span.set(TestMode=True)
+        return {
+            'user_message': user_message,
+            'bot_response': response_text,
+            'line_result': line_result
+        }
+    return None
+
+def _process_events(events: list, response_function) -> list:
+    """
+    Webhookイベントを処理し、応答結果をイベントの順序どおりに返す。
+    LINE_EVENT_MAX_WORKERSが2以上の場合は、独立したイベントをスレッドプールで並行処理する。
+    """
+    max_workers = get_env_int('LINE_EVENT_MAX_WORKERS', 1)
+    if max_workers <= 1 or len(events) <= 1:
+        results = [_process_event(event, response_function) for event in events]
+    else:
+        from concurrent.futures import ThreadPoolExecutor
+
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(events))) as executor:
+            # 各ワーカーにリクエストのコンテキスト（署名など）を引き継ぐ
+            futures = [
+                executor.submit(contextvars.copy_context().run, _process_event, event, response_function)
+                for event in events
+            ]
+            results = [future.result() for future in futures]
+
+    return [result for result in results if result is not None]
+
+def handle_line_event(event_body: str | bytes, signature: str, response_function) -> dict:
     """
     LINEのWebhookイベントを処理し、応答関数を呼び出す。
+    署名は受信したバイト列に対して検証し、検証に成功するまでJSONとして解析しない。
     テスト署名の場合は署名検証をスキップし、LINE送信結果を返す。
     """
-    global _current_signature
-    _current_signature = signature
-    
+    token = _request_signature.set(signature)
+    try:
+        return _handle_line_event(event_body, signature, response_function)
+    finally:
+        _request_signature.reset(token)
+
+def _verify_request(event_body: str | bytes, signature: str) -> tuple[dict | None, bool]:
+    """
+    Webhookリクエストの署名を検証する。
+
+    Returns:
+        (エラー情報, テストモードかどうか) のタプル。検証に成功した場合のエラー情報はNone。
+    """
     channel_secret = os.environ.get('LINE_CHANNEL_SECRET')
-    test_signature = os.environ.get('LINE_TEST_SIGNATURE', 'test_signature')
     
     if not channel_secret:
         print("LINE Channel Secret is not configured.")
-        return {'error': 'LINE Channel Secret not configured'}
+        return {'error': 'LINE Channel Secret not configured'}, False
 
     # テスト署名の場合は署名検証をスキップ
-    is_test_mode = test_signature in signature
+    is_test_mode = is_test_signature(signature)
     if not is_test_mode and not validate_signature(event_body, signature, channel_secret):
         print("Invalid signature. Please check your channel secret.")
-        return {'error': 'Invalid signature'}
-
-    line_responses = []
-    events = json.loads(event_body)['events']
-    for event in events:
-        if event['type'] == 'message' and event['message']['type'] == 'text':
-            reply_token = event['replyToken']
-            user_message = event['message']['text']
-            response_text = response_function(user_message)
-            line_result = reply_message(reply_token, response_text)
-            line_responses.append({
-                'user_message': user_message,
-                'bot_response': response_text,
-                'line_result': line_result
-            })
+        return {'error': 'Invalid signature'}, is_test_mode
+
+    return None, is_test_mode
+
+def _parse_events(event_body: str | bytes) -> list | None:
+    """
+    署名検証済みのWebhookボディからイベントのリストを取り出す。不正な形式の場合はNone。
+    bytesの場合はデコードせずにそのままjson.loadsに渡す。
+    """
+    try:
+        events = json.loads(event_body)['events']
+    except (ValueError, KeyError, TypeError) as e:
+        print(f"Malformed webhook body: {e}")
+        return None
+    if not isinstance(events, list):
+        print("Malformed webhook body: events is not a list")
+        return None
+    return events
+
+def _handle_line_event(event_body: str | bytes, signature: str, response_function) -> dict:
+    error, is_test_mode = _verify_request(event_body, signature)
+    if error:
+        return error
+
+    with metrics.span('webhook_parse'):
+        events = _parse_events(event_body)
+    if events is None:
+        return {'error': 'Malformed request body'}
+    line_responses = _process_events(events, response_function)
     
     return {
         'test_mode': is_test_mode,
         'processed_events': len(line_responses),
         'line_responses': line_responses
     }
+
+def enqueue_line_event(event_body: str | bytes, signature: str, queue) -> dict:
+    """
+    署名を検証したうえでWebhookイベントをキューに投入し、処理はワーカーに委ねる。
+
+    Args:
+        event_body: Webhookのリクエストボディ
+        signature: X-Line-Signatureヘッダーの値
+        queue: enqueue(message)を持つキュー
+
+    Returns:
+        投入結果を含む辞書
+    """
+    error, is_test_mode = _verify_request(event_body, signature)
+    if error:
+        return error
+
+    events = _parse_events(event_body)
+    if events is None:
+        return {'error': 'Malformed request body'}
+    if events:
+        queue.enqueue({
+            'events': events,
+            'signature': signature,
+            'enqueued_at': time.time()
+        })
+
+    return {
+        'test_mode': is_test_mode,
+        'queued_events': len(events)
+    }
+
+def process_queued_message(message: dict, response_function) -> dict:
+    """
+    キューから取り出したメッセージのイベントを処理し、LINEに返信する。
+
+    Args:
+        message: enqueue_line_eventで投入されたメッセージ
+        response_function: ユーザーのメッセージから返信文を生成する関数
+
+    Returns:
+        処理結果を含む辞書
+    """
+    token = _request_signature.set(message.get('signature', ''))
+    try:
+        line_responses = _process_events(message.get('events', []), response_function)
+    finally:
+        _request_signature.reset(token)
+
+    return {
+        'processed_events': len(line_responses),
+        'line_responses': line_responses
+    }
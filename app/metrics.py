@@ -0,0 +1,180 @@
+import contextvars
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+
+# CloudWatchメトリクスの名前空間（環境変数で上書き可能）
+DEFAULT_NAMESPACE = 'HazardInfoLineBot'
+STAGE_LATENCY_METRIC = 'StageLatency'
+
+# メトリクス化するディメンションの組み合わせ。ディメンションの組み合わせごとに別のメトリクスとして
+# 課金されるため、少数の組に限定する。含まれないキーはレコードのプロパティ（Logs Insightsで検索可能）になる。
+DIMENSION_SETS = (
+    ('Stage',),
+    ('Stage', 'CacheStatus'),
+    ('Stage', 'Upstream', 'HttpStatus'),
+)
+# レコードごとの判定を集合演算で済ませるため、(出力する組, 必要なキーの集合) を事前に作っておく
+_DIMENSION_SET_KEYS = tuple((list(keys), frozenset(keys)) for keys in DIMENSION_SETS)
+
+
+def stdout_sink(record: Dict) -> None:
+    """
+    EMF形式のJSONを1行で標準出力に書き出す。LambdaではCloudWatch Logs経由でメトリクスになる。
+    """
+    print(json.dumps(record, ensure_ascii=False))
+
+
+class ListSink:
+    """
+    出力されたレコードをメモリ上に保持するシンク。ローカル実行やテスト用。
+    """
+
+    def __init__(self):
+        self.records: List[Dict] = []
+        self._lock = threading.Lock()
+
+    def __call__(self, record: Dict) -> None:
+        with self._lock:
+            self.records.append(record)
+
+    def stage_latencies(self, stage: Optional[str] = None) -> List[Dict]:
+        """
+        ステージのレイテンシレコードを返す。stageを指定した場合はそのステージのみ。
+        """
+        with self._lock:
+            return [
+                record for record in self.records
+                if STAGE_LATENCY_METRIC in record and (stage is None or record.get('Stage') == stage)
+            ]
+
+
+def _default_sink() -> Optional[Callable[[Dict], None]]:
+    sink_name = os.environ.get('METRICS_SINK', 'stdout')
+    if sink_name == 'none':
+        return None
+    return stdout_sink
+
+
+_sink: Optional[Callable[[Dict], None]] = _default_sink()
+
+
+def set_sink(sink: Optional[Callable[[Dict], None]]) -> None:
+    """
+    メトリクスの出力先を差し替える。Noneを渡すと出力を無効化する。
+    """
+    global _sink
+    _sink = sink
+
+
+def get_sink() -> Optional[Callable[[Dict], None]]:
+    return _sink
+
+
+def emit_metric(
+    name: str,
+    value: float,
+    unit: str = 'Milliseconds',
+    dimensions: Optional[Dict[str, str]] = None,
+    properties: Optional[Dict[str, Any]] = None
+) -> None:
+    """
+    CloudWatch Embedded Metric Format (EMF) のレコードを出力する。
+
+    Args:
+        name: メトリクス名
+        value: 値
+        unit: 単位
+        dimensions: ディメンション（値は文字列）。DIMENSION_SETSの組に含まれるものだけがメトリクス化される。
+        properties: メトリクス化しない付加情報
+    """
+    sink = _sink
+    if sink is None:
+        return
+
+    dimensions = dimensions or {}
+    present = dimensions.keys()
+    dimension_sets = [list(keys) for keys, required in _DIMENSION_SET_KEYS if required <= present]
+
+    record = {
+        '_aws': {
+            'Timestamp': int(time.time() * 1000),
+            'CloudWatchMetrics': [{
+                'Namespace': os.environ.get('METRICS_NAMESPACE', DEFAULT_NAMESPACE),
+                'Dimensions': dimension_sets,
+                'Metrics': [{'Name': name, 'Unit': unit}]
+            }]
+        },
+        **(properties or {}),
+        **dimensions,
+        name: value
+    }
+    try:
+        sink(record)
+    except Exception as e:
+        print(f"Error emitting metric {name}: {e}")
+
+
+class Span:
+    """
+    処理ステージの計測区間。計測中にディメンションを追加できる。
+    """
+
+    def __init__(self, stage: str, dimensions: Dict[str, Any]):
+        self.stage = stage
+        self.dimensions = {key: str(value) for key, value in dimensions.items()}
+        self.elapsed_ms: Optional[float] = None
+
+    def set(self, **dimensions) -> None:
+        self.dimensions.update({key: str(value) for key, value in dimensions.items()})
+
+
+_current_span: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar('metrics_current_span', default=None)
+
+
+@contextmanager
+def span(stage: str, **dimensions) -> Iterator[Span]:
+    """
+    ブロックの所要時間を計測し、StageLatencyメトリクスとして出力する。
+
+    使用例:
+        with metrics.span('geocode') as s:
+            ...
+            s.set(CacheStatus='hit')
+    """
+    current = Span(stage, dimensions)
+    token = _current_span.set(current)
+    started = time.perf_counter()
+    try:
+        yield current
+    except Exception:
+        current.set(Outcome='error')
+        raise
+    finally:
+        current.elapsed_ms = (time.perf_counter() - started) * 1000
+        _current_span.reset(token)
+        emit_metric(
+            STAGE_LATENCY_METRIC,
+            round(current.elapsed_ms, 3),
+            dimensions={'Stage': stage, **current.dimensions}
+        )
+
+
+def annotate(**dimensions) -> None:
+    """
+    実行中の計測区間にディメンションを追加する。計測区間外で呼ばれた場合は何もしない。
+    """
+    current = _current_span.get()
+    if current is not None:
+        current.set(**dimensions)
+
+
+def record_upstream_call(upstream: str, status: Any) -> None:
+    """
+    実行中の計測区間に外部APIとHTTPステータスを記録する。区間内で複数回呼ばれた場合は最後の呼び出しの値になる。
+    """
+    annotate(Upstream=upstream, HttpStatus=status)
@@ -0,0 +1,148 @@
+import gzip
+import json
+import os
+import threading
+from typing import Dict, List, Optional
+
+
+# 都道府県境界データセットの既定パス（tools/build_pref_boundaries.pyで生成する）
+DEFAULT_BOUNDARY_PATH = os.path.join(os.path.dirname(__file__), 'data', 'prefectures.json.gz')
+
+
+def _decode_ring(flat_coords: List[int], scale: float) -> List[tuple]:
+    """
+    [lon1, lat1, lon2, lat2, ...] 形式の整数座標列を (lon, lat) のリストに戻す。
+    """
+    return [
+        (flat_coords[i] / scale, flat_coords[i + 1] / scale)
+        for i in range(0, len(flat_coords), 2)
+    ]
+
+
+def load_boundary_dataset(path: str) -> Dict:
+    """
+    都道府県境界データセット（gzip圧縮または非圧縮のJSON）を読み込む。
+    """
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rt', encoding='utf-8') as f:
+        return json.load(f)
+
+
+class PrefectureResolver:
+    """
+    都道府県境界ポリゴンの空間インデックスを使って、緯度経度から都道府県コードをローカルで判定する。
+
+    データセットのポリゴンは境界から一定幅だけ内側に縮小してあるため、
+    ポリゴン内に含まれる点は確実にその都道府県内と判定できる。
+    境界付近や海上の点はNoneを返し、呼び出し側でネットワークによる判定にフォールバックする。
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        """
+        Args:
+            path: データセットのパス。Noneの場合は環境変数PREF_BOUNDARY_PATHまたは既定パスを使用。
+        """
+        self.path = path or os.environ.get('PREF_BOUNDARY_PATH', DEFAULT_BOUNDARY_PATH)
+        self.version = None
+        self.margin_degrees = None
+        self._codes: List[str] = []
+        self._geometries = []
+        self._prepared = []
+        self._tree = None
+        self._loaded = False
+        self._available = False
+        self._lock = threading.Lock()
+
+    def load(self) -> bool:
+        """
+        データセットを読み込み、STRtreeを構築する。読み込み済みの場合は何もしない。
+
+        Returns:
+            ローカル判定が利用可能かどうか
+        """
+        if self._loaded:
+            return self._available
+
+        with self._lock:
+            if self._loaded:
+                return self._available
+            try:
+                from shapely.geometry import Polygon
+                from shapely.prepared import prep
+                from shapely.strtree import STRtree
+
+                dataset = load_boundary_dataset(self.path)
+                scale = 10 ** dataset.get('precision', 4)
+                for feature in dataset['features']:
+                    rings = [_decode_ring(ring, scale) for ring in feature['rings']]
+                    polygon = Polygon(rings[0], rings[1:])
+                    self._codes.append(feature['code'])
+                    self._geometries.append(polygon)
+                    self._prepared.append(prep(polygon))
+
+                self._tree = STRtree(self._geometries)
+                self.version = dataset.get('version')
+                self.margin_degrees = dataset.get('margin_degrees')
+                self._available = True
+            except FileNotFoundError:
+                print(f"Prefecture boundary dataset not found: {self.path}")
+            except ImportError as e:
+                print(f"Prefecture resolver is unavailable: {e}")
+            except (ValueError, KeyError, OSError) as e:
+                print(f"Error loading prefecture boundary dataset: {e}")
+            self._loaded = True
+            return self._available
+
+    def resolve(self, lat: float, lon: float) -> Optional[str]:
+        """
+        緯度経度から都道府県コードを判定する。
+
+        Args:
+            lat: 緯度
+            lon: 経度
+
+        Returns:
+            都道府県コード。境界付近・海上・データセット未配置の場合はNone。
+        """
+        if not self.load():
+            return None
+
+        from shapely.geometry import Point
+
+        point = Point(lon, lat)
+        # STRtreeのバウンディングボックスで候補を絞り込んでから包含判定を行う
+        for index in self._tree.query(point):
+            if self._prepared[index].contains(point):
+                return self._codes[index]
+        return None
+
+
+_resolver: Optional[PrefectureResolver] = None
+_resolver_lock = threading.Lock()
+
+
+def get_resolver() -> PrefectureResolver:
+    """
+    コンテナ内で共有される都道府県リゾルバを返す。
+    """
+    global _resolver
+    with _resolver_lock:
+        if _resolver is None:
+            _resolver = PrefectureResolver()
+        return _resolver
+
+
+def set_resolver(resolver: Optional[PrefectureResolver]) -> None:
+    """
+    共有リゾルバを差し替える（テスト用）。Noneを渡すと次回利用時に再生成する。
+    """
+    global _resolver
+    with _resolver_lock:
+        _resolver = resolver
+
+
+def resolve_pref_code(lat: float, lon: float) -> Optional[str]:
+    """
+    緯度経度から都道府県コードをローカルで判定する。判定できない場合はNone。
+    """
+    return get_resolver().resolve(lat, lon)
@@ -0,0 +1,146 @@
+import contextvars
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Dict, List, Optional
+
+from app import deadline, metrics
+from app.config import get_env_int, get_env_number
+
+
+# 事前読み込みのマニフェストの既定パス（tools/mine_hotspots.pyで生成する）
+DEFAULT_PREWARM_MANIFEST_PATH = os.path.join(os.path.dirname(__file__), 'data', 'prewarm.json')
+
+# コンテナの初期化時に事前読み込みに使う時間（秒）と同時リクエスト数（環境変数で上書き可能）
+PREWARM_BUDGET_SECONDS = get_env_number('PREWARM_BUDGET_SECONDS', 2.0)
+PREWARM_MAX_WORKERS = get_env_int('PREWARM_MAX_WORKERS', 8)
+
+MANIFEST_VERSION = 1
+
+
+def load_manifest(path: str) -> Optional[Dict]:
+    """
+    事前読み込みのマニフェストを読み込む。
+
+    マニフェストの entries は利用頻度の高い順に並んだ [住所, 緯度, 経度] のリスト。
+    座標の入力は住所がnull、座標を解決していない住所は緯度・経度がnull。
+
+    Returns:
+        マニフェストの辞書。ファイルがない・形式が正しくない場合はNone。
+    """
+    try:
+        with open(path, encoding='utf-8') as f:
+            manifest = json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        print(f"Error loading prewarm manifest: {e}")
+        return None
+    if not isinstance(manifest, dict) or manifest.get('version') != MANIFEST_VERSION:
+        print(f"Unsupported prewarm manifest: {path}")
+        return None
+    return manifest
+
+
+def _warm_entry(client, address: Optional[str], lat: Optional[float], lon: Optional[float], precision: Optional[str]) -> bool:
+    """
+    1件分のジオコーディング結果とハザード情報をキャッシュに載せる。
+    """
+    from app import geocoding
+
+    if lat is None or lon is None:
+        coordinates = geocoding.geocode(address)
+        if coordinates is None:
+            return False
+        lat, lon = coordinates
+    response = client.get_hazard_info(lat, lon, precision=precision)
+    return response.get('status') != 'error'
+
+
+def prewarm(
+    manifest: Dict,
+    budget_seconds: float = PREWARM_BUDGET_SECONDS,
+    max_workers: int = PREWARM_MAX_WORKERS,
+    precision: Optional[str] = None
+) -> Dict:
+    """
+    マニフェストの地点のジオコーディング結果とハザード情報を、コンテナ共有のキャッシュに載せる。
+    座標を解決済みの住所はAPIを呼ばずにジオコーディングのキャッシュに登録し、
+    ハザード情報は利用頻度の高い順に、時間の予算内で取得する。予算を使い切った時点で残りは読み込まない。
+
+    Args:
+        manifest: load_manifest で読み込んだマニフェスト
+        budget_seconds: 事前読み込みに使う時間（秒）
+        max_workers: 同時リクエスト数の上限
+        precision: ハザード情報の検索精度（応答時と同じキャッシュキーになるよう、応答時の精度に合わせる）
+
+    Returns:
+        事前読み込みの結果（件数・所要時間）
+    """
+    from app import geocoding, hazard_api_client
+
+    started = time.monotonic()
+    entries: List = [entry for entry in manifest.get('entries', []) if isinstance(entry, list) and len(entry) >= 3]
+    stats = {'entries': len(entries), 'geocode_primed': 0, 'warmed': 0, 'failed': 0, 'skipped': 0}
+
+    for address, lat, lon, *_ in entries:
+        if address and lat is not None and lon is not None:
+            geocoding.prime_cache(address, (lat, lon))
+            stats['geocode_primed'] += 1
+
+    try:
+        client = hazard_api_client.HazardAPIClient()
+    except ValueError as e:
+        print(f"Skipping hazard prewarm: {e}")
+        stats['skipped'] = len(entries)
+        entries = []
+
+    with metrics.span('prewarm') as prewarm_span:
+        # 外部API呼び出しに使える時間が予算と等しくなるよう、LINE返信用の予備時間を加えて期限を設定する
+        with deadline.time_budget(budget_seconds + deadline.DEADLINE_REPLY_RESERVE_SECONDS):
+            executor = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix='prewarm')
+            # 期限はContextVarで保持しているため、タスクごとにコンテキストを複製して渡す
+            futures = [
+                executor.submit(contextvars.copy_context().run, _warm_entry, client, address, lat, lon, precision)
+                for address, lat, lon, *_ in entries
+            ]
+            done, not_done = wait(futures, timeout=max(0.0, budget_seconds - (time.monotonic() - started)))
+            executor.shutdown(wait=False, cancel_futures=True)
+
+        for future in done:
+            if future.exception() is None and future.result():
+                stats['warmed'] += 1
+            else:
+                stats['failed'] += 1
+        stats['skipped'] += len(not_done)
+        prewarm_span.set(Complete=not not_done)
+
+    stats['elapsed_ms'] = round((time.monotonic() - started) * 1000, 1)
+    print(f"Prewarm: {json.dumps(stats)}")
+    return stats
+
+
+def prewarm_from_file(
+    path: Optional[str] = None,
+    budget_seconds: float = PREWARM_BUDGET_SECONDS,
+    precision: Optional[str] = None
+) -> Optional[Dict]:
+    """
+    マニフェストファイルを読み込んで事前読み込みを行う。ファイルがない場合は何もしない。
+
+    Args:
+        path: マニフェストのパス。Noneの場合は環境変数PREWARM_MANIFEST_PATHまたは既定パスを使用。
+        budget_seconds: 事前読み込みに使う時間（秒）。0以下の場合は何もしない。
+        precision: ハザード情報の検索精度
+
+    Returns:
+        事前読み込みの結果。行わなかった場合はNone。
+    """
+    path = path or os.environ.get('PREWARM_MANIFEST_PATH', DEFAULT_PREWARM_MANIFEST_PATH)
+    if budget_seconds <= 0 or not os.path.exists(path):
+        return None
+    manifest = load_manifest(path)
+    if manifest is None:
+        return None
+    return prewarm(manifest, budget_seconds, precision=precision)
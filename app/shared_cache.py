@@ -0,0 +1,392 @@
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from app import deadline
+from app.config import get_env_int, get_env_number
+
+
+# 圧縮する値の最小サイズ（バイト）
+SHARED_CACHE_COMPRESS_MIN_BYTES = get_env_int('SHARED_CACHE_COMPRESS_MIN_BYTES', 512)
+# 応答前に書き込みの完了を待つ時間の上限（秒）。リクエスト期限がある場合はその残り時間まで。
+SHARED_CACHE_FLUSH_TIMEOUT_SECONDS = get_env_number('SHARED_CACHE_FLUSH_TIMEOUT_SECONDS', 1.0)
+
+# キーの先頭に付ける形式のバージョン（値の形式を変えた場合に古いエントリを読まないようにする）
+KEY_PREFIX = 'v1'
+
+# 値の形式（先頭1バイト）
+_FORMAT_JSON = b'\x00'
+_FORMAT_ZLIB_JSON = b'\x01'
+
+# DynamoDBの1回のリクエストで扱える件数の上限
+DYNAMODB_BATCH_GET_LIMIT = 100
+DYNAMODB_BATCH_WRITE_LIMIT = 25
+
+
+def make_key(namespace: str, key: Any) -> str:
+    """
+    コンテナ間で共有するキャッシュのキー文字列を作る。タプルのキーはJSON配列として表す。
+    """
+    if not isinstance(key, str):
+        key = json.dumps(key, ensure_ascii=False, separators=(',', ':'))
+    return f'{KEY_PREFIX}:{namespace}:{key}'
+
+
+def encode_value(value: Any) -> bytes:
+    """
+    値をコンパクトなバイト列にする（JSON、一定サイズ以上はzlibで圧縮）。
+    """
+    data = json.dumps(value, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    if len(data) >= SHARED_CACHE_COMPRESS_MIN_BYTES:
+        return _FORMAT_ZLIB_JSON + zlib.compress(data)
+    return _FORMAT_JSON + data
+
+
+def decode_value(data: bytes) -> Any:
+    data = bytes(data)
+    if data[:1] == _FORMAT_ZLIB_JSON:
+        return json.loads(zlib.decompress(data[1:]))
+    if data[:1] == _FORMAT_JSON:
+        return json.loads(data[1:])
+    raise ValueError(f"unknown shared cache value format {data[:1]!r}")
+
+
+class SQLiteSharedCache:
+    """
+    SQLiteファイルに保持する共有キャッシュ。ローカル実行・テスト用（同じファイルを開くプロセス間で共有される）。
+    """
+
+    def __init__(self, path: str, clock=time.time):
+        """
+        Args:
+            path: SQLiteデータベースファイルのパス
+            clock: 現在時刻（UNIX時刻）を返す関数（テスト用に差し替え可能）
+        """
+        self.path = path
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=10, check_same_thread=False)
+        with self._conn as conn:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS shared_cache ('
+                'cache_key TEXT PRIMARY KEY, value BLOB NOT NULL, expires_at REAL NOT NULL)'
+            )
+
+    def get_many(self, keys: List[str]) -> Dict[str, bytes]:
+        if not keys:
+            return {}
+        placeholders = ','.join('?' * len(keys))
+        with self._lock:
+            rows = self._conn.execute(
+                f'SELECT cache_key, value FROM shared_cache WHERE cache_key IN ({placeholders}) AND expires_at > ?',
+                (*keys, self._clock())
+            ).fetchall()
+        return {row[0]: row[1] for row in rows}
+
+    def set_many(self, entries: List[Tuple[str, bytes, float]]) -> None:
+        now = self._clock()
+        with self._lock, self._conn as conn:
+            conn.executemany(
+                'INSERT OR REPLACE INTO shared_cache (cache_key, value, expires_at) VALUES (?, ?, ?)',
+                [(key, value, now + ttl) for key, value, ttl in entries]
+            )
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class DynamoDBSharedCache:
+    """
+    Amazon DynamoDBのテーブルに保持する共有キャッシュ。本番環境用。
+    テーブルはパーティションキー cache_key（文字列）を持ち、expires_at（UNIX時刻）をTTL属性に設定しておく。
+    DynamoDBのTTLによる削除は遅れることがあるため、読み込み時にも有効期限を確認する。
+    """
+
+    KEY_ATTRIBUTE = 'cache_key'
+    VALUE_ATTRIBUTE = 'value'
+    TTL_ATTRIBUTE = 'expires_at'
+
+    def __init__(self, table_name: str, client=None, clock=time.time):
+        """
+        Args:
+            table_name: DynamoDBのテーブル名
+            client: boto3のDynamoDBクライアント。Noneの場合は初回利用時に生成する。
+            clock: 現在時刻（UNIX時刻）を返す関数（テスト用に差し替え可能）
+        """
+        self.table_name = table_name
+        self._client = client
+        self._clock = clock
+
+    @property
+    def client(self):
+        if self._client is None:
+            import boto3
+            from botocore.config import Config
+            # キャッシュの読み書きで応答を遅らせないよう、タイムアウトを短くしリトライしない
+            self._client = boto3.client('dynamodb', config=Config(
+                connect_timeout=0.5, read_timeout=0.5, retries={'max_attempts': 1}
+            ))
+        return self._client
+
+    def get_many(self, keys: List[str]) -> Dict[str, bytes]:
+        now = self._clock()
+        found = {}
+        unique_keys = list(dict.fromkeys(keys))
+        for start in range(0, len(unique_keys), DYNAMODB_BATCH_GET_LIMIT):
+            request = {self.table_name: {
+                'Keys': [{self.KEY_ATTRIBUTE: {'S': key}} for key in unique_keys[start:start + DYNAMODB_BATCH_GET_LIMIT]],
+                'ProjectionExpression': '#k, #v, #e',
+                'ExpressionAttributeNames': {'#k': self.KEY_ATTRIBUTE, '#v': self.VALUE_ATTRIBUTE, '#e': self.TTL_ATTRIBUTE}
+            }}
+            # スロットリングなどで処理されなかったキーは1回だけ再試行し、残りはミスとして扱う
+            for _ in range(2):
+                response = self.client.batch_get_item(RequestItems=request)
+                for item in response.get('Responses', {}).get(self.table_name, []):
+                    if float(item[self.TTL_ATTRIBUTE]['N']) > now:
+                        found[item[self.KEY_ATTRIBUTE]['S']] = item[self.VALUE_ATTRIBUTE]['B']
+                request = response.get('UnprocessedKeys') or {}
+                if not request:
+                    break
+        return found
+
+    def set_many(self, entries: List[Tuple[str, bytes, float]]) -> None:
+        now = self._clock()
+        for start in range(0, len(entries), DYNAMODB_BATCH_WRITE_LIMIT):
+            request = {self.table_name: [
+                {'PutRequest': {'Item': {
+                    self.KEY_ATTRIBUTE: {'S': key},
+                    self.VALUE_ATTRIBUTE: {'B': value},
+                    self.TTL_ATTRIBUTE: {'N': str(int(now + ttl))}
+                }}}
+                for key, value, ttl in entries[start:start + DYNAMODB_BATCH_WRITE_LIMIT]
+            ]}
+            for _ in range(2):
+                response = self.client.batch_write_item(RequestItems=request)
+                request = response.get('UnprocessedItems') or {}
+                if not request:
+                    break
+
+
+class SharedCacheStats:
+    """
+    共有キャッシュの読み書き件数を集計する。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.reads = 0
+            self.hits = 0
+            self.read_errors = 0
+            self.writes = 0
+            self.write_errors = 0
+
+    def add(self, **counts) -> None:
+        with self._lock:
+            for name, count in counts.items():
+                setattr(self, name, getattr(self, name) + count)
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {
+                'reads': self.reads,
+                'hits': self.hits,
+                'hit_rate': self.hits / self.reads if self.reads else 0.0,
+                'read_errors': self.read_errors,
+                'writes': self.writes,
+                'write_errors': self.write_errors
+            }
+
+
+class SharedCache:
+    """
+    コンテナ間で共有するキャッシュ層。インメモリキャッシュの次の段として使う。
+    読み込みはまとめて行い（read-through）、書き込みはバックグラウンドのスレッドで行う（write-behind）。
+    バックエンドの障害は例外にせず、ミス・書き込み失敗として扱う。
+    """
+
+    def __init__(self, backend):
+        """
+        Args:
+            backend: get_many(keys) と set_many([(key, value, ttl)]) を持つバックエンド
+        """
+        self.backend = backend
+        self.stats = SharedCacheStats()
+        self._queue: 'queue.Queue[Tuple[str, bytes, float]]' = queue.Queue()
+        self._pending = 0
+        self._pending_changed = threading.Condition()
+        self._writer: Optional[threading.Thread] = None
+
+    def get_many(self, namespace: str, keys: Iterable[Any]) -> Dict[Any, Any]:
+        """
+        複数のキーをまとめて読み込む。
+
+        Args:
+            namespace: キーの種類（'hazard', 'geocode' など）
+            keys: キー（文字列またはタプル）
+
+        Returns:
+            {キー: 値}。見つからなかったキーは含まない。
+        """
+        keys = list(keys)
+        if not keys or deadline.is_exhausted():
+            return {}
+        shared_keys = {make_key(namespace, key): key for key in keys}
+        try:
+            found = self.backend.get_many(list(shared_keys))
+            values = {shared_keys[shared_key]: decode_value(data) for shared_key, data in found.items()}
+        except Exception as e:
+            print(f"Error reading shared cache: {e}")
+            self.stats.add(reads=len(keys), read_errors=1)
+            return {}
+        self.stats.add(reads=len(keys), hits=len(values))
+        return values
+
+    def get(self, namespace: str, key: Any, default: Any = None) -> Any:
+        values = self.get_many(namespace, [key])
+        return values[key] if key in values else default
+
+    def put(self, namespace: str, key: Any, value: Any, ttl: float) -> None:
+        """
+        値の書き込みを予約する（バックグラウンドで書き込む）。
+        """
+        entry = (make_key(namespace, key), encode_value(value), ttl)
+        with self._pending_changed:
+            self._pending += 1
+            if self._writer is None or not self._writer.is_alive():
+                self._writer = threading.Thread(target=self._write_loop, name='shared-cache-writer', daemon=True)
+                self._writer.start()
+        self._queue.put(entry)
+
+    def _write_loop(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < DYNAMODB_BATCH_WRITE_LIMIT:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self.backend.set_many(batch)
+                self.stats.add(writes=len(batch))
+            except Exception as e:
+                print(f"Error writing shared cache: {e}")
+                self.stats.add(write_errors=len(batch))
+            with self._pending_changed:
+                self._pending -= len(batch)
+                self._pending_changed.notify_all()
+
+    def flush(self, timeout: Optional[float] = None) -> int:
+        """
+        予約済みの書き込みの完了を待つ。Lambdaは応答を返すとスレッドが凍結されるため、応答前に呼び出す。
+
+        Args:
+            timeout: 待つ時間の上限（秒）。Noneの場合は完了まで待つ。
+
+        Returns:
+            完了しなかった書き込みの件数
+        """
+        with self._pending_changed:
+            self._pending_changed.wait_for(lambda: self._pending == 0, timeout)
+            return self._pending
+
+
+_UNSET = object()
+_shared_cache: Any = _UNSET
+_shared_cache_lock = threading.Lock()
+
+
+def create_shared_cache(backend: Optional[str] = None) -> Optional[SharedCache]:
+    """
+    環境変数SHARED_CACHE_BACKENDの設定に応じて共有キャッシュを生成する。
+
+    Args:
+        backend: 'none', 'sqlite', 'dynamodb' のいずれか。Noneの場合は環境変数から取得。
+
+    Returns:
+        共有キャッシュのインスタンス。'none' の場合はNone（共有キャッシュを使わない）。
+    """
+    backend = backend or os.environ.get('SHARED_CACHE_BACKEND', 'none')
+    if backend == 'none':
+        return None
+    if backend == 'sqlite':
+        return SharedCache(SQLiteSharedCache(os.environ.get('SHARED_CACHE_SQLITE_PATH', '/tmp/shared_cache.db')))
+    if backend == 'dynamodb':
+        table_name = os.environ.get('SHARED_CACHE_TABLE')
+        if not table_name:
+            raise ValueError("SHARED_CACHE_TABLE is required for the dynamodb backend.")
+        return SharedCache(DynamoDBSharedCache(table_name))
+    raise ValueError(f"Unknown shared cache backend: {backend}")
+
+
+def get_shared_cache() -> Optional[SharedCache]:
+    """
+    コンテナ内で共有される共有キャッシュを返す。共有キャッシュを使わない設定の場合はNone。
+    """
+    global _shared_cache
+    # 生成済みであればロックを取らずに返す（リクエストごとに呼ばれるため）
+    cache = _shared_cache
+    if cache is not _UNSET:
+        return cache
+    with _shared_cache_lock:
+        if _shared_cache is _UNSET:
+            try:
+                _shared_cache = create_shared_cache()
+            except ValueError as e:
+                print(f"Shared cache disabled: {e}")
+                _shared_cache = None
+        return _shared_cache
+
+
+def set_shared_cache(cache: Optional[SharedCache]) -> None:
+    """
+    共有キャッシュを差し替える（テストやローカル実行用）。Noneを渡すと共有キャッシュを使わない。
+    """
+    global _shared_cache
+    with _shared_cache_lock:
+        _shared_cache = cache
+
+
+def reset_shared_cache() -> None:
+    """
+    共有キャッシュを破棄し、次回利用時に環境変数から再生成する。
+    """
+    set_shared_cache(_UNSET)
+
+
+def flush(timeout: Optional[float] = None) -> int:
+    """
+    共有キャッシュへの書き込みの完了を待つ。待つ時間はリクエスト期限の残り時間までとする。
+
+    Returns:
+        完了しなかった書き込みの件数
+    """
+    cache = _shared_cache
+    if cache is _UNSET or cache is None:
+        return 0
+    if timeout is None:
+        timeout = SHARED_CACHE_FLUSH_TIMEOUT_SECONDS
+        left = deadline.remaining()
+        if left is not None:
+            timeout = max(0.0, min(timeout, left - deadline.DEADLINE_SAFETY_MARGIN_SECONDS))
+    pending = cache.flush(timeout)
+    if pending:
+        print(f"{pending} shared cache write(s) still pending.")
+    return pending
+
+
+def get_shared_cache_stats() -> Optional[Dict]:
+    """
+    共有キャッシュの読み書きの統計情報を返す。共有キャッシュを使わない場合はNone。
+    """
+    cache = get_shared_cache()
+    return cache.stats.snapshot() if cache is not None else None
@@ -0,0 +1,98 @@
+import threading
+from typing import Any, Callable, Dict, Hashable, Tuple
+
+from app import deadline
+
+
+class _Call:
+    """
+    実行中の1回の呼び出し。後から来た呼び出し元はdoneを待って結果を共有する。
+    """
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: BaseException | None = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    同じキーに対する同時の呼び出しを1回の実行にまとめる（リクエストの合流）。
+    グループチャットで同じ住所が続けて送られた場合などに、外部APIの重複呼び出しを防ぐ。
+    結果は保持しないため、完了後の呼び出しはキャッシュ側で扱う。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+        self.executions = 0
+        self.coalesced = 0
+        self.errors = 0
+
+    def do(self, key: Hashable, func: Callable[[], Any]) -> Tuple[Any, bool]:
+        """
+        keyに対する実行中の呼び出しがあればその完了を待って結果を共有し、なければfuncを実行する。
+        待つ時間はリクエスト期限の残り時間（LINE返信用の予備時間を除く）までとする。
+
+        Args:
+            key: 合流の単位となるキー（正規化済みのもの）
+            func: 外部APIを呼び出す関数
+
+        Returns:
+            (funcの戻り値, 他の呼び出しの結果を共有したかどうか) のタプル
+
+        Raises:
+            deadline.DeadlineExceeded: 実行中の呼び出しが期限までに完了しなかった場合
+            funcが送出した例外（待っていた呼び出し元にも同じ例外を送出する）
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                call.waiters += 1
+                self.coalesced += 1
+                leader = False
+            else:
+                call = self._calls[key] = _Call()
+                self.executions += 1
+                leader = True
+
+        if not leader:
+            left = deadline.remaining()
+            timeout = None if left is None else max(0.0, left - deadline.DEADLINE_REPLY_RESERVE_SECONDS)
+            if not call.done.wait(timeout):
+                raise deadline.DeadlineExceeded("Request deadline exceeded while waiting for a coalesced call")
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = func()
+        except BaseException as e:
+            call.error = e
+            with self._lock:
+                self.errors += 1
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+        return call.result, False
+
+    def stats(self) -> Dict[str, int]:
+        """
+        実行回数と、合流によって省略できた呼び出し回数（coalesced）を返す。
+        """
+        with self._lock:
+            return {
+                'in_flight': len(self._calls),
+                'executions': self.executions,
+                'coalesced': self.coalesced,
+                'errors': self.errors
+            }
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            self.executions = 0
+            self.coalesced = 0
+            self.errors = 0
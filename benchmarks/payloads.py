@@ -0,0 +1,116 @@
+"""
+ベンチマーク用の実データに近いペイロード。
+"""
+import base64
+import hashlib
+import hmac
+import json
+
+
+CHANNEL_SECRET = 'benchmark_channel_secret'
+
+# 全9種類のハザードタイプを含むREST APIレスポンス（土砂災害のサブ構造を含む）
+FULL_API_RESPONSE = {
+    'coordinates': {'latitude': 35.6896, 'longitude': 139.6917},
+    'source': '座標: 35.6896, 139.6917 (入力座標系: wgs84)',
+    'input_type': 'latlon',
+    'requested_hazard_types': [
+        'earthquake', 'flood', 'flood_keizoku', 'kaokutoukai_hanran', 'tsunami',
+        'high_tide', 'landslide', 'avalanche', 'large_fill_land'
+    ],
+    'hazard_info': {
+        'jshis_prob_50': {'max_prob': 0.9876, 'center_prob': 0.9543},
+        'jshis_prob_60': {'max_prob': 0.4321, 'center_prob': 0.3876},
+        'flood': {'max_info': '3m以上5m未満', 'center_info': '0.5m以上3m未満'},
+        'flood_keizoku': {'max_info': '12時間以上1日未満', 'center_info': '12時間未満'},
+        'kaokutoukai_hanran': {'max_info': '該当あり', 'center_info': '該当なし'},
+        'tsunami': {'max_info': '0.3m以上1m未満', 'center_info': '浸水想定なし'},
+        'high_tide': {'max_info': '1m以上3m未満', 'center_info': '0.5m以上1m未満'},
+        'landslide': {
+            'debris_flow': {'max_info': '土石流(警戒区域)', 'center_info': '該当なし'},
+            'steep_slope': {'max_info': '急傾斜地の崩壊(特別警戒区域)', 'center_info': '急傾斜地の崩壊(警戒区域)'},
+            'landslide': {'max_info': '該当なし', 'center_info': '該当なし'}
+        },
+        'avalanche': {'max_info': '該当なし', 'center_info': '該当なし'},
+        'large_fill_land': {'max_info': '谷埋め型大規模盛土造成地', 'center_info': '該当なし'}
+    },
+    'status': 'success'
+}
+
+# 一部のハザードタイプのみを含む疎なレスポンス
+SPARSE_API_RESPONSE = {
+    'coordinates': {'latitude': 36.7, 'longitude': 137.85},
+    'hazard_info': {
+        'jshis_prob_50': {'max_prob': 0.18, 'center_prob': 0.15},
+        'jshis_prob_60': {'max_prob': 0.03, 'center_prob': 0.02},
+        'avalanche': {'max_info': '該当あり', 'center_info': '該当あり'}
+    },
+    'status': 'success'
+}
+
+PARSER_INPUTS = [
+    '35.6586, 139.7454',
+    '  -35.6586  ,  -139.7454  ',
+    '東京都新宿区西新宿2-8-1',
+    '千代田区霞が関1-1-1',
+    'https://example.com/test',
+    'invalid, coordinates',
+]
+
+
+# 座標を直接取り出せる入力（地図URL・度分秒・漢字表記）
+COORDINATE_INPUTS = [
+    'https://www.google.com/maps/place/%E6%9D%B1%E4%BA%AC%E3%82%BF%E3%83%AF%E3%83%BC/@35.6585805,139.7428526,17z'
+    '/data=!3m1!4b1!4m6!3m5!1s0x60188bbd9009ec09:0x481a93f0d2a409dd!8m2!3d35.6585805!4d139.7454329',
+    'https://maps.gsi.go.jp/#16/35.658600/139.745400/&base=std&ls=std&disp=1&vs=c1g1j0h0k0l0u0t0z0r0s0m0f1',
+    '北緯35度39分31秒 東経139度44分43秒',
+    '35°39\'31.0"N 139°44\'43.4"E',
+]
+
+
+def build_webhook_body(texts: list) -> str:
+    """
+    テキストメッセージのイベントを含むWebhookボディを作る。
+    """
+    return json.dumps({
+        'destination': 'U0123456789abcdef0123456789abcdef',
+        'events': [
+            {
+                'type': 'message',
+                'mode': 'active',
+                'timestamp': 1640995200000 + i,
+                'source': {'type': 'user', 'userId': f'U{i:032d}'},
+                'webhookEventId': f'01FZ74A0TDDPYRVKNK77XKC3ZR{i:02d}',
+                'deliveryContext': {'isRedelivery': False},
+                'message': {'id': str(4000000 + i), 'type': 'text', 'quoteToken': 'q' * 40, 'text': text},
+                'replyToken': f'reply_token_{i:032d}'
+            }
+            for i, text in enumerate(texts)
+        ]
+    }, ensure_ascii=False)
+
+
+def sign(body: str | bytes) -> str:
+    """
+    チャネルシークレットでWebhookボディに署名する。
+    """
+    if isinstance(body, str):
+        body = body.encode('utf-8')
+    digest = hmac.new(CHANNEL_SECRET.encode('utf-8'), body, hashlib.sha256).digest()
+    return base64.b64encode(digest).decode('utf-8')
+
+
+WEBHOOK_BODY = build_webhook_body(['東京都新宿区西新宿2-8-1'])
+WEBHOOK_SIGNATURE = sign(WEBHOOK_BODY)
+
+# 複数イベントをまとめて配信された大きなWebhook（API Gatewayからbase64で渡される場合）
+LARGE_WEBHOOK_EVENTS = 100
+LARGE_WEBHOOK_BODY_BYTES = build_webhook_body(
+    [PARSER_INPUTS[i % len(PARSER_INPUTS)] for i in range(LARGE_WEBHOOK_EVENTS)]
+).encode('utf-8')
+LARGE_WEBHOOK_SIGNATURE = sign(LARGE_WEBHOOK_BODY_BYTES)
+LARGE_WEBHOOK_EVENT = {
+    'headers': {'x-line-signature': LARGE_WEBHOOK_SIGNATURE},
+    'body': base64.b64encode(LARGE_WEBHOOK_BODY_BYTES).decode('ascii'),
+    'isBase64Encoded': True
+}
@@ -0,0 +1,429 @@
+"""
+lambda_handler に実際のWebhookボディを再生して、スループットとレイテンシの分布を計測する負荷試験ハーネス。
+LINE・Google Geocoding・ハザード情報APIはローカルのスタブ（benchmarks/stub_servers.py）に向け、
+外部APIごとに応答遅延の分布とエラー率を設定できる。
+
+使い方:
+    python -m benchmarks.replay                                  # lambda-test-events/*.json を再生
+    python -m benchmarks.replay corpus.jsonl --requests 500 --concurrency 8 --rate 20
+    python -m benchmarks.replay corpus.jsonl --latency hazard=lognormal:300:0.8 --error-rate hazard=0.05
+    python -m benchmarks.replay corpus.jsonl --json report.json
+    python -m benchmarks.replay corpus.jsonl --address-strategy server   # 住所をサーバー側でジオコーディング
+
+コーパスは、Lambdaのイベント（body を持つJSON）、Webhookボディ（events を持つJSON）、
+{"text": "..."} のいずれかを1行ずつ並べたJSONL、またはそれらのJSONファイル。
+返信トークンは再生ごとに振り直し、ボディはハーネスのチャネルシークレットで署名し直す。
+"""
+import argparse
+import base64
+import contextlib
+import glob
+import io
+import json
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, List, Optional
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app import circuit_breaker, geocoding, hazard_api_client, hazard_grid, line_handler, metrics  # noqa: E402
+from app.cache import TTLCache  # noqa: E402
+from benchmarks import payloads  # noqa: E402
+from benchmarks.stub_servers import UPSTREAMS, StubServer, UpstreamBehavior  # noqa: E402
+
+DEFAULT_CORPUS = os.path.join(os.path.dirname(__file__), '..', 'lambda-test-events', '*.json')
+
+# 外部APIごとの既定の応答遅延（実測に近い裾の長い分布）
+DEFAULT_LATENCIES = {
+    'line': 'lognormal:40:0.3',
+    'geocoding': 'lognormal:80:0.4',
+    'hazard': 'lognormal:250:0.5'
+}
+
+# API Gateway の統合タイムアウトに合わせた既定のLambda残り時間
+DEFAULT_TIMEOUT_MS = 29000
+
+# レイテンシのヒストグラムの区切り（ミリ秒）
+HISTOGRAM_BOUNDS_MS = [5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000]
+
+PERCENTILES = (50, 95, 99)
+
+
+class ReplayContext:
+    """
+    Lambdaのcontextの代わり。残り時間を get_remaining_time_in_millis で返す。
+    """
+
+    def __init__(self, timeout_ms: int):
+        self._deadline = time.monotonic() + timeout_ms / 1000
+
+    def get_remaining_time_in_millis(self) -> int:
+        return max(0, int((self._deadline - time.monotonic()) * 1000))
+
+
+def _webhook_from(item) -> Optional[Dict]:
+    """
+    コーパスの1件からWebhookボディ（events を持つdict）を取り出す。取り出せない場合はNone。
+    """
+    if not isinstance(item, dict):
+        return None
+    if isinstance(item.get('events'), list):
+        return item
+    if isinstance(item.get('text'), str):
+        return json.loads(payloads.build_webhook_body([item['text']]))
+    body = item.get('body')
+    if isinstance(body, str):
+        try:
+            if item.get('isBase64Encoded'):
+                body = base64.b64decode(body).decode('utf-8')
+            body = json.loads(body)
+        except (ValueError, UnicodeDecodeError):
+            return None
+    if isinstance(body, dict) and isinstance(body.get('events'), list):
+        return body
+    return None
+
+
+def load_corpus(paths: List[str]) -> tuple:
+    """
+    コーパスファイルを読み込む。
+
+    Args:
+        paths: JSONまたはJSONLファイルのパス
+
+    Returns:
+        (Webhookボディのリスト, 読み飛ばした件数) のタプル
+    """
+    webhooks = []
+    skipped = 0
+    for path in paths:
+        with open(path, encoding='utf-8') as f:
+            if path.endswith('.jsonl'):
+                items = []
+                for line in f:
+                    if not line.strip():
+                        continue
+                    try:
+                        items.append(json.loads(line))
+                    except ValueError:
+                        items.append(None)
+            else:
+                items = [json.load(f)]
+        for item in items:
+            webhook = _webhook_from(item)
+            if webhook is None:
+                skipped += 1
+            else:
+                webhooks.append(webhook)
+    return webhooks, skipped
+
+
+def build_event(webhook: Dict, sequence: int) -> Dict:
+    """
+    返信トークンを振り直して署名したLambdaのイベントを作る。
+    テスト用の返信トークン（test_で始まる）のままだとLINEへの送信が省略されるため、必ず振り直す。
+    """
+    events = []
+    for i, event in enumerate(webhook['events']):
+        event = dict(event)
+        if 'replyToken' in event:
+            event['replyToken'] = f'replay{sequence:08d}{i:02d}'
+        events.append(event)
+    body = json.dumps({**webhook, 'events': events}, ensure_ascii=False)
+    return {
+        'headers': {'x-line-signature': payloads.sign(body)},
+        'body': body
+    }
+
+
+def percentile(values: List[float], p: float) -> float:
+    """
+    最近順位法でパーセンタイルを求める。
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * p // 100))
+    return ordered[int(rank) - 1]
+
+
+def summarize(values: List[float]) -> Dict[str, float]:
+    summary = {f'p{p}': round(percentile(values, p), 3) for p in PERCENTILES}
+    summary['max'] = round(max(values), 3) if values else 0.0
+    summary['count'] = len(values)
+    return summary
+
+
+def histogram(values: List[float], bounds: List[float] = HISTOGRAM_BOUNDS_MS) -> List[tuple]:
+    """
+    レイテンシのヒストグラムを (上限ms, 件数) のリストで返す。最後の区間の上限は None（上限なし）。
+    """
+    counts = [0] * (len(bounds) + 1)
+    for value in values:
+        for i, bound in enumerate(bounds):
+            if value <= bound:
+                counts[i] += 1
+                break
+        else:
+            counts[-1] += 1
+    return list(zip(bounds + [None], counts))
+
+
+@contextlib.contextmanager
+def replay_environment(
+    stub: StubServer,
+    disable_cache: bool = False,
+    address_strategy: str = 'client'
+) -> Iterator[metrics.ListSink]:
+    """
+    外部APIをスタブに向け、メトリクスをメモリ上に集める。
+    コンテナ共有のキャッシュ・合流の統計・サーキットの状態は開始時にリセットする（コールドな状態から再生する）。
+    """
+    sink = metrics.ListSink()
+    with contextlib.ExitStack() as stack:
+        stack.enter_context(patch.dict('os.environ', {
+            'LINE_CHANNEL_SECRET': payloads.CHANNEL_SECRET,
+            'LINE_CHANNEL_ACCESS_TOKEN': 'replay_access_token',
+            'LINE_TEST_SIGNATURE': '',
+            'GOOGLE_API_KEY': 'replay_google_key',
+            'HAZARD_MAP_API_URL': stub.url('hazard'),
+            'WEBHOOK_MODE': 'sync',
+            'ADDRESS_RESOLUTION_STRATEGY': address_strategy
+        }))
+        stack.enter_context(patch.object(line_handler, 'LINE_REPLY_API_URL', stub.url('line_reply')))
+        stack.enter_context(patch.object(line_handler, 'LINE_PUSH_API_URL', stub.url('line_push')))
+        stack.enter_context(patch.object(geocoding, 'GEOCODING_API_URL', stub.url('geocoding')))
+        if disable_cache:
+            stack.enter_context(patch.object(hazard_api_client, '_hazard_cache', TTLCache(maxsize=0)))
+            stack.enter_context(patch.object(geocoding, '_geocode_cache', TTLCache(maxsize=0)))
+
+        for cache in (hazard_api_client.get_hazard_cache(), hazard_api_client.get_last_known_good_store(),
+                      geocoding.get_geocode_cache(), geocoding.get_last_known_good_store()):
+            cache.clear()
+        hazard_api_client._hazard_flight.reset_stats()
+        hazard_grid.get_hazard_grid().reset_stats()
+        geocoding._geocode_flight.reset_stats()
+        geocoding.reset_geocode_source_stats()
+        circuit_breaker.reset_breakers()
+
+        previous_sink = metrics.get_sink()
+        metrics.set_sink(sink)
+        stack.callback(metrics.set_sink, previous_sink)
+        yield sink
+
+
+def replay(
+    webhooks: List[Dict],
+    requests: int,
+    concurrency: int = 4,
+    rate: float = 0.0,
+    behaviors: Optional[Dict[str, UpstreamBehavior]] = None,
+    timeout_ms: int = DEFAULT_TIMEOUT_MS,
+    disable_cache: bool = False,
+    seed: Optional[int] = None,
+    address_strategy: str = 'client'
+) -> Dict:
+    """
+    Webhookボディを lambda_handler に再生し、計測結果のレポートを返す。
+
+    Args:
+        webhooks: 再生するWebhookボディ（足りない場合は先頭から繰り返す）
+        requests: 再生するリクエスト数
+        concurrency: 同時に処理するリクエスト数（Lambdaの同時実行数に相当）
+        rate: 到着レート（リクエスト/秒、ポアソン到着）。0の場合は空きができ次第つぎを送る（クローズドループ）
+        behaviors: 外部APIごとのスタブの振る舞い
+        timeout_ms: 各リクエストに与えるLambdaの残り時間（ミリ秒）
+        disable_cache: ハザード情報・ジオコーディングのキャッシュを無効化するかどうか
+        seed: 到着間隔とスタブの遅延・エラーの乱数シード
+        address_strategy: 住所の座標の解決方法（'client', 'server', 'race'）
+
+    Returns:
+        レイテンシ・ステージ別の内訳・外部APIの呼び出し回数などを含むレポート
+    """
+    import lambda_function
+
+    if not webhooks:
+        raise ValueError("corpus is empty")
+    events = [build_event(webhooks[i % len(webhooks)], i) for i in range(requests)]
+    rng = random.Random(seed)
+    results = []
+    results_lock = threading.Lock()
+
+    def invoke(event: Dict, scheduled: Optional[float]) -> None:
+        started = time.perf_counter()
+        try:
+            status = lambda_function.lambda_handler(event, ReplayContext(timeout_ms)).get('statusCode')
+        except Exception as e:
+            status = f'exception:{type(e).__name__}'
+        finished = time.perf_counter()
+        with results_lock:
+            # オープンループでは到着予定時刻からの時間をレイテンシとする（待ち行列での待ち時間を含める）
+            results.append(((finished - (scheduled or started)) * 1000, (finished - started) * 1000, status))
+
+    with StubServer(behaviors, seed=seed) as stub, replay_environment(stub, disable_cache, address_strategy) as sink:
+        wall_started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='replay') as executor:
+            arrival = wall_started
+            for event in events:
+                if rate > 0:
+                    arrival += rng.expovariate(rate)
+                    delay = arrival - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+                    executor.submit(invoke, event, arrival)
+                else:
+                    executor.submit(invoke, event, None)
+        wall_seconds = time.perf_counter() - wall_started
+
+        stages = defaultdict(list)
+        for record in sink.stage_latencies():
+            stages[record['Stage']].append(record[metrics.STAGE_LATENCY_METRIC])
+        upstream_calls = stub.call_counts()
+
+        latencies = [latency for latency, _, _ in results]
+        return {
+            'requests': len(results),
+            'concurrency': concurrency,
+            'arrival_rate': rate,
+            'address_strategy': address_strategy,
+            'wall_seconds': round(wall_seconds, 3),
+            'throughput_rps': round(len(results) / wall_seconds, 3) if wall_seconds else 0.0,
+            'status_codes': dict(Counter(str(status) for _, _, status in results)),
+            'latency_ms': summarize(latencies),
+            'service_time_ms': summarize([service for _, service, _ in results]),
+            'histogram': [{'le_ms': bound, 'count': count} for bound, count in histogram(latencies)],
+            'stages_ms': {stage: summarize(values) for stage, values in sorted(stages.items())},
+            'upstream_calls': upstream_calls,
+            'upstream_latency': {name: stub.behaviors[name].latency.spec for name in UPSTREAMS},
+            'upstream_error_rate': {name: stub.behaviors[name].error_rate for name in UPSTREAMS},
+            'cache': {
+                'hazard': hazard_api_client.get_hazard_cache_stats(),
+                'hazard_snapshot': hazard_grid.get_snapshot_stats(),
+                'geocode_sources': geocoding.get_geocode_source_stats()
+            },
+            'coalescing': {
+                'hazard': hazard_api_client.get_hazard_coalescing_stats(),
+                'geocoding': geocoding.get_geocode_coalescing_stats()
+            },
+            'circuits': circuit_breaker.get_circuit_stats()
+        }
+
+
+def format_report(report: Dict) -> str:
+    """
+    レポートを端末表示用のテキストにする。
+    """
+    def row(name: str, summary: Dict) -> str:
+        return (f"  {name:<28} {summary['count']:>7} {summary['p50']:>10.1f} {summary['p95']:>10.1f}"
+                f" {summary['p99']:>10.1f} {summary['max']:>10.1f}")
+
+    header = f"  {'':<28} {'count':>7} {'p50(ms)':>10} {'p95(ms)':>10} {'p99(ms)':>10} {'max(ms)':>10}"
+    lines = [
+        f"requests: {report['requests']}  concurrency: {report['concurrency']}  "
+        f"arrival rate: {report['arrival_rate'] or 'closed loop'}  wall: {report['wall_seconds']}s  "
+        f"throughput: {report['throughput_rps']} req/s",
+        f"status codes: {report['status_codes']}  address strategy: {report['address_strategy']}",
+        '',
+        'latency:',
+        header,
+        row('end-to-end', report['latency_ms']),
+        row('service time', report['service_time_ms']),
+        '',
+        'stages:',
+        header
+    ]
+    lines += [row(stage, summary) for stage, summary in report['stages_ms'].items()]
+
+    lines += ['', 'latency histogram:']
+    total = max(1, report['requests'])
+    for bucket in report['histogram']:
+        label = f"<= {bucket['le_ms']}ms" if bucket['le_ms'] is not None else f"> {HISTOGRAM_BOUNDS_MS[-1]}ms"
+        bar = '#' * round(40 * bucket['count'] / total)
+        lines.append(f"  {label:>10} {bucket['count']:>7} {bar}")
+
+    lines += ['', 'upstream calls:']
+    for name, counts in report['upstream_calls'].items():
+        lines.append(f"  {name:<10} calls: {counts['calls']:>6}  errors: {counts['errors']:>6}  "
+                     f"latency: {report['upstream_latency'][name]}  error rate: {report['upstream_error_rate'][name]}")
+    lines.append(f"circuits: { {name: stats['state'] for name, stats in report['circuits'].items()} }")
+    return '\n'.join(lines)
+
+
+def _parse_assignments(values: List[str], option: str) -> Dict[str, str]:
+    parsed = {}
+    for value in values or []:
+        name, sep, spec = value.partition('=')
+        if not sep or name not in UPSTREAMS:
+            raise argparse.ArgumentTypeError(f"{option} expects UPSTREAM=VALUE with UPSTREAM in {UPSTREAMS}: {value}")
+        parsed[name] = spec
+    return parsed
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description='Replay webhook bodies against lambda_handler with stubbed upstreams.')
+    parser.add_argument('corpus', nargs='*', help='JSON / JSONL corpus files (default: lambda-test-events/*.json)')
+    parser.add_argument('--requests', type=int, default=0, help='number of requests to replay (default: corpus size)')
+    parser.add_argument('--concurrency', type=int, default=4, help='concurrent invocations')
+    parser.add_argument('--rate', type=float, default=0.0, help='Poisson arrival rate in req/s (0: closed loop)')
+    parser.add_argument('--latency', action='append', metavar='UPSTREAM=SPEC',
+                        help='upstream latency, e.g. hazard=lognormal:250:0.5, line=fixed:30')
+    parser.add_argument('--error-rate', action='append', metavar='UPSTREAM=RATE', help='e.g. hazard=0.05')
+    parser.add_argument('--timeout-ms', type=int, default=DEFAULT_TIMEOUT_MS, help='remaining time given to each invocation')
+    parser.add_argument('--disable-cache', action='store_true', help='disable the hazard and geocoding caches')
+    parser.add_argument('--address-strategy', choices=['client', 'server', 'race'], default='client',
+                        help='how addresses are resolved to coordinates')
+    parser.add_argument('--seed', type=int, default=None, help='random seed for arrivals and stub behavior')
+    parser.add_argument('--json', dest='json_path', help='also write the report as JSON to this path')
+    parser.add_argument('--verbose', action='store_true', help='keep the application log output')
+    args = parser.parse_args(argv)
+
+    try:
+        latencies = {**DEFAULT_LATENCIES, **_parse_assignments(args.latency, '--latency')}
+        error_rates = _parse_assignments(args.error_rate, '--error-rate')
+        behaviors = {
+            name: UpstreamBehavior(latencies[name], float(error_rates.get(name, 0.0)))
+            for name in UPSTREAMS
+        }
+    except (argparse.ArgumentTypeError, ValueError) as e:
+        parser.error(str(e))
+
+    paths = args.corpus or sorted(glob.glob(DEFAULT_CORPUS))
+    webhooks, skipped = load_corpus(paths)
+    if skipped:
+        print(f"Skipped {skipped} corpus entries without webhook events.")
+    if not webhooks:
+        print("No webhook bodies found in the corpus.")
+        return 1
+
+    # アプリケーションのログ（返信APIのレスポンスなど）は既定で捨てる
+    output = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+    with output:
+        report = replay(
+            webhooks,
+            requests=args.requests or len(webhooks),
+            concurrency=args.concurrency,
+            rate=args.rate,
+            behaviors=behaviors,
+            timeout_ms=args.timeout_ms,
+            disable_cache=args.disable_cache,
+            seed=args.seed,
+            address_strategy=args.address_strategy
+        )
+
+    print(format_report(report))
+    if args.json_path:
+        with open(args.json_path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+            f.write('\n')
+        print(f"Report written to {args.json_path}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,261 @@
+"""
+リクエストごとに実行される純Pythonのホットパスのマイクロベンチマーク。
+
+使い方:
+    python -m benchmarks.run_benchmarks                  # 実行してベースラインと比較
+    python -m benchmarks.run_benchmarks --update-baseline
+    python -m benchmarks.run_benchmarks --threshold 0.3 --filter formatter
+
+ベースラインより threshold（既定25%）を超えて遅くなったベンチマークがあれば終了コード1を返す。
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import sys
+import timeit
+from typing import Callable, Dict, Iterator
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app import display_formatter, hazard_api_client, input_parser, line_handler, metrics  # noqa: E402
+from benchmarks import payloads  # noqa: E402
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), 'baseline.json')
+DEFAULT_THRESHOLD = 0.25
+
+BENCHMARKS: Dict[str, Callable[[], contextlib.AbstractContextManager]] = {}
+
+
+def benchmark(name: str):
+    """
+    ベンチマークを登録するデコレータ。
+    登録する関数は、計測対象の呼び出しをyieldするジェネレータとして書く（前後で準備・後始末を行える）。
+    """
+    def decorator(func):
+        BENCHMARKS[name] = contextlib.contextmanager(func)
+        return func
+    return decorator
+
+
+@benchmark('input_parser.parse_input_type')
+def bench_parse_input_type() -> Iterator[Callable]:
+    inputs = payloads.PARSER_INPUTS
+
+    def run():
+        for text in inputs:
+            input_parser.parse_input_type(text)
+    yield run
+
+
+@benchmark('input_parser.extract_coordinates')
+def bench_extract_coordinates() -> Iterator[Callable]:
+    inputs = payloads.COORDINATE_INPUTS
+
+    def run():
+        for text in inputs:
+            input_parser.extract_coordinates(text)
+    yield run
+
+
+@benchmark('line_handler.validate_signature')
+def bench_validate_signature() -> Iterator[Callable]:
+    body, signature = payloads.WEBHOOK_BODY, payloads.WEBHOOK_SIGNATURE
+    with patch.dict('os.environ', {'LINE_TEST_SIGNATURE': 'not_used_in_benchmark'}):
+        yield lambda: line_handler.validate_signature(body, signature, payloads.CHANNEL_SECRET)
+
+
+@benchmark('lambda_function.webhook_ingestion_large_body')
+def bench_webhook_ingestion_large_body() -> Iterator[Callable]:
+    """
+    base64のデコード、バイト列に対する署名検証、イベントの解析までを、100イベントのボディで計測する。
+    返信と応答文の生成は計測対象外にする。
+    """
+    import lambda_function
+
+    event = payloads.LARGE_WEBHOOK_EVENT
+    with contextlib.ExitStack() as stack:
+        stack.enter_context(patch.dict('os.environ', {
+            'LINE_CHANNEL_SECRET': payloads.CHANNEL_SECRET,
+            'LINE_TEST_SIGNATURE': 'not_used_in_benchmark'
+        }))
+        stack.enter_context(patch.object(line_handler, 'reply_message', return_value={'success': True}))
+        previous_sink = metrics.get_sink()
+        metrics.set_sink(None)
+        stack.callback(metrics.set_sink, previous_sink)
+
+        def run():
+            body = lambda_function._read_body(event)
+            line_handler.handle_line_event(body, event['headers']['x-line-signature'], str)
+        yield run
+
+
+@benchmark('hazard_grid.lookup')
+def bench_hazard_grid_lookup() -> Iterator[Callable]:
+    """
+    事前計算のスナップショットからの取得（セル位置の計算、値のコードの復元）を計測する。
+    """
+    import tempfile
+    from app.hazard_grid import HazardGrid, HazardGridWriter, iter_cells, make_region
+
+    regions = [make_region('benchmark', 35.60, 139.60, 35.70, 139.80, step=0.001)]
+    writer = HazardGridWriter(regions)
+    for region_index, row, col, _, _ in iter_cells(regions):
+        writer.set_cell(region_index, row, col, payloads.FULL_API_RESPONSE if col % 2 else payloads.SPARSE_API_RESPONSE)
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'hazard_grid.bin')
+        writer.write(path, {'version': 'benchmark'})
+        grid = HazardGrid(path)
+        grid.load()
+
+        def run():
+            grid.lookup(35.6896, 139.6917)
+            grid.lookup(35.6512, 139.7013)
+        yield run
+        grid.close()
+
+
+@benchmark('hazard_api_client.convert_api_response_to_legacy_format')
+def bench_convert_legacy() -> Iterator[Callable]:
+    full, sparse = payloads.FULL_API_RESPONSE, payloads.SPARSE_API_RESPONSE
+
+    def run():
+        hazard_api_client.convert_api_response_to_legacy_format(full)
+        hazard_api_client.convert_api_response_to_legacy_format(sparse)
+    yield run
+
+
+@benchmark('display_formatter.format_all_hazard_info_for_display')
+def bench_format_for_display() -> Iterator[Callable]:
+    full = hazard_api_client.convert_api_response_to_legacy_format(payloads.FULL_API_RESPONSE)
+    sparse = hazard_api_client.convert_api_response_to_legacy_format(payloads.SPARSE_API_RESPONSE)
+
+    def run():
+        display_formatter.format_all_hazard_info_for_display(full)
+        display_formatter.format_all_hazard_info_for_display(sparse)
+    yield run
+
+
+@benchmark('display_formatter.format_api_response_for_display')
+def bench_format_api_response() -> Iterator[Callable]:
+    full, sparse = payloads.FULL_API_RESPONSE, payloads.SPARSE_API_RESPONSE
+
+    def run():
+        display_formatter.format_api_response_for_display(full)
+        display_formatter.format_api_response_for_display(sparse)
+    yield run
+
+
+@benchmark('lambda_function.get_hazard_response')
+def bench_get_hazard_response() -> Iterator[Callable]:
+    import lambda_function
+
+    with contextlib.ExitStack() as stack:
+        stack.enter_context(patch.dict('os.environ', {'HAZARD_MAP_API_URL': 'https://hazard.invalid/'}))
+        stack.enter_context(patch.object(
+            lambda_function.geocoding, 'geocode', return_value=(35.6896, 139.6917)
+        ))
+        stack.enter_context(patch.object(
+            hazard_api_client.HazardAPIClient, '_make_request', return_value=payloads.FULL_API_RESPONSE
+        ))
+        # メトリクスはシリアライズまで行い、端末への出力は行わない
+        previous_sink = metrics.get_sink()
+        metrics.set_sink(lambda record: json.dumps(record, ensure_ascii=False))
+        stack.callback(metrics.set_sink, previous_sink)
+        # キャッシュを無効化し、毎回変換・整形まで実行されるようにする
+        stack.enter_context(patch.object(hazard_api_client, '_hazard_cache', hazard_api_client.TTLCache(maxsize=0)))
+
+        def run():
+            lambda_function.get_hazard_response('35.6896, 139.6917')
+            lambda_function.get_hazard_response('東京都新宿区西新宿2-8-1')
+        yield run
+
+
+def measure(func: Callable, repeat: int = 5, min_time: float = 0.2) -> float:
+    """
+    1回の呼び出しあたりの所要時間（マイクロ秒）を計測する。repeat回のうち最小値を採用する。
+    """
+    timer = timeit.Timer(func)
+    number, elapsed = timer.autorange()
+    if elapsed < min_time:
+        number = max(number, int(number * min_time / max(elapsed, 1e-9)))
+    best = min(timer.repeat(repeat=repeat, number=number))
+    return best / number * 1e6
+
+
+def run_benchmarks(name_filter: str = '') -> Dict[str, float]:
+    results = {}
+    for name, factory in BENCHMARKS.items():
+        if name_filter and name_filter not in name:
+            continue
+        with factory() as func:
+            func()  # ウォームアップ
+            results[name] = measure(func)
+    return results
+
+
+def load_baseline(path: str = BASELINE_PATH) -> Dict:
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_baseline(results: Dict[str, float], path: str = BASELINE_PATH) -> None:
+    baseline = load_baseline(path)
+    baseline.setdefault('results_us', {}).update({name: round(value, 3) for name, value in results.items()})
+    baseline['environment'] = {
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'machine': platform.machine(),
+        'system': platform.system()
+    }
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(baseline, f, indent=2, ensure_ascii=False, sort_keys=True)
+        f.write('\n')
+
+
+def compare(results: Dict[str, float], baseline: Dict, threshold: float) -> list:
+    """
+    ベースラインと比較し、閾値を超えて遅くなったベンチマーク名のリストを返す。
+    """
+    regressions = []
+    baseline_results = baseline.get('results_us', {})
+    print(f"{'benchmark':<60} {'current(us)':>12} {'baseline(us)':>13} {'change':>8}")
+    for name, value in results.items():
+        base = baseline_results.get(name)
+        if base:
+            change = value / base - 1
+            flag = '  REGRESSION' if change > threshold else ''
+            print(f"{name:<60} {value:>12.2f} {base:>13.2f} {change:>+7.1%}{flag}")
+            if change > threshold:
+                regressions.append(name)
+        else:
+            print(f"{name:<60} {value:>12.2f} {'-':>13} {'new':>8}")
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description='Run micro-benchmarks for the per-request hot paths.')
+    parser.add_argument('--update-baseline', action='store_true', help='store the current numbers as baseline')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD, help='allowed slowdown ratio')
+    parser.add_argument('--filter', default='', help='only run benchmarks whose name contains this string')
+    parser.add_argument('--baseline', default=BASELINE_PATH, help='baseline file path')
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.filter)
+    if args.update_baseline:
+        save_baseline(results, args.baseline)
+        print(f"Baseline updated: {args.baseline}")
+
+    regressions = compare(results, load_baseline(args.baseline), args.threshold)
+    if regressions:
+        print(f"{len(regressions)} benchmark(s) regressed by more than {args.threshold:.0%}.")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
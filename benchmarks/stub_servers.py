@@ -0,0 +1,253 @@
+"""
+負荷試験用の外部APIスタブ（LINE Messaging API・Google Geocoding API・ハザード情報API）。
+1つのローカルHTTPサーバーでパスごとに応答し、外部APIごとに応答遅延の分布とエラー率を設定できる。
+"""
+import json
+import random
+import threading
+import time
+import zlib
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+from urllib.parse import parse_qs, urlparse
+
+from benchmarks import payloads
+
+
+UPSTREAMS = ('line', 'geocoding', 'hazard')
+
+# 各外部APIのパス（LINEは返信・プッシュの両方を受け付ける）
+LINE_REPLY_PATH = '/v2/bot/message/reply'
+LINE_PUSH_PATH = '/v2/bot/message/push'
+GEOCODING_PATH = '/maps/api/geocode/json'
+HAZARD_PATH = '/hazard'
+
+REVERSE_GEOCODE_ADDRESS = '日本、〒163-8001 東京都新宿区西新宿２丁目８−１'
+
+
+class LatencyModel:
+    """
+    応答遅延の分布。仕様は「種類:パラメータ」の文字列で指定する（単位はミリ秒）。
+
+        fixed:50            常に50ms
+        uniform:20:80       20〜80msの一様分布
+        normal:100:20       平均100ms・標準偏差20msの正規分布（0未満は0）
+        lognormal:150:0.5   中央値150ms・σ=0.5の対数正規分布（裾の長い実際のAPIに近い）
+    """
+
+    KINDS = {'fixed': 1, 'uniform': 2, 'normal': 2, 'lognormal': 2}
+
+    def __init__(self, spec: str):
+        kind, *params = spec.split(':')
+        if kind not in self.KINDS or len(params) != self.KINDS[kind]:
+            raise ValueError(f"invalid latency spec: {spec!r}")
+        try:
+            self.params = [float(p) for p in params]
+        except ValueError:
+            raise ValueError(f"invalid latency spec: {spec!r}") from None
+        self.kind = kind
+        self.spec = spec
+
+    def sample(self, rng: random.Random) -> float:
+        """
+        遅延を1つ取り出す（秒）。
+        """
+        if self.kind == 'fixed':
+            ms = self.params[0]
+        elif self.kind == 'uniform':
+            ms = rng.uniform(*self.params)
+        elif self.kind == 'normal':
+            ms = rng.gauss(*self.params)
+        else:
+            median, sigma = self.params
+            ms = median * rng.lognormvariate(0.0, sigma)
+        return max(0.0, ms) / 1000
+
+
+class UpstreamBehavior:
+    """
+    外部API1つ分の振る舞い（応答遅延とエラー率）。
+    """
+
+    def __init__(self, latency: str = 'fixed:0', error_rate: float = 0.0, error_status: int = 503):
+        """
+        Args:
+            latency: LatencyModelの仕様文字列
+            error_rate: エラー応答を返す割合（0〜1）
+            error_status: エラー時に返すHTTPステータス
+        """
+        if not 0.0 <= error_rate <= 1.0:
+            raise ValueError(f"error rate must be between 0 and 1: {error_rate}")
+        self.latency = LatencyModel(latency)
+        self.error_rate = error_rate
+        self.error_status = error_status
+
+
+class StubServer:
+    """
+    外部APIスタブのHTTPサーバー。start()でバックグラウンドのスレッドで待ち受ける。
+
+    使用例:
+        with StubServer({'hazard': UpstreamBehavior('lognormal:150:0.5', 0.01)}) as stub:
+            os.environ['HAZARD_MAP_API_URL'] = stub.url('hazard')
+    """
+
+    def __init__(self, behaviors: Optional[Dict[str, UpstreamBehavior]] = None, seed: Optional[int] = None):
+        unknown = set(behaviors or {}) - set(UPSTREAMS)
+        if unknown:
+            raise ValueError(f"unknown upstream(s): {', '.join(sorted(unknown))}")
+        self.behaviors = {name: (behaviors or {}).get(name) or UpstreamBehavior() for name in UPSTREAMS}
+        self._rng = random.Random(seed)
+        self._rng_lock = threading.Lock()
+        self._calls: Counter = Counter()  # (外部API, HTTPステータス) -> 回数
+        self._calls_lock = threading.Lock()
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> 'StubServer':
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), _make_handler(self))
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, name='stub-upstreams', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self) -> 'StubServer':
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def url(self, endpoint: str) -> str:
+        """
+        エンドポイントのURLを返す（'line_reply' / 'line_push' / 'geocoding' / 'hazard'）。
+        """
+        paths = {
+            'line_reply': LINE_REPLY_PATH,
+            'line_push': LINE_PUSH_PATH,
+            'geocoding': GEOCODING_PATH,
+            'hazard': HAZARD_PATH
+        }
+        return self.base_url + paths[endpoint]
+
+    def decide(self, upstream: str) -> tuple:
+        """
+        1回の呼び出しの (遅延秒数, エラーにするかどうか) を決める。
+        """
+        behavior = self.behaviors[upstream]
+        with self._rng_lock:
+            return behavior.latency.sample(self._rng), self._rng.random() < behavior.error_rate
+
+    def record(self, upstream: str, status: int) -> None:
+        with self._calls_lock:
+            self._calls[(upstream, status)] += 1
+
+    def call_counts(self) -> Dict[str, Dict]:
+        """
+        外部APIごとの呼び出し回数とエラー応答の回数を返す。
+        """
+        with self._calls_lock:
+            calls = dict(self._calls)
+        counts = {name: {'calls': 0, 'errors': 0} for name in UPSTREAMS}
+        for (upstream, status), count in calls.items():
+            counts[upstream]['calls'] += count
+            if status >= 400:
+                counts[upstream]['errors'] += count
+        return counts
+
+
+def _geocode_location(address: str) -> Dict[str, float]:
+    """
+    住所から決定的な座標を作る（同じ住所には同じ座標を返し、住所ごとにキャッシュキーが分かれるようにする）。
+    """
+    digest = zlib.crc32(address.encode('utf-8'))
+    return {
+        'lat': round(33.0 + (digest % 30000) / 10000, 6),
+        'lng': round(132.0 + (digest // 30000 % 80000) / 10000, 6)
+    }
+
+
+def _make_handler(stub: StubServer):
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        # ヘッダーと本文を別々に書き込むため、Nagleアルゴリズムによる遅延（約40ms）を避ける
+        disable_nagle_algorithm = True
+
+        def do_GET(self):
+            self._dispatch()
+
+        def do_POST(self):
+            length = int(self.headers.get('Content-Length') or 0)
+            if length:
+                self.rfile.read(length)
+            self._dispatch()
+
+        def _dispatch(self):
+            parsed = urlparse(self.path)
+            if parsed.path in (LINE_REPLY_PATH, LINE_PUSH_PATH):
+                upstream = 'line'
+            elif parsed.path == GEOCODING_PATH:
+                upstream = 'geocoding'
+            elif parsed.path.startswith(HAZARD_PATH):
+                upstream = 'hazard'
+            else:
+                self._send(404, {'message': 'not found'})
+                return
+
+            delay, failed = stub.decide(upstream)
+            if delay:
+                time.sleep(delay)
+            if failed:
+                status = stub.behaviors[upstream].error_status
+                stub.record(upstream, status)
+                self._send(status, {'message': 'injected error'})
+                return
+
+            stub.record(upstream, 200)
+            if upstream == 'line':
+                self._send(200, {})
+            elif upstream == 'geocoding':
+                self._send(200, self._geocoding_body(parse_qs(parsed.query)))
+            else:
+                self._send(200, self._hazard_body(parse_qs(parsed.query)))
+
+        def _geocoding_body(self, query: Dict) -> Dict:
+            if 'latlng' in query:
+                return {'status': 'OK', 'results': [{'formatted_address': REVERSE_GEOCODE_ADDRESS}]}
+            address = (query.get('address') or [''])[0]
+            if not address:
+                return {'status': 'ZERO_RESULTS', 'results': []}
+            return {'status': 'OK', 'results': [{'geometry': {'location': _geocode_location(address)}}]}
+
+        def _hazard_body(self, query: Dict) -> Dict:
+            # input= で住所を渡された場合は、サーバー側でジオコーディングしたものとして座標を返す
+            address = (query.get('input') or [''])[0]
+            if not address:
+                return payloads.FULL_API_RESPONSE
+            location = _geocode_location(address)
+            return {**payloads.FULL_API_RESPONSE, 'coordinates': {'latitude': location['lat'], 'longitude': location['lng']}}
+
+        def _send(self, status: int, body: Dict) -> None:
+            data = json.dumps(body, ensure_ascii=False).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json; charset=utf-8')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
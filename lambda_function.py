@@ -1,67 +1,283 @@
+import base64
+import binascii
+import contextvars
+import importlib
 import json
-from app import input_parser, geocoding, line_handler, hazard_api_client, display_formatter
+import os
+import sys
+import threading
 
-def get_formatted_hazard_data(text: str) -> tuple[str, dict | None]:
+from app import import_profile
+import_profile.install_from_env()
+
+from app import metrics, deadline  # noqa: E402
+from app.config import get_env_int  # noqa: E402
+
+# HTTPクライアントや表示整形のモジュールは初回利用時に読み込む。
+# 署名エラーや不正なイベントの応答ではこれらを読み込まずに済み、コールドスタートが短くなる。
+_LAZY_MODULES = {'input_parser', 'geocoding', 'address_resolver', 'line_handler', 'hazard_api_client', 'display_formatter', 'event_queue'}
+
+
+def __getattr__(name):
     """
-    ユーザー入力に基づいてハザード情報を取得し、整形されたデータを返す。
-    エラーメッセージと整形済みハザード情報のタプルを返す。
+    lambda_function.geocoding のようなアクセスで app 配下のモジュールを遅延読み込みする。
     """
-    input_type, value = input_parser.parse_input_type(text)
+    if name in _LAZY_MODULES:
+        module = importlib.import_module(f'app.{name}')
+        globals()[name] = module
+        return module
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def _resolve_location(
+    text: str,
+    precision: str | None = None
+) -> tuple[str | None, float | None, float | None, str, list[str] | None]:
+    """
+    ユーザー入力から座標と、メッセージで指定されたハザードタイプを特定する。
+    (エラーメッセージ, 緯度, 経度, 冒頭の案内文, ハザードタイプ) のタプルを返す。
+    ハザードタイプが指定されていない場合はNone（すべてのタイプを取得する）。
+    precisionは続けて行うハザード情報の検索精度（住所をサーバー側で解決する場合に、同じ条件で取得しておく）。
+    """
+    from app import input_parser, address_resolver
+
+    with metrics.span('parse') as parse_span:
+        location_text, hazard_types = input_parser.extract_hazard_types(text)
+        input_type, value = input_parser.parse_input_type(location_text)
+        parse_span.set(InputType=input_type, HazardFilter=bool(hazard_types))
     lat, lon = None, None
     address_info = ""
 
     if input_type == 'latlon':
-        try:
-            lat, lon = map(float, value.split(','))
-            address_info = f"座標「{value}」のハザード情報です。"
-        except ValueError:
-            return "緯度・経度の形式が正しくありません。例: 35.6586, 139.7454", None, ""
+        coordinates = input_parser.parse_latlon(value)
+        if coordinates is None:
+            return "緯度・経度の形式が正しくありません。例: 35.6586, 139.7454", None, None, "", None
+        lat, lon = coordinates
+        address_info = f"座標「{value}」のハザード情報です。"
 
     elif input_type == 'invalid_url':
-        return "無効なURLです。住所または緯度経度を入力してください。", None, ""
+        return "無効なURLです。住所または緯度経度を入力してください。", None, None, "", None
     
-    elif input_type == 'address':
-        lat, lon = geocoding.geocode(value)
+    elif input_type == 'address' and value.strip():
+        try:
+            coordinates = address_resolver.resolve_address(value, hazard_types=hazard_types, precision=precision)
+            lat, lon = coordinates or (None, None)
+        except deadline.DeadlineExceeded as e:
+            print(f"Geocoding skipped: {e}")
+            return deadline.TIMEOUT_MESSAGE, None, None, "", None
         address_info = f"「{value}」周辺のハザード情報です。"
 
     if lat is None or lon is None:
-        return "場所を特定できませんでした。住所やURLを確認してください。", None, ""
+        if deadline.is_exhausted():
+            return deadline.TIMEOUT_MESSAGE, None, None, "", None
+        return "場所を特定できませんでした。住所やURLを確認してください。", None, None, "", None
+
+    return None, lat, lon, address_info, hazard_types
+
+def _fetch_formatted_hazards(
+    lat: float,
+    lon: float,
+    precision: str | None = None,
+    hazard_types: list[str] | None = None,
+    allow_stale: bool = True,
+    allow_partial: bool = True
+) -> tuple[str | None, dict | None, str | None, str | None]:
+    """
+    座標のハザード情報を取得し、表示用に整形する。
+    (エラーメッセージ, 整形済みハザード情報, 注記, スナップショットの注記) のタプルを返す。
+    hazard_typesを指定した場合は、そのタイプだけを取得・表示する。
+    外部APIの障害時に最後に取得できた結果が返された場合や、並行取得で一部の項目を得られなかった場合は注記を付ける。
+    allow_stale・allow_partial がFalseの場合は、それぞれの結果もエラーとして扱う。
+    スナップショット（格子の代表点による近似）から応答した場合の注記は、結果の欠損を表す注記とは別に返す。
+    """
+    from app import hazard_api_client, display_formatter
 
     # ハザード情報を取得 (REST API経由)
     try:
-        api_client = hazard_api_client.HazardAPIClient()
-        api_response = api_client.get_hazard_info(lat, lon)
-        raw_hazards = hazard_api_client.convert_api_response_to_legacy_format(api_response)
+        with metrics.span('hazard_fetch') as fetch_span:
+            if precision:
+                fetch_span.set(Precision=precision)
+            api_client = hazard_api_client.HazardAPIClient()
+            if hazard_api_client.is_fanout_enabled():
+                # ハザードタイプのグループごとに並行に取得し、期限までに得られた分で応答する
+                api_response = api_client.get_hazard_info_fanout(lat, lon, hazard_types=hazard_types, precision=precision)
+            else:
+                api_response = api_client.get_hazard_info(lat, lon, hazard_types=hazard_types, precision=precision)
+            fetch_span.set(ResponseStatus=api_response.get('status', 'unknown'))
+        # 残り時間が尽きてタイムアウトした場合は、データなしと誤解されないよう専用のメッセージを返す
+        if api_response.get('status') == 'error' and deadline.is_exhausted():
+            return deadline.TIMEOUT_MESSAGE, None, None, None
+        # エラーレスポンスを「データなし」として表示しないよう、取得失敗として扱う
+        if api_response.get('status') == 'error':
+            return f"ハザード情報の取得に失敗しました。エラー: {api_response.get('error_message')}", None, None, None
+        if api_response.get('stale') and not allow_stale:
+            return f"ハザード情報の取得に失敗しました。エラー: {api_response['stale'].get('error_message')}", None, None, None
+        partial = api_response.get('partial') or {}
+        if (partial.get('pending') or partial.get('failed')) and not allow_partial:
+            missing = ', '.join([*(partial.get('pending') or ()), *(partial.get('failed') or ())])
+            return f"ハザード情報の一部を取得できませんでした: {missing}", None, None, None
+    except deadline.DeadlineExceeded as e:
+        print(f"Hazard lookup skipped: {e}")
+        return deadline.TIMEOUT_MESSAGE, None, None, None
     except Exception as e:
         print(f"Error fetching hazard info from REST API: {e}")
-        return f"ハザード情報の取得に失敗しました。エラー: {str(e)}", None, ""
+        return f"ハザード情報の取得に失敗しました。エラー: {str(e)}", None, None, None
 
+    # 応答メッセージを整形（旧フォーマットを経由せず1回の走査で表示用に変換する）
+    with metrics.span('format'):
+        formatted_hazards = display_formatter.format_api_response_for_display(api_response, hazard_types)
+        notices = [display_formatter.format_stale_notice(api_response), display_formatter.format_partial_notice(api_response)]
+        snapshot_notice = display_formatter.format_snapshot_notice(api_response)
 
-    # 応答メッセージを整形
-    formatted_hazards = display_formatter.format_all_hazard_info_for_display(raw_hazards)
-    
-    return None, formatted_hazards, address_info
+    return None, formatted_hazards, "\n".join(notice for notice in notices if notice) or None, snapshot_notice
 
-def get_hazard_response(text: str) -> str:
-    error_message, formatted_hazards, initial_greeting_message = get_formatted_hazard_data(text)
+def _with_notice(address_info: str, *notices: str | None) -> str:
+    return "\n".join([address_info, *(notice for notice in notices if notice)])
 
+def get_formatted_hazard_data(text: str, precision: str | None = None) -> tuple[str | None, dict | None, str]:
+    """
+    ユーザー入力に基づいてハザード情報を取得し、整形されたデータを返す。
+    (エラーメッセージ, 整形済みハザード情報, 冒頭の案内文) のタプルを返す。
+    """
+    error_message, lat, lon, address_info, hazard_types = _resolve_location(text, precision)
     if error_message:
-        return error_message
+        return error_message, None, ""
 
-    # 応答メッセージを整形
+    error_message, formatted_hazards, notice, snapshot_notice = _fetch_formatted_hazards(
+        lat, lon, precision, hazard_types=hazard_types
+    )
+    if error_message:
+        return error_message, None, ""
+
+    return None, formatted_hazards, _with_notice(address_info, notice, snapshot_notice)
+
+def _build_response_text(initial_greeting_message: str, formatted_hazards: dict) -> str:
     response_lines = [initial_greeting_message, "-" * 20]
     for key, val in formatted_hazards.items():
         response_lines.append(f"【{key}】\n{val}")
     
     return "\n".join(response_lines)
 
+def get_hazard_response(text: str) -> str:
+    if _is_progressive_lookup_enabled():
+        return _get_progressive_hazard_response(text)
+
+    error_message, formatted_hazards, initial_greeting_message = get_formatted_hazard_data(text)
+
+    if error_message:
+        return error_message
+
+    # 応答メッセージを整形
+    return _build_response_text(initial_greeting_message, formatted_hazards)
+
+# 二段階検索で高精度の結果が低精度と異なる場合に、追加で送るメッセージの見出し
+FOLLOW_UP_HEADER = "高精度の検索で結果が更新されました。"
+
+# 実行中の高精度検索（Lambdaは応答を返すとスレッドが凍結されるため、応答前に待ち合わせる）
+_follow_ups: list = []
+_follow_ups_lock = threading.Lock()
+
+
+def _is_progressive_lookup_enabled() -> bool:
+    return os.environ.get('PROGRESSIVE_LOOKUP', '').lower() in ('1', 'true', 'yes')
+
+
+def _get_progressive_hazard_response(text: str) -> str:
+    """
+    二段階検索モード。precision=lowの結果ですぐに返信し、
+    precision=highの検索をバックグラウンドで行って、結果が異なる場合だけプッシュメッセージで追送する。
+    """
+    from app import line_handler
+
+    error_message, lat, lon, address_info, hazard_types = _resolve_location(text, 'low')
+    if error_message:
+        return error_message
+
+    error_message, formatted_hazards, notice, snapshot_notice = _fetch_formatted_hazards(
+        lat, lon, 'low', hazard_types=hazard_types
+    )
+    if error_message:
+        return error_message
+
+    # 障害時の古い情報や一部を取得できなかった結果で返信した場合は、高精度の検索も失敗しやすいため追送しない。
+    # スナップショット（格子による近似）の結果は、高精度の結果で置き換える意味が大きいため追送の対象にする。
+    push_target = line_handler.get_push_target(line_handler.get_current_event())
+    if push_target and not notice:
+        _start_follow_up(push_target, lat, lon, address_info, formatted_hazards, hazard_types)
+
+    return _build_response_text(_with_notice(address_info, notice, snapshot_notice), formatted_hazards)
+
+
+def _start_follow_up(
+    push_target: str,
+    lat: float,
+    lon: float,
+    address_info: str,
+    low_hazards: dict,
+    hazard_types: list[str] | None = None
+) -> None:
+    follow_up = {'to': push_target, 'lat': lat, 'lon': lon, 'hazard_types': hazard_types, 'status': 'running'}
+    # 期限やテスト署名などのリクエストのコンテキストをスレッドに引き継ぐ
+    context = contextvars.copy_context()
+    thread = threading.Thread(
+        target=context.run,
+        args=(_run_follow_up, follow_up, address_info, low_hazards),
+        daemon=True
+    )
+    with _follow_ups_lock:
+        _follow_ups.append((thread, follow_up))
+    thread.start()
+
+
+def _run_follow_up(follow_up: dict, address_info: str, low_hazards: dict) -> None:
+    from app import line_handler
+
+    try:
+        error_message, high_hazards, _, _ = _fetch_formatted_hazards(
+            follow_up['lat'], follow_up['lon'], 'high',
+            hazard_types=follow_up['hazard_types'], allow_stale=False, allow_partial=False
+        )
+        if error_message:
+            follow_up['status'] = 'failed'
+            follow_up['error'] = error_message
+        elif high_hazards == low_hazards:
+            follow_up['status'] = 'unchanged'
+        else:
+            text = f"{FOLLOW_UP_HEADER}\n{_build_response_text(address_info, high_hazards)}"
+            follow_up['line_result'] = line_handler.push_message(follow_up['to'], text)
+            follow_up['status'] = 'pushed'
+    except Exception as e:
+        print(f"Error in high-precision follow-up: {e}")
+        follow_up['status'] = 'failed'
+        follow_up['error'] = str(e)
+
+
+def wait_for_follow_ups() -> list:
+    """
+    実行中の高精度検索の完了を、リクエストの残り時間の範囲で待ち合わせる。
+    完了したものの結果を返し、完了しなかったものは待ち合わせ対象から外す。
+    """
+    with _follow_ups_lock:
+        pending = list(_follow_ups)
+        _follow_ups.clear()
+
+    results = []
+    for thread, follow_up in pending:
+        left = deadline.remaining()
+        timeout = None if left is None else max(0.0, left - deadline.DEADLINE_SAFETY_MARGIN_SECONDS)
+        thread.join(timeout)
+        if thread.is_alive():
+            print(f"High-precision follow-up did not finish before the deadline: {follow_up['to']}")
+            follow_up['status'] = 'timeout'
+        results.append({key: value for key, value in follow_up.items() if key not in ('lat', 'lon', 'hazard_types')})
+    return results
+
 def lambda_handler(event, context):
     """
     AWS Lambdaのメインハンドラ関数。
     """
     # LINEからのWebhookか確認
-    signature = event['headers'].get('x-line-signature')
-    body = event['body']
+    signature = _get_header(event.get('headers'), 'x-line-signature')
 
     if not signature:
         return {
@@ -69,8 +285,92 @@ def lambda_handler(event, context):
             'body': json.dumps('Missing X-Line-Signature')
         }
 
+    body = _read_body(event)
+    if body is None:
+        return {
+            'statusCode': 400,
+            'body': json.dumps('Missing request body')
+        }
+
+    try:
+        with deadline.request_deadline(context):
+            return _handle_webhook(body, signature)
+    finally:
+        import_profile.report('invocation')
+
+def _get_header(headers: dict | None, name: str) -> str | None:
+    """
+    ヘッダーを大文字・小文字を区別せずに取得する（API Gatewayの設定によって表記が異なるため）。
+    """
+    if not headers:
+        return None
+    value = headers.get(name)
+    if value is not None:
+        return value
+    name = name.lower()
+    for key, value in headers.items():
+        if key.lower() == name:
+            return value
+    return None
+
+def _read_body(event: dict) -> bytes | None:
+    """
+    リクエストボディを受信したバイト列として取り出す。
+    isBase64Encodedの場合は1回だけデコードし、署名検証から解析まで同じバイト列を使う。
+    ボディがない場合や、base64として不正な場合はNoneを返す。
+    """
+    body = event.get('body')
+    if body is None:
+        return None
+    if event.get('isBase64Encoded'):
+        try:
+            return base64.b64decode(body, validate=True)
+        except (binascii.Error, ValueError) as e:
+            print(f"Invalid base64 request body: {e}")
+            return None
+    if isinstance(body, str):
+        return body.encode('utf-8')
+    return bytes(body)
+
+def _flush_shared_cache() -> None:
+    """
+    共有キャッシュへの書き込みを完了させる。
+    共有キャッシュのモジュールが読み込まれていない場合（署名エラーなど）は書き込みもないため、読み込まずに返す。
+    """
+    module = sys.modules.get('app.shared_cache')
+    if module is not None:
+        module.flush()
+
+def _handle_webhook(body: bytes, signature: str) -> dict:
+    """
+    署名付きのWebhookリクエストを処理し、Lambdaの応答を返す。
+    """
+    from app import line_handler
+
+    # 非同期モードでは署名検証とキュー投入だけを行い、即座に200を返す
+    if os.environ.get('WEBHOOK_MODE', 'sync') == 'deferred':
+        from app import event_queue
+        queue = event_queue.get_event_queue()
+        # コンテナ内のメモリ上のキューはワーカーから取り出せず、イベントが失われるため同期処理にする
+        if getattr(queue, 'durable', False):
+            queue_result = line_handler.enqueue_line_event(body, signature, queue)
+            # テストモードの場合だけ投入結果を応答に含める（署名検証のエラーは返さない）
+            if queue_result.get('test_mode'):
+                return {
+                    'statusCode': 200,
+                    'body': json.dumps({'status': 'OK', **queue_result}, ensure_ascii=False)
+                }
+            return {
+                'statusCode': 200,
+                'body': json.dumps('OK')
+            }
+        print("WEBHOOK_MODE=deferred requires a durable EVENT_QUEUE_BACKEND (sqlite or sqs). Processing synchronously.")
+
     # LINEイベント処理
     line_result = line_handler.handle_line_event(body, signature, get_hazard_response)
+    follow_ups = wait_for_follow_ups()
+    # 応答を返すとバックグラウンドのスレッドが凍結されるため、共有キャッシュへの書き込みを先に済ませる
+    _flush_shared_cache()
     
     # テストモードの場合はLINE処理結果を応答に含める
     if line_result and line_result.get('test_mode'):
@@ -79,7 +379,8 @@ def lambda_handler(event, context):
             'body': json.dumps({
                 'status': 'OK',
                 'test_mode': True,
-                'line_processing_result': line_result
+                'line_processing_result': line_result,
+                **({'follow_ups': follow_ups} if follow_ups else {})
             }, ensure_ascii=False)
         }
     
@@ -87,3 +388,77 @@ def lambda_handler(event, context):
         'statusCode': 200,
         'body': json.dumps('OK')
     }
+
+
+def worker_handler(event, context):
+    """
+    非同期モードのワーカー用ハンドラ関数。
+    SQSトリガーの場合はRecordsを、それ以外の場合は共有キューを取り出して処理する。
+    """
+    from app import event_queue, line_handler
+
+    queue = event_queue.get_event_queue()
+    records = event.get('Records') if event else None
+    if records:
+        items = [(record.get('messageId'), record.get('body')) for record in records]
+    else:
+        items = [(None, message) for message in queue.dequeue(get_env_int('WORKER_MAX_MESSAGES', 10))]
+
+    results = []
+    batch_item_failures = []
+    with deadline.request_deadline(context):
+        for message_id, message in items:
+            try:
+                if isinstance(message, str):
+                    message = json.loads(message)
+                time_in_queue = queue.stats.record_dequeue(message)
+                result = line_handler.process_queued_message(message, get_hazard_response)
+                # 処理が完了してから削除する（途中で異常終了した場合はキューから再配信される）
+                if not records:
+                    queue.ack(message)
+            except Exception as e:
+                print(f"Error processing queued message {message_id}: {e}")
+                if records:
+                    batch_item_failures.append({'itemIdentifier': message_id})
+                continue
+            result['time_in_queue_ms'] = round(time_in_queue * 1000, 1)
+            results.append(result)
+        follow_ups = wait_for_follow_ups()
+        _flush_shared_cache()
+
+    queue_metrics = {'queue_depth': queue.depth(), **queue.stats.snapshot()}
+    print(f"Event queue metrics: {json.dumps(queue_metrics)}")
+
+    response = {
+        'processed_messages': len(results),
+        'results': results,
+        'follow_ups': follow_ups,
+        'queue_metrics': queue_metrics
+    }
+    if records:
+        # SQSトリガーの部分的なバッチ応答（ReportBatchItemFailures）。失敗したレコードだけが再配信される。
+        response['batchItemFailures'] = batch_item_failures
+    return response
+
+
+def _prewarm_on_init() -> dict | None:
+    """
+    コンテナの初期化時に、利用の多い地点のジオコーディング結果とハザード情報をキャッシュに載せる。
+    マニフェスト（PREWARM_MANIFEST_PATH）がない場合は何もしない（HTTPクライアントなども読み込まない）。
+    二段階検索モードでは、最初の応答と同じ低精度の結果を読み込む。
+    """
+    from app import prewarm
+
+    try:
+        return prewarm.prewarm_from_file(
+            budget_seconds=prewarm.PREWARM_BUDGET_SECONDS,
+            precision='low' if _is_progressive_lookup_enabled() else None
+        )
+    except Exception as e:
+        print(f"Error during prewarm: {e}")
+        return None
+
+
+_prewarm_stats = _prewarm_on_init()
+
+import_profile.report('init')
@@ -0,0 +1,41 @@
+import pytest
+
+from app import circuit_breaker, geocoding, hazard_api_client, shared_cache
+
+
+@pytest.fixture(autouse=True)
+def line_test_signature(monkeypatch):
+    """
+    テストモードは既定で無効のため、テストイベントの署名（test_signature）を明示的に有効にする。
+    """
+    monkeypatch.setenv('LINE_TEST_SIGNATURE', 'test_signature')
+
+
+@pytest.fixture(autouse=True)
+def clear_caches():
+    """
+    コンテナ共有のキャッシュや合流の統計、サーキットの状態がテスト間で持ち越されないようにする。
+    共有キャッシュはテストで明示的に設定した場合だけ使う。
+    """
+    caches = [
+        hazard_api_client.get_hazard_cache(),
+        hazard_api_client.get_last_known_good_store(),
+        geocoding.get_geocode_cache(),
+        geocoding.get_last_known_good_store()
+    ]
+    flights = [hazard_api_client._hazard_flight, geocoding._geocode_flight]
+    for cache in caches:
+        cache.clear()
+    for flight in flights:
+        flight.reset_stats()
+    geocoding.reset_geocode_source_stats()
+    circuit_breaker.reset_breakers()
+    shared_cache.set_shared_cache(None)
+    yield
+    for cache in caches:
+        cache.clear()
+    for flight in flights:
+        flight.reset_stats()
+    geocoding.reset_geocode_source_stats()
+    circuit_breaker.reset_breakers()
+    shared_cache.set_shared_cache(None)
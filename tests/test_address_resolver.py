@@ -0,0 +1,173 @@
+import threading
+import time
+from unittest.mock import patch
+
+import responses
+
+from app import address_resolver, geocoding, hazard_api_client, http_client, metrics
+from benchmarks import payloads
+from lambda_function import get_formatted_hazard_data
+
+
+API_URL = "https://hazard.example.com/prod/hazardinfo"
+ADDRESS = '東京都新宿区西新宿2-8-1'
+ENV = {'HAZARD_MAP_API_URL': API_URL, 'GOOGLE_API_KEY': 'test_key'}
+
+
+def add_geocoding_response(lat=35.6896, lng=139.6917):
+    responses.add(
+        responses.GET, geocoding.GEOCODING_API_URL,
+        json={'status': 'OK', 'results': [{'geometry': {'location': {'lat': lat, 'lng': lng}}}]},
+        status=200
+    )
+
+
+class TestAddressResolver:
+
+    def test_unknown_strategy_falls_back_to_client(self):
+        with patch.dict('os.environ', {'ADDRESS_RESOLUTION_STRATEGY': 'psychic'}):
+            assert address_resolver.get_strategy() == 'client'
+        with patch.dict('os.environ', {'ADDRESS_RESOLUTION_STRATEGY': 'RACE'}):
+            assert address_resolver.get_strategy() == 'race'
+
+    def test_client_strategy_adds_no_resolution_overhead(self):
+        sink = metrics.ListSink()
+
+        with patch.object(metrics, '_sink', sink), \
+             patch.object(geocoding, 'geocode', return_value=(35.6896, 139.6917)), \
+             patch.object(geocoding, 'geocode_local') as geocode_local:
+            assert address_resolver.resolve_address(ADDRESS, strategy='client') == (35.6896, 139.6917)
+
+        # 既定の方法では従来どおりジオコーディングの計測区間だけを出力する
+        assert [record['Stage'] for record in sink.stage_latencies()] == ['geocode']
+        geocode_local.assert_not_called()
+
+    @responses.activate
+    def test_server_strategy_uses_a_single_round_trip(self):
+        responses.add(responses.GET, API_URL, json=payloads.FULL_API_RESPONSE, status=200)
+        sink = metrics.ListSink()
+
+        with patch.dict('os.environ', ENV), patch.object(metrics, '_sink', sink):
+            coordinates = address_resolver.resolve_address(ADDRESS, strategy='server')
+            response = hazard_api_client.HazardAPIClient(use_snapshot=False).get_hazard_info(*coordinates)
+
+        assert coordinates == (35.6896, 139.6917)
+        assert response == payloads.FULL_API_RESPONSE
+        assert len(responses.calls) == 1
+        assert 'input=' in responses.calls[0].request.url
+        # サーバーで解決した座標はジオコーディングのキャッシュにも登録する
+        assert geocoding.get_geocode_cache().get(geocoding.canonicalize_address(ADDRESS)) == coordinates
+        record = sink.stage_latencies('resolve_address')[0]
+        assert (record['Strategy'], record['ResolvedBy']) == ('server', 'server')
+        assert sink.stage_latencies('geocode_server')
+
+    @responses.activate
+    def test_server_failure_falls_back_to_geocoding(self):
+        responses.add(responses.GET, API_URL, json={'message': 'unavailable'}, status=503)
+        add_geocoding_response()
+
+        with patch.dict('os.environ', ENV):
+            coordinates = address_resolver.resolve_address(ADDRESS, strategy='server')
+
+        assert coordinates == (35.6896, 139.6917)
+        assert [call.request.url.split('?')[0] for call in responses.calls][-1] == geocoding.GEOCODING_API_URL
+
+    @responses.activate
+    def test_locally_resolvable_address_skips_network(self):
+        geocoding.prime_cache(ADDRESS, (35.6896, 139.6917))
+
+        with patch.dict('os.environ', ENV):
+            for strategy in ('server', 'race'):
+                assert address_resolver.resolve_address(ADDRESS, strategy=strategy) == (35.6896, 139.6917)
+
+        assert len(responses.calls) == 0
+
+    def test_race_takes_first_good_answer(self):
+        def slow_client(address):
+            time.sleep(0.3)
+            return (1.0, 1.0)
+
+        with patch.object(address_resolver, '_resolve_on_client', side_effect=slow_client), \
+             patch.object(address_resolver, '_resolve_on_server', return_value=(2.0, 2.0)):
+            started = time.monotonic()
+            coordinates = address_resolver.resolve_address(ADDRESS, strategy='race')
+            elapsed = time.monotonic() - started
+
+        assert coordinates == (2.0, 2.0)
+        assert elapsed < 0.25
+
+    def test_race_loser_does_not_overwrite_geocode_cache(self):
+        server_done = threading.Event()
+
+        def slow_server(address, hazard_types, precision):
+            time.sleep(0.1)
+            server_done.set()
+            return (2.0, 2.0)
+
+        with patch.object(address_resolver, '_resolve_on_client', return_value=(1.0, 1.0)), \
+             patch.object(address_resolver, '_resolve_on_server', side_effect=slow_server):
+            assert address_resolver.resolve_address(ADDRESS, strategy='race') == (1.0, 1.0)
+            assert server_done.wait(1)
+
+        assert geocoding.get_geocode_cache().get(geocoding.canonicalize_address(ADDRESS)) is None
+
+    def test_race_winner_on_server_primes_geocode_cache(self):
+        def slow_client(address):
+            time.sleep(0.1)
+            return (1.0, 1.0)
+
+        with patch.object(address_resolver, '_resolve_on_client', side_effect=slow_client), \
+             patch.object(address_resolver, '_resolve_on_server', return_value=(2.0, 2.0)):
+            assert address_resolver.resolve_address(ADDRESS, strategy='race') == (2.0, 2.0)
+
+        assert geocoding.get_geocode_cache().get(geocoding.canonicalize_address(ADDRESS)) == (2.0, 2.0)
+
+    def test_race_waits_for_the_other_side_when_first_fails(self):
+        def slow_client(address):
+            time.sleep(0.05)
+            return (1.0, 1.0)
+
+        with patch.object(address_resolver, '_resolve_on_client', side_effect=slow_client), \
+             patch.object(address_resolver, '_resolve_on_server', side_effect=RuntimeError('boom')):
+            assert address_resolver.resolve_address(ADDRESS, strategy='race') == (1.0, 1.0)
+
+    @responses.activate
+    def test_formatted_hazard_data_with_server_strategy(self):
+        responses.add(responses.GET, API_URL, json=payloads.FULL_API_RESPONSE, status=200)
+
+        with patch.dict('os.environ', {**ENV, 'ADDRESS_RESOLUTION_STRATEGY': 'server'}):
+            error, data, info = get_formatted_hazard_data(ADDRESS)
+
+        assert error is None
+        assert data
+        assert info == f'「{ADDRESS}」周辺のハザード情報です。'
+        assert len(responses.calls) == 1
+
+
+class TestHazardInfoByInput:
+
+    def test_uses_geocoding_sized_timeout(self):
+        with patch.dict('os.environ', ENV):
+            client = hazard_api_client.HazardAPIClient()
+            with patch.object(client, '_make_request', return_value=payloads.FULL_API_RESPONSE) as make_request:
+                client.get_hazard_info_by_input(ADDRESS)
+
+            assert make_request.call_args.args[1] == http_client.get_timeout('geocoding')
+            assert http_client.get_timeout('geocoding') < http_client.get_timeout('hazard')
+
+    def test_concurrent_requests_are_coalesced(self):
+        def slow_request(params, timeout=None):
+            time.sleep(0.2)
+            return payloads.FULL_API_RESPONSE
+
+        with patch.dict('os.environ', ENV):
+            client = hazard_api_client.HazardAPIClient()
+            with patch.object(client, '_make_request', side_effect=slow_request) as make_request:
+                threads = [threading.Thread(target=client.get_hazard_info_by_input, args=(ADDRESS,)) for _ in range(3)]
+                for thread in threads:
+                    thread.start()
+                for thread in threads:
+                    thread.join()
+
+        assert make_request.call_count == 1
+        assert hazard_api_client.get_hazard_coalescing_stats()['coalesced'] == 2
@@ -0,0 +1,16 @@
+from benchmarks import run_benchmarks
+
+
+class TestBenchmarks:
+
+    def test_all_benchmarks_execute(self):
+        for name, factory in run_benchmarks.BENCHMARKS.items():
+            with factory() as func:
+                func()
+
+    def test_compare_flags_regressions(self):
+        baseline = {'results_us': {'fast': 10.0, 'slow': 10.0}}
+
+        regressions = run_benchmarks.compare({'fast': 11.0, 'slow': 13.0, 'new': 1.0}, baseline, 0.25)
+
+        assert regressions == ['slow']
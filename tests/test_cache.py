@@ -0,0 +1,74 @@
+import pytest
+from app.cache import TTLCache, quantize_coordinates
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestTTLCache:
+
+    def test_get_and_set(self):
+        cache = TTLCache(maxsize=2, ttl=60)
+        cache.set('a', 1)
+
+        assert cache.get('a') == 1
+        assert cache.get('b') is None
+        assert cache.stats()['hits'] == 1
+        assert cache.stats()['misses'] == 1
+
+    def test_lru_eviction(self):
+        cache = TTLCache(maxsize=2, ttl=60)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+
+        assert cache.get('b') is None
+        assert cache.get('a') == 1
+        assert cache.get('c') == 3
+        assert cache.stats()['evictions'] == 1
+
+    def test_ttl_expiration(self):
+        clock = FakeClock()
+        cache = TTLCache(maxsize=10, ttl=60, clock=clock)
+        cache.set('a', 1)
+        cache.set('b', 2, ttl=120)
+
+        clock.now += 61
+
+        assert cache.get('a') is None
+        assert cache.get('b') == 2
+        assert cache.stats()['expirations'] == 1
+
+    def test_disabled_cache(self):
+        cache = TTLCache(maxsize=0, ttl=60)
+        cache.set('a', 1)
+
+        assert cache.get('a') is None
+        assert len(cache) == 0
+
+    def test_get_with_sentinel_default(self):
+        cache = TTLCache(maxsize=2, ttl=60)
+        missing = object()
+        cache.set('a', None)
+
+        assert cache.get('a', missing) is None
+        assert cache.get('b', missing) is missing
+
+
+class TestQuantizeCoordinates:
+
+    def test_nearby_points_share_cell(self):
+        assert quantize_coordinates(35.65861, 139.74541, 0.0001) == quantize_coordinates(35.65859, 139.74539, 0.0001)
+
+    def test_distant_points_differ(self):
+        assert quantize_coordinates(35.6586, 139.7454, 0.0001) != quantize_coordinates(35.6596, 139.7454, 0.0001)
+
+    def test_invalid_grid_size(self):
+        with pytest.raises(ValueError):
+            quantize_coordinates(35.0, 139.0, 0)
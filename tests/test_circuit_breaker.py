@@ -0,0 +1,140 @@
+import pytest
+import responses
+
+from app import circuit_breaker, http_client
+from app.circuit_breaker import CircuitBreaker, CircuitOpenError
+from app.display_formatter import format_stale_notice
+from app.hazard_api_client import HazardAPIClient, get_hazard_cache
+
+
+API_URL = "https://hazard.example.com/prod/hazardinfo"
+
+SUCCESS_RESPONSE = {
+    'status': 'success',
+    'coordinates': {'latitude': 35.6586, 'longitude': 139.7454},
+    'hazard_info': {
+        'flood': {'max_info': '0.5m以上3m未満', 'center_info': '0.5m未満'}
+    }
+}
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_breaker(clock, **kwargs):
+    options = {
+        'slow_call_seconds': 1.0,
+        'window_size': 4,
+        'minimum_calls': 4,
+        'failure_rate_threshold': 0.5,
+        'slow_call_rate_threshold': 0.75,
+        'open_seconds': 30,
+        'half_open_max_calls': 1,
+        'clock': clock
+    }
+    options.update(kwargs)
+    return CircuitBreaker('test', **options)
+
+
+class TestCircuitBreaker:
+
+    def test_opens_when_error_rate_exceeds_threshold(self):
+        breaker = make_breaker(FakeClock())
+        breaker.record_success(0.1)
+        breaker.record_success(0.1)
+        breaker.record_failure(0.1)
+        assert breaker.state == circuit_breaker.STATE_CLOSED
+
+        breaker.record_failure(0.1)
+
+        assert breaker.state == circuit_breaker.STATE_OPEN
+        assert breaker.allow_request() is False
+        assert breaker.stats()['rejected'] == 1
+
+    def test_opens_when_calls_are_slow(self):
+        breaker = make_breaker(FakeClock())
+        breaker.record_success(0.1)
+        for _ in range(3):
+            breaker.record_success(2.0)
+
+        assert breaker.state == circuit_breaker.STATE_OPEN
+
+    def test_half_open_trial_closes_on_success(self):
+        clock = FakeClock()
+        breaker = make_breaker(clock)
+        for _ in range(4):
+            breaker.record_failure(0.1)
+        clock.now += 30
+
+        assert breaker.state == circuit_breaker.STATE_HALF_OPEN
+        assert breaker.allow_request() is True
+        assert breaker.allow_request() is False
+
+        breaker.record_success(0.1)
+
+        assert breaker.state == circuit_breaker.STATE_CLOSED
+        assert breaker.allow_request() is True
+
+    def test_half_open_trial_reopens_on_failure(self):
+        clock = FakeClock()
+        breaker = make_breaker(clock)
+        for _ in range(4):
+            breaker.record_failure(0.1)
+        clock.now += 30
+        breaker.allow_request()
+
+        breaker.record_failure(0.1)
+
+        assert breaker.state == circuit_breaker.STATE_OPEN
+        assert breaker.stats()['times_opened'] == 2
+
+    def test_line_has_no_breaker(self):
+        assert circuit_breaker.get_breaker('line') is None
+        assert circuit_breaker.get_breaker('hazard') is circuit_breaker.get_breaker('hazard')
+
+
+class TestCircuitBreakerUpstreams:
+
+    @responses.activate
+    def test_open_circuit_fails_fast_without_calling_upstream(self):
+        responses.add(responses.GET, API_URL, status=503)
+        minimum_calls = circuit_breaker.get_breaker('hazard').minimum_calls
+        for _ in range(minimum_calls):
+            http_client.request('hazard', 'GET', API_URL)
+
+        with pytest.raises(CircuitOpenError):
+            http_client.request('hazard', 'GET', API_URL)
+
+        assert len(responses.calls) == minimum_calls
+        assert circuit_breaker.get_circuit_stats()['hazard']['state'] == circuit_breaker.STATE_OPEN
+
+    @responses.activate
+    def test_hazard_failure_serves_last_known_result(self):
+        responses.add(responses.GET, API_URL, json=SUCCESS_RESPONSE, status=200)
+        client = HazardAPIClient(api_url=API_URL)
+        client.get_hazard_info(35.6586, 139.7454)
+
+        # 通常のキャッシュが期限切れになった後に外部APIが障害になった状況
+        get_hazard_cache().clear()
+        responses.replace(responses.GET, API_URL, status=503)
+        result = client.get_hazard_info(35.6586, 139.7454)
+
+        assert result['hazard_info'] == SUCCESS_RESPONSE['hazard_info']
+        assert result['stale']['fetched_at'] > 0
+        assert format_stale_notice(result, now=result['stale']['fetched_at'] + 2 * 60 * 60) == (
+            "※ハザード情報APIに接続できないため、約2時間前に取得した情報を表示しています。"
+        )
+
+    @responses.activate
+    def test_hazard_failure_without_history_returns_error(self):
+        responses.add(responses.GET, API_URL, status=503)
+
+        result = HazardAPIClient(api_url=API_URL).get_hazard_info(35.6586, 139.7454)
+
+        assert result['status'] == 'error'
+        assert 'stale' not in result
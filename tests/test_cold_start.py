@@ -0,0 +1,77 @@
+import json
+import os
+import subprocess
+import sys
+
+from app.import_profile import ImportProfiler
+
+REPO_ROOT = os.path.join(os.path.dirname(__file__), '..')
+
+
+def _run_in_fresh_interpreter(code, env=None):
+    result = subprocess.run(
+        [sys.executable, '-c', code],
+        cwd=REPO_ROOT,
+        env={**os.environ, 'METRICS_SINK': 'none', **(env or {})},
+        capture_output=True,
+        text=True,
+        check=True
+    )
+    return result.stdout
+
+
+HEAVY_MODULES_CHECK = """
+import json, sys
+import lambda_function
+{call}
+heavy = ['requests', 'app.http_client', 'app.hazard_api_client', 'app.display_formatter', 'app.geocoding',
+         'app.shared_cache']
+print(json.dumps([name for name in heavy if name in sys.modules]))
+"""
+
+
+class TestColdStart:
+
+    def test_import_does_not_load_http_stack(self):
+        output = _run_in_fresh_interpreter(HEAVY_MODULES_CHECK.format(call=''))
+
+        assert json.loads(output.splitlines()[-1]) == []
+
+    def test_invalid_signature_does_not_load_http_stack(self):
+        call = """lambda_function.lambda_handler({'headers': {'x-line-signature': 'invalid'}, 'body': '{"events": []}'}, None)"""
+        output = _run_in_fresh_interpreter(HEAVY_MODULES_CHECK.format(call=call), {'LINE_CHANNEL_SECRET': 'secret'})
+
+        assert json.loads(output.splitlines()[-1]) == []
+
+    def test_malformed_body_does_not_load_http_stack(self):
+        call = """lambda_function.lambda_handler({'headers': {'x-line-signature': 'test_signature'}, 'body': 'not json'}, None)"""
+        output = _run_in_fresh_interpreter(HEAVY_MODULES_CHECK.format(call=call), {'LINE_CHANNEL_SECRET': 'secret'})
+
+        assert json.loads(output.splitlines()[-1]) == []
+
+    def test_import_profile_mode_reports_modules(self):
+        output = _run_in_fresh_interpreter('import lambda_function', {'IMPORT_PROFILE': '1'})
+
+        report = json.loads(output.splitlines()[0])
+        assert report['import_profile'] == 'init'
+        assert 'app.metrics' in [entry['module'] for entry in report['top_self_ms']]
+
+
+class TestImportProfiler:
+
+    def test_records_self_and_cumulative_time(self):
+        profiler = ImportProfiler()
+        profiler._enter()
+        profiler._enter()
+        profiler._leave('child', 0.002)
+        profiler._leave('parent', 0.005)
+
+        assert profiler.records['child'] == {'self_ms': 2.0, 'cumulative_ms': 2.0}
+        assert profiler.records['parent'] == {'self_ms': 3.0, 'cumulative_ms': 5.0}
+
+    def test_report_only_includes_new_modules(self, capsys):
+        profiler = ImportProfiler()
+        profiler.records['app.metrics'] = {'self_ms': 1.0, 'cumulative_ms': 1.0}
+
+        assert profiler.report('init')['modules'] == 1
+        assert profiler.report('invocation') is None
@@ -0,0 +1,104 @@
+import json
+from unittest.mock import MagicMock, patch
+
+import pytest
+import responses
+
+from app import deadline, hazard_api_client, http_client
+from benchmarks import payloads
+from lambda_function import get_formatted_hazard_data, lambda_handler
+
+
+def _context(remaining_ms):
+    context = MagicMock()
+    context.get_remaining_time_in_millis.return_value = remaining_ms
+    return context
+
+
+class TestDeadline:
+
+    def test_no_deadline_uses_default(self):
+        assert deadline.remaining() is None
+        assert deadline.timeout_for(30.0) == 30.0
+        assert deadline.is_exhausted() is False
+
+    def test_none_context_sets_no_deadline(self):
+        with deadline.request_deadline(None):
+            assert deadline.remaining() is None
+
+    def test_timeout_clamped_to_remaining_budget(self):
+        with deadline.request_deadline(_context(10000)):
+            assert deadline.timeout_for(30.0) == pytest.approx(10.0 - deadline.DEADLINE_REPLY_RESERVE_SECONDS, abs=0.05)
+            assert deadline.timeout_for(5.0) == 5.0
+            assert deadline.timeout_for(30.0, reserve=0) == pytest.approx(10.0, abs=0.05)
+
+    def test_exhausted_budget_raises(self):
+        with deadline.request_deadline(_context(1000)):
+            assert deadline.is_exhausted() is True
+            with pytest.raises(deadline.DeadlineExceeded):
+                deadline.timeout_for(30.0)
+
+    def test_deadline_is_reset_after_block(self):
+        with deadline.request_deadline(_context(1000)):
+            pass
+        assert deadline.remaining() is None
+
+    @responses.activate
+    def test_http_client_applies_budget(self):
+        responses.add(responses.GET, "https://hazard.example.com/", json={}, status=200)
+
+        with deadline.request_deadline(_context(5000)):
+            http_client.request('hazard', 'GET', "https://hazard.example.com/")
+
+        timeout = responses.calls[0].request.req_kwargs['timeout']
+        assert timeout == pytest.approx(5.0 - deadline.DEADLINE_REPLY_RESERVE_SECONDS, abs=0.05)
+
+    @patch('lambda_function.geocoding.geocode')
+    def test_exhausted_budget_returns_timeout_message(self, mock_geocode):
+        mock_geocode.side_effect = deadline.DeadlineExceeded('no time left')
+
+        with deadline.request_deadline(_context(500)):
+            error, data, _ = get_formatted_hazard_data('東京都新宿区')
+
+        assert error == deadline.TIMEOUT_MESSAGE
+        assert data is None
+
+    @responses.activate
+    def test_exhausted_budget_serves_last_known_good(self):
+        api_url = "https://hazard.example.com/"
+        responses.add(responses.GET, api_url, json=payloads.FULL_API_RESPONSE, status=200)
+        with patch.dict('os.environ', {'HAZARD_MAP_API_URL': api_url}):
+            client = hazard_api_client.HazardAPIClient(use_snapshot=False)
+            client.get_hazard_info(35.6586, 139.7454)
+            hazard_api_client.get_hazard_cache().clear()
+
+            with deadline.request_deadline(_context(500)):
+                response = client.get_hazard_info(35.6586, 139.7454)
+                error, data, _ = get_formatted_hazard_data('35.6586, 139.7454')
+
+        assert len(responses.calls) == 1
+        assert response['hazard_info'] == payloads.FULL_API_RESPONSE['hazard_info']
+        assert 'stale' in response
+        assert error is None
+        assert data
+
+    def test_lambda_handler_replies_with_timeout_message(self):
+        body = json.dumps({
+            'events': [{
+                'type': 'message',
+                'message': {'type': 'text', 'text': '35.6586, 139.7454'},
+                'replyToken': 'test_reply_token'
+            }]
+        })
+        event = {'headers': {'x-line-signature': 'test_signature'}, 'body': body}
+
+        with patch.dict('os.environ', {
+            'LINE_CHANNEL_SECRET': 'test_secret',
+            'LINE_CHANNEL_ACCESS_TOKEN': 'test_token',
+            'HAZARD_MAP_API_URL': 'https://hazard.example.com/'
+        }):
+            result = lambda_handler(event, _context(1500))
+
+        line_response = json.loads(result['body'])['line_processing_result']['line_responses'][0]
+        assert line_response['bot_response'] == deadline.TIMEOUT_MESSAGE
+        assert line_response['line_result']['test_mode'] is True
@@ -0,0 +1,90 @@
+from app.display_formatter import (
+    format_all_hazard_info_for_display, format_api_response_for_display, format_partial_notice
+)
+from app.hazard_api_client import convert_api_response_to_legacy_format
+from app.hazard_spec import HAZARD_SPECS
+from benchmarks.payloads import FULL_API_RESPONSE, SPARSE_API_RESPONSE
+
+
+class TestDisplayFormatter:
+
+    def test_full_response(self):
+        display = format_api_response_for_display(FULL_API_RESPONSE)
+
+        assert list(display) == [spec.label for spec in HAZARD_SPECS]
+        assert display['30年以内に震度5強以上の地震が起こる確率'] == " 周辺100mの最大: 98%\n 中心点: 95%"
+        assert display['想定最大浸水深'] == " 周辺100mの最大: 3m以上5m未満\n 中心点: 0.5m以上3m未満"
+        assert display['土砂災害警戒・特別警戒区域'] == (
+            " 周辺100mの最大: 土石流(警戒区域), 急傾斜地の崩壊(特別警戒区域)\n"
+            " 中心点: 急傾斜地の崩壊(警戒区域)"
+        )
+        assert display['雪崩危険箇所'] == "該当なし"
+
+    def test_sparse_response_hides_optional_sections(self):
+        display = format_api_response_for_display(SPARSE_API_RESPONSE)
+
+        assert display['想定最大浸水深'] == "浸水なし"
+        assert display['津波浸水想定'] == "浸水想定なし"
+        assert display['土砂災害警戒・特別警戒区域'] == "該当なし"
+        assert '大規模盛土造成地' not in display
+        assert '浸水継続時間' not in display
+        assert display['雪崩危険箇所'] == " 周辺100mの最大: 該当あり\n 中心点: 該当あり"
+
+    def test_error_response_shows_no_data(self):
+        display = format_api_response_for_display({'status': 'error', 'hazard_info': {}})
+
+        assert display['30年以内に震度5強以上の地震が起こる確率'] == "データなし"
+        assert '雪崩危険箇所' not in display
+
+    def test_hazard_types_narrow_sections(self):
+        display = format_api_response_for_display(FULL_API_RESPONSE, hazard_types=['tsunami', 'avalanche'])
+
+        assert list(display) == ['津波浸水想定', '雪崩危険箇所']
+
+    def test_flood_types_include_related_sections(self):
+        display = format_api_response_for_display(
+            FULL_API_RESPONSE, hazard_types=['flood', 'flood_keizoku', 'kaokutoukai_hanran']
+        )
+
+        assert list(display) == ['想定最大浸水深', '浸水継続時間', '家屋倒壊等氾濫想定区域']
+
+    def test_invalid_probability(self):
+        display = format_api_response_for_display({
+            'status': 'success',
+            'hazard_info': {'jshis_prob_50': {'max_prob': 'invalid', 'center_prob': None}}
+        })
+
+        assert display['30年以内に震度5強以上の地震が起こる確率'] == " 周辺100mの最大: データ解析失敗\n 中心点: データなし"
+
+    def test_single_pass_matches_legacy_path(self):
+        for response in (FULL_API_RESPONSE, SPARSE_API_RESPONSE, {'status': 'error'}):
+            legacy = convert_api_response_to_legacy_format(response)
+            assert format_api_response_for_display(response) == format_all_hazard_info_for_display(legacy)
+
+    def test_legacy_format_keys(self):
+        legacy = convert_api_response_to_legacy_format(FULL_API_RESPONSE)
+
+        assert set(legacy) == {spec.legacy_key for spec in HAZARD_SPECS}
+        assert legacy['landslide_hazard']['steep_slope'] == {
+            'max_info': '急傾斜地の崩壊(特別警戒区域)',
+            'center_info': '急傾斜地の崩壊(警戒区域)'
+        }
+
+    def test_partial_response_marks_missing_sections(self):
+        response = {
+            **FULL_API_RESPONSE,
+            'hazard_info': {key: FULL_API_RESPONSE['hazard_info'][key] for key in ('jshis_prob_50', 'jshis_prob_60')},
+            'partial': {'pending': ['landslide', 'large_fill_land'], 'failed': ['flood', 'flood_keizoku']}
+        }
+
+        display = format_api_response_for_display(response)
+
+        assert display['30年以内に震度5強以上の地震が起こる確率'] == " 周辺100mの最大: 98%\n 中心点: 95%"
+        assert display['土砂災害警戒・特別警戒区域'] == '取得中'
+        assert display['大規模盛土造成地'] == '取得中'
+        assert display['想定最大浸水深'] == '取得失敗'
+        assert display['浸水継続時間'] == '取得失敗'
+        assert display['津波浸水想定'] == '浸水想定なし'
+        assert list(display) == [spec.label for spec in HAZARD_SPECS if spec.label in display]
+        assert '取得中' in format_partial_notice(response)
+        assert format_partial_notice(FULL_API_RESPONSE) is None
@@ -0,0 +1,121 @@
+import json
+import sqlite3
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from app.event_queue import (
+    RECEIPT_HANDLE_KEY, InMemoryEventQueue, SQLiteEventQueue, SQSEventQueue, EventQueueStats, create_event_queue
+)
+
+
+class FakeClock:
+
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class TestEventQueues:
+
+    def test_in_memory_queue_fifo(self):
+        queue = InMemoryEventQueue()
+        queue.enqueue({'id': 1})
+        queue.enqueue({'id': 2})
+
+        assert queue.depth() == 2
+        assert queue.dequeue(1) == [{'id': 1}]
+        assert queue.dequeue(10) == [{'id': 2}]
+        assert queue.depth() == 0
+
+    def test_sqlite_queue_persists_between_instances(self, tmp_path):
+        path = str(tmp_path / 'queue.db')
+        producer = SQLiteEventQueue(path)
+        producer.enqueue({'id': 1})
+        producer.enqueue({'id': 2})
+
+        consumer = SQLiteEventQueue(path)
+        assert consumer.depth() == 2
+        messages = consumer.dequeue(10)
+        assert [message['id'] for message in messages] == [1, 2]
+        assert producer.depth() == 0
+        for message in messages:
+            consumer.ack(message)
+        assert producer.dequeue(10) == []
+
+    def test_sqlite_queue_redelivers_unacked_messages(self, tmp_path):
+        clock = FakeClock()
+        queue = SQLiteEventQueue(str(tmp_path / 'queue.db'), visibility_timeout=30, clock=clock)
+        queue.enqueue({'id': 1})
+        queue.enqueue({'id': 2})
+
+        first, second = queue.dequeue(10)
+        queue.ack(second)
+        # 処理中（可視性タイムアウト内）のメッセージは取り出されない
+        assert queue.dequeue(10) == []
+        assert queue.depth() == 0
+
+        clock.now += 31
+        assert queue.depth() == 1
+        redelivered = queue.dequeue(10)
+        assert [message['id'] for message in redelivered] == [1]
+        assert redelivered[0][RECEIPT_HANDLE_KEY] == first[RECEIPT_HANDLE_KEY]
+        queue.close()
+
+    def test_sqlite_queue_upgrades_existing_file(self, tmp_path):
+        path = str(tmp_path / 'queue.db')
+        conn = sqlite3.connect(path)
+        with conn:
+            conn.execute('CREATE TABLE event_queue (id INTEGER PRIMARY KEY AUTOINCREMENT, body TEXT NOT NULL)')
+            conn.execute('INSERT INTO event_queue (body) VALUES (?)', ('{"id": 1}',))
+        conn.close()
+
+        queue = SQLiteEventQueue(path)
+        assert [message['id'] for message in queue.dequeue(10)] == [1]
+        queue.close()
+
+    def test_sqs_queue_uses_client(self):
+        client = MagicMock()
+        client.receive_message.return_value = {
+            'Messages': [{'Body': json.dumps({'id': 1}), 'ReceiptHandle': 'handle-1'}]
+        }
+        client.get_queue_attributes.return_value = {'Attributes': {'ApproximateNumberOfMessages': '3'}}
+        queue = SQSEventQueue('https://sqs.example.com/queue', client=client)
+
+        queue.enqueue({'id': 1})
+        messages = queue.dequeue(5)
+
+        client.send_message.assert_called_once_with(
+            QueueUrl='https://sqs.example.com/queue', MessageBody='{"id": 1}'
+        )
+        # 処理が完了する（ackする）までは削除しない
+        client.delete_message.assert_not_called()
+        assert messages == [{'id': 1, RECEIPT_HANDLE_KEY: 'handle-1'}]
+
+        queue.ack(messages[0])
+        client.delete_message.assert_called_once_with(
+            QueueUrl='https://sqs.example.com/queue', ReceiptHandle='handle-1'
+        )
+        assert queue.depth() == 3
+
+    def test_create_event_queue_unknown_backend(self):
+        with pytest.raises(ValueError):
+            create_event_queue('kafka')
+
+    def test_create_event_queue_sqs_requires_url(self):
+        with patch.dict('os.environ', {}, clear=True):
+            with pytest.raises(ValueError):
+                create_event_queue('sqs')
+
+    def test_stats_time_in_queue(self):
+        stats = EventQueueStats()
+        stats.record_enqueue()
+        waited = stats.record_dequeue({'enqueued_at': 100.0}, now=100.5)
+
+        snapshot = stats.snapshot()
+        assert waited == 0.5
+        assert snapshot['enqueued'] == 1
+        assert snapshot['dequeued'] == 1
+        assert snapshot['max_time_in_queue_ms'] == 500.0
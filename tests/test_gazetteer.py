@@ -0,0 +1,150 @@
+import csv
+from unittest.mock import patch
+
+import pytest
+import responses
+
+from app import gazetteer, geocoding
+from app.gazetteer import Gazetteer, LEVEL_CHOME, LEVEL_CITY, LEVEL_TOWN, write_gazetteer
+from tools.build_gazetteer import build_entries, main, read_rows
+
+
+# 位置参照情報（大字・町丁目レベル）の列の一部
+CSV_ROWS = [
+    ('東京都', '新宿区', '西新宿一丁目', 35.6900, 139.6980),
+    ('東京都', '新宿区', '西新宿二丁目', 35.6890, 139.6920),
+    ('東京都', '中央区', '銀座一丁目', 35.6740, 139.7700),
+    ('大阪府', '大阪市中央区', '本町一丁目', 35.6830, 135.5030),
+    ('北海道', '札幌市中央区', '北一条西', 43.0620, 141.3540),
+    ('東京都', '府中市', '宮西町一丁目', 35.6690, 139.4780),
+    ('広島県', '府中市', '府川町', 34.5680, 133.2360),
+    ('埼玉県', '上尾市', '大字上尾村', 35.9770, 139.5930),
+    ('東京都', '西多摩郡瑞穂町', '箱根ケ崎', 35.7710, 139.3500),
+]
+
+
+@pytest.fixture
+def gazetteer_path(tmp_path):
+    entries, _ = build_entries(CSV_ROWS)
+    path = tmp_path / 'gazetteer.bin'
+    write_gazetteer(str(path), entries, {'source': 'test', 'version': 'v1'})
+    return str(path)
+
+
+@pytest.fixture
+def shared_gazetteer(gazetteer_path):
+    gazetteer.set_gazetteer(Gazetteer(gazetteer_path))
+    yield
+    gazetteer.set_gazetteer(None)
+
+
+class TestGazetteer:
+
+    def test_lookup_chome_town_and_city(self, gazetteer_path):
+        index = Gazetteer(gazetteer_path)
+
+        chome = index.lookup('東京都新宿区西新宿2丁目')
+        town = index.lookup('新宿区西新宿')
+        city = index.lookup('東京都新宿区')
+
+        assert (chome.lat, chome.lon, chome.level) == (35.689, 139.692, LEVEL_CHOME)
+        assert town.level == LEVEL_TOWN
+        assert town.lat == pytest.approx(35.6895)
+        assert city.level == LEVEL_CITY
+        assert index.header['source'] == 'test'
+
+    def test_variants_without_district_and_aza(self, gazetteer_path):
+        index = Gazetteer(gazetteer_path)
+
+        assert index.lookup('瑞穂町箱根ケ崎') is not None
+        assert index.lookup('上尾市上尾村') is not None
+
+    def test_ambiguous_names_need_prefecture(self, gazetteer_path):
+        index = Gazetteer(gazetteer_path)
+
+        assert index.lookup('府中市') is None
+        assert index.lookup('東京都府中市').lat == 35.669
+        assert index.lookup('広島県府中市').lat == 34.568
+        # 政令指定都市の区は市名を含むため、都道府県名がなくても一意に決まる
+        assert index.lookup('札幌市中央区').lat == 43.062
+
+    def test_street_level_address_is_not_resolved(self, gazetteer_path):
+        index = Gazetteer(gazetteer_path)
+
+        assert index.lookup('東京都新宿区西新宿2-8-1') is None
+        assert index.lookup('') is None
+
+    def test_lot_numbered_address_misses_chome(self, gazetteer_path):
+        index = Gazetteer(gazetteer_path)
+
+        assert index.lookup(geocoding.canonicalize_address('東京都新宿区西新宿2丁目')) is not None
+        # 番地だけの住所は丁目の代表点では精度が足りないため、辞書では解決しない
+        assert index.lookup(geocoding.canonicalize_address('東京都新宿区西新宿2番地')) is None
+        assert index.lookup(geocoding.canonicalize_address('東京都新宿区西新宿2番')) is None
+
+    def test_outdated_key_format_is_rejected(self, tmp_path):
+        path = str(tmp_path / 'old.bin')
+        with patch.object(gazetteer, 'KEY_FORMAT', 1):
+            write_gazetteer(path, {'東京都新宿区西新宿2': (35.689, 139.692, LEVEL_CHOME)}, {'source': 'test'})
+
+        index = Gazetteer(path)
+        assert index.lookup('東京都新宿区西新宿2') is None
+        assert len(index) == 0
+
+    def test_missing_file(self, tmp_path):
+        index = Gazetteer(str(tmp_path / 'missing.bin'))
+
+        assert index.lookup('東京都新宿区') is None
+        assert len(index) == 0
+
+    def test_build_tool_reads_csv(self, tmp_path):
+        source = tmp_path / 'source.csv'
+        with open(source, 'w', encoding='cp932', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['都道府県コード', '都道府県名', '市区町村コード', '市区町村名',
+                             '大字町丁目コード', '大字町丁目名', '緯度', '経度'])
+            writer.writerow(['13', '東京都', '13104', '新宿区', '131040023002', '西新宿二丁目', '35.689', '139.692'])
+
+        assert list(read_rows(str(source), 'cp932')) == [('東京都', '新宿区', '西新宿二丁目', 35.689, 139.692)]
+        output = tmp_path / 'gazetteer.bin'
+        assert main([str(source), '--output', str(output), '--version', 'test']) == 0
+        assert Gazetteer(str(output)).lookup('新宿区西新宿2丁目') is not None
+
+
+class TestGeocodeWithGazetteer:
+
+    @responses.activate
+    def test_gazetteer_answers_without_google(self, shared_gazetteer):
+
+        result, source = geocoding.geocode_with_source('東京都新宿区西新宿二丁目')
+
+        assert result == (35.689, 139.692)
+        assert source == 'gazetteer'
+        assert len(responses.calls) == 0
+        assert geocoding.get_geocode_source_stats() == {'gazetteer': 1}
+
+    @responses.activate
+    def test_falls_back_to_google(self, shared_gazetteer, monkeypatch):
+        monkeypatch.setenv('GOOGLE_API_KEY', 'test_key')
+        responses.add(responses.GET, geocoding.GEOCODING_API_URL, json={
+            'status': 'OK', 'results': [{'geometry': {'location': {'lat': 35.6896, 'lng': 139.6917}}}]
+        })
+
+        result, source = geocoding.geocode_with_source('東京都新宿区西新宿2-8-1')
+        cached, cached_source = geocoding.geocode_with_source('東京都新宿区西新宿2-8-1')
+
+        assert result == cached == (35.6896, 139.6917)
+        assert (source, cached_source) == ('google', 'cache')
+        assert geocoding.get_geocode_source_stats() == {'google': 1, 'cache': 1}
+
+    @responses.activate
+    def test_lot_numbered_address_goes_to_google(self, shared_gazetteer, monkeypatch):
+        monkeypatch.setenv('GOOGLE_API_KEY', 'test_key')
+        responses.add(responses.GET, geocoding.GEOCODING_API_URL, json={
+            'status': 'OK', 'results': [{'geometry': {'location': {'lat': 35.6901, 'lng': 139.6931}}}]
+        })
+
+        result, source = geocoding.geocode_with_source('東京都新宿区西新宿2番地')
+
+        assert (result, source) == ((35.6901, 139.6931), 'google')
+        assert len(responses.calls) == 1
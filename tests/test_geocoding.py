@@ -1,6 +1,6 @@
 import responses
 from unittest.mock import patch
-from app.geocoding import geocode, reverse_geocode, get_pref_code
+from app.geocoding import geocode, reverse_geocode, get_pref_code, canonicalize_address, get_geocode_cache_stats
 
 
 class TestGeocoding:
@@ -106,4 +106,79 @@ class TestGeocoding:
         
         with patch.dict('os.environ', {'GOOGLE_API_KEY': 'test_key'}):
             result = get_pref_code(35.6586, 139.7454)
-            assert result is None
\ No newline at end of file
+            assert result is None
+
+class TestGeocodeCache:
+
+    def test_canonicalize_width_and_spacing(self):
+        assert canonicalize_address("東京都　新宿区西新宿２－８－１") == "東京都新宿区西新宿2-8-1"
+
+    def test_canonicalize_block_notation(self):
+        assert canonicalize_address("東京都新宿区西新宿二丁目8番1号") == "東京都新宿区西新宿2-8-1"
+        assert canonicalize_address("東京都新宿区西新宿2丁目8番地1") == "東京都新宿区西新宿2-8-1"
+
+    def test_canonicalize_keeps_chome_and_lot_numbers_distinct(self):
+        forms = [canonicalize_address(address) for address in ("本町2丁目", "本町2番地", "本町2番")]
+
+        assert forms == ["本町2丁目", "本町2番地", "本町2番"]
+        assert canonicalize_address("本町二丁目") == "本町2丁目"
+        # 丁目に続く番号の「番」「番地」「号」は取り除く
+        assert canonicalize_address("西新宿2丁目8番") == canonicalize_address("西新宿2-8") == "西新宿2-8"
+        assert canonicalize_address("西新宿2-8-1号") == "西新宿2-8-1"
+
+    def test_canonicalize_long_vowel_between_digits(self):
+        assert canonicalize_address("西新宿2ー8ー1") == "西新宿2-8-1"
+        assert canonicalize_address("スカイツリー") == "スカイツリー"
+
+    def test_canonicalize_keeps_kanji_place_names(self):
+        assert canonicalize_address("一宮市三条") == "一宮市三条"
+
+    @responses.activate
+    def test_geocode_variants_share_cache(self):
+        responses.add(
+            responses.GET,
+            "https://maps.googleapis.com/maps/api/geocode/json",
+            json={
+                "status": "OK",
+                "results": [{"geometry": {"location": {"lat": 35.6896, "lng": 139.6917}}}]
+            },
+            status=200
+        )
+
+        with patch.dict('os.environ', {'GOOGLE_API_KEY': 'test_key'}):
+            first = geocode("東京都新宿区西新宿2-8-1")
+            second = geocode("東京都新宿区西新宿二丁目８番１号")
+
+        assert first == second == (35.6896, 139.6917)
+        assert len(responses.calls) == 1
+        assert get_geocode_cache_stats()['hits'] == 1
+
+    @responses.activate
+    def test_geocode_zero_results_negative_cache(self):
+        responses.add(
+            responses.GET,
+            "https://maps.googleapis.com/maps/api/geocode/json",
+            json={"status": "ZERO_RESULTS"},
+            status=200
+        )
+
+        with patch.dict('os.environ', {'GOOGLE_API_KEY': 'test_key'}):
+            assert geocode("存在しない住所") is None
+            assert geocode("存在しない住所") is None
+
+        assert len(responses.calls) == 1
+
+    @responses.activate
+    def test_geocode_transient_error_not_cached(self):
+        responses.add(
+            responses.GET,
+            "https://maps.googleapis.com/maps/api/geocode/json",
+            json={"status": "OVER_QUERY_LIMIT"},
+            status=200
+        )
+
+        with patch.dict('os.environ', {'GOOGLE_API_KEY': 'test_key'}):
+            geocode("東京都新宿区")
+            geocode("東京都新宿区")
+
+        assert len(responses.calls) == 2
@@ -0,0 +1,243 @@
+import json
+import time
+from unittest.mock import patch
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+import responses
+from app.cache import TTLCache
+from app.hazard_api_client import (
+    DEFAULT_FANOUT_GROUPS, FanoutGroup, HazardAPIClient, get_fanout_groups, get_hazard_cache_stats, parse_fanout_groups
+)
+from app.hazard_spec import HAZARD_SPECS
+from benchmarks.payloads import FULL_API_RESPONSE
+
+
+API_URL = "https://hazard.example.com/prod/hazardinfo"
+
+SUCCESS_RESPONSE = {
+    'status': 'success',
+    'coordinates': {'latitude': 35.6586, 'longitude': 139.7454},
+    'hazard_info': {
+        'flood': {'max_info': '0.5m以上3m未満', 'center_info': '0.5m未満'}
+    }
+}
+
+
+class TestHazardAPIClientCache:
+
+    @responses.activate
+    def test_repeated_lookup_uses_cache(self):
+        responses.add(responses.GET, API_URL, json=SUCCESS_RESPONSE, status=200)
+        client = HazardAPIClient(api_url=API_URL)
+
+        first = client.get_hazard_info(35.6586, 139.7454)
+        second = client.get_hazard_info(35.65861, 139.74541)
+
+        assert first == second == SUCCESS_RESPONSE
+        assert len(responses.calls) == 1
+        stats = get_hazard_cache_stats()
+        assert stats['hits'] == 1
+        assert stats['misses'] == 1
+
+    @responses.activate
+    def test_cache_shared_between_instances(self):
+        responses.add(responses.GET, API_URL, json=SUCCESS_RESPONSE, status=200)
+
+        HazardAPIClient(api_url=API_URL).get_hazard_info(35.6586, 139.7454)
+        HazardAPIClient(api_url=API_URL).get_hazard_info(35.6586, 139.7454)
+
+        assert len(responses.calls) == 1
+
+    @responses.activate
+    def test_different_hazard_types_are_separate_entries(self):
+        responses.add(responses.GET, API_URL, json=SUCCESS_RESPONSE, status=200)
+        client = HazardAPIClient(api_url=API_URL)
+
+        client.get_hazard_info(35.6586, 139.7454, hazard_types=['flood'])
+        client.get_hazard_info(35.6586, 139.7454, hazard_types=['tsunami'])
+        client.get_hazard_info(35.6586, 139.7454, datum='tokyo', hazard_types=['flood'])
+
+        assert len(responses.calls) == 3
+
+    @responses.activate
+    def test_error_response_is_not_cached(self):
+        responses.add(responses.GET, API_URL, status=500)
+        responses.add(responses.GET, API_URL, json=SUCCESS_RESPONSE, status=200)
+        client = HazardAPIClient(api_url=API_URL)
+
+        first = client.get_hazard_info(35.6586, 139.7454)
+        second = client.get_hazard_info(35.6586, 139.7454)
+
+        assert first['status'] == 'error'
+        assert second == SUCCESS_RESPONSE
+        assert len(responses.calls) == 2
+
+    @responses.activate
+    def test_precision_is_sent_and_cached_separately(self):
+        responses.add(responses.GET, API_URL, json=SUCCESS_RESPONSE, status=200)
+        client = HazardAPIClient(api_url=API_URL)
+
+        client.get_hazard_info(35.6586, 139.7454, precision='low')
+        client.get_hazard_info(35.6586, 139.7454, precision='high')
+        client.get_hazard_info(35.6586, 139.7454, precision='high')
+
+        assert len(responses.calls) == 2
+        assert 'precision=low' in responses.calls[0].request.url
+        assert 'precision=high' in responses.calls[1].request.url
+
+    @responses.activate
+    def test_precision_omitted_by_default(self):
+        responses.add(responses.GET, API_URL, json=SUCCESS_RESPONSE, status=200)
+
+        HazardAPIClient(api_url=API_URL).get_hazard_info(35.6586, 139.7454)
+
+        assert 'precision' not in responses.calls[0].request.url
+
+    @responses.activate
+    def test_custom_cache_instance(self):
+        responses.add(responses.GET, API_URL, json=SUCCESS_RESPONSE, status=200)
+        cache = TTLCache(maxsize=0)
+        client = HazardAPIClient(api_url=API_URL, cache=cache)
+
+        client.get_hazard_info(35.6586, 139.7454)
+        client.get_hazard_info(35.6586, 139.7454)
+
+        assert len(responses.calls) == 2
+
+
+class TestHazardAPIClientBatch:
+
+    @responses.activate
+    def test_batch_deduplicates_and_keeps_input_order(self):
+        responses.add(responses.GET, API_URL, json=SUCCESS_RESPONSE, status=200)
+        client = HazardAPIClient(api_url=API_URL)
+
+        results = client.get_hazard_info_batch([
+            (35.6586, 139.7454),
+            (34.7025, 135.4959),
+            (35.65861, 139.74541),
+            (35.6586, 139.7454),
+        ], max_workers=4)
+
+        assert len(responses.calls) == 2
+        assert [(r['lat'], r['lon']) for r in results] == [
+            (35.6586, 139.7454), (34.7025, 135.4959), (35.65861, 139.74541), (35.6586, 139.7454)
+        ]
+        assert all(r['status'] == 'success' for r in results)
+        assert results[0]['hazard_info'] == {
+            'inundation_depth': {'max_info': '0.5m以上3m未満', 'center_info': '0.5m未満'}
+        }
+
+    @responses.activate
+    def test_batch_reports_failures_per_item(self):
+        def callback(request):
+            if 'lat=34.7025' in request.url:
+                return (500, {}, '')
+            return (200, {}, json.dumps(SUCCESS_RESPONSE))
+
+        responses.add_callback(responses.GET, API_URL, callback=callback)
+        client = HazardAPIClient(api_url=API_URL)
+
+        results = client.get_hazard_info_batch([(35.6586, 139.7454), (34.7025, 135.4959), ('x', None)])
+
+        assert results[0]['status'] == 'success'
+        assert results[1]['status'] == 'error'
+        assert results[1]['hazard_info'] == {}
+        assert results[1]['error_message']
+        assert results[2]['status'] == 'error'
+        assert 'Invalid coordinates' in results[2]['error_message']
+
+    def test_batch_empty_input(self):
+        client = HazardAPIClient(api_url=API_URL)
+
+        assert client.get_hazard_info_batch([]) == []
+
+
+class TestHazardAPIClientFanout:
+
+    GROUPS = parse_fanout_groups('earthquake;flood,tsunami;landslide:0.2')
+
+    @staticmethod
+    def api_callback(delays=None, failing=()):
+        """
+        リクエストされたハザードタイプの分だけ hazard_info を返すAPIのスタブ。
+        """
+        api_keys = {}
+        for spec in HAZARD_SPECS:
+            api_keys.setdefault(spec.hazard_type, []).append(spec.api_key)
+
+        def callback(request):
+            query = parse_qs(urlparse(request.url).query)
+            types = query['hazard_types'][0].split(',')
+            time.sleep(max((delays or {}).get(t, 0) for t in types))
+            if any(t in failing for t in types):
+                return 503, {}, json.dumps({'message': 'unavailable'})
+            hazard_info = {key: FULL_API_RESPONSE['hazard_info'][key] for t in types for key in api_keys[t]}
+            return 200, {}, json.dumps({**FULL_API_RESPONSE, 'hazard_info': hazard_info})
+        return callback
+
+    def test_parse_fanout_groups(self):
+        assert parse_fanout_groups('earthquake; flood,tsunami:5;;', default_timeout=3) == [
+            FanoutGroup(('earthquake',), 3),
+            FanoutGroup(('flood', 'tsunami'), 5.0)
+        ]
+        with pytest.raises(ValueError):
+            parse_fanout_groups('flood:0')
+        with patch.dict('os.environ', {'HAZARD_FANOUT_GROUPS': 'flood:soon'}):
+            assert get_fanout_groups() == parse_fanout_groups(DEFAULT_FANOUT_GROUPS)
+
+    @responses.activate
+    def test_groups_are_fetched_in_parallel_and_merged(self):
+        responses.add_callback(responses.GET, API_URL, callback=self.api_callback({'earthquake': 0.1, 'flood': 0.1}))
+        client = HazardAPIClient(api_url=API_URL, use_snapshot=False)
+
+        started = time.monotonic()
+        response = client.get_hazard_info_fanout(
+            35.6896, 139.6917, hazard_types=['earthquake', 'flood', 'tsunami', 'avalanche'], groups=self.GROUPS
+        )
+        elapsed = time.monotonic() - started
+
+        assert elapsed < 0.19
+        assert len(responses.calls) == 3
+        assert set(response['hazard_info']) == {'jshis_prob_50', 'jshis_prob_60', 'flood', 'tsunami', 'avalanche'}
+        assert response['requested_hazard_types'] == ['earthquake', 'flood', 'tsunami', 'avalanche']
+        assert 'partial' not in response
+
+    @responses.activate
+    def test_slow_and_failed_groups_are_reported_as_partial(self):
+        responses.add_callback(responses.GET, API_URL, callback=self.api_callback({'landslide': 0.5}, failing={'flood'}))
+        client = HazardAPIClient(api_url=API_URL, use_snapshot=False)
+
+        started = time.monotonic()
+        response = client.get_hazard_info_fanout(
+            35.6896, 139.6917, hazard_types=['earthquake', 'flood', 'tsunami', 'landslide'], groups=self.GROUPS
+        )
+        elapsed = time.monotonic() - started
+
+        assert elapsed < 0.45
+        assert response['status'] == 'success'
+        assert set(response['hazard_info']) == {'jshis_prob_50', 'jshis_prob_60'}
+        assert response['partial'] == {'pending': ['landslide'], 'failed': ['flood', 'tsunami']}
+        # 間に合わなかったグループの完了を待ち、後続のテストのキャッシュに結果が入らないようにする
+        time.sleep(0.4)
+
+    @responses.activate
+    def test_all_groups_failing_is_an_error(self):
+        responses.add_callback(responses.GET, API_URL, callback=self.api_callback(failing={'earthquake', 'flood'}))
+        client = HazardAPIClient(api_url=API_URL, use_snapshot=False)
+
+        response = client.get_hazard_info_fanout(35.6896, 139.6917, hazard_types=['earthquake', 'flood'], groups=self.GROUPS)
+
+        assert response['status'] == 'error'
+
+    @responses.activate
+    def test_combined_cache_entry_is_used_before_fanning_out(self):
+        responses.add(responses.GET, API_URL, json=FULL_API_RESPONSE, status=200)
+        client = HazardAPIClient(api_url=API_URL, use_snapshot=False)
+        client.get_hazard_info(35.6896, 139.6917)
+
+        response = client.get_hazard_info_fanout(35.6896, 139.6917, groups=self.GROUPS)
+
+        assert response == FULL_API_RESPONSE
+        assert len(responses.calls) == 1
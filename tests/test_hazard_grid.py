@@ -0,0 +1,161 @@
+from unittest.mock import MagicMock, patch
+
+import pytest
+import responses
+
+from app import display_formatter, hazard_grid
+from app.cache import TTLCache
+from app.hazard_api_client import HazardAPIClient
+from app.hazard_grid import HazardGrid, make_region
+from benchmarks import payloads
+from lambda_function import _fetch_formatted_hazards
+from tools.build_hazard_grid import build_grid, parse_bbox
+
+
+API_URL = "https://hazard.example.com/prod/hazardinfo"
+
+# 2×3セル（刻み0.01度）の領域。北東のセルは構築時にAPIエラーとする
+REGION = make_region('test', 35.60, 139.70, 35.62, 139.73, step=0.01)
+
+
+def fake_response(lat, lon, **kwargs):
+    if lat > 35.61 and lon > 139.72:
+        return {'status': 'error', 'error_message': 'timeout'}
+    if lon > 139.71:
+        return payloads.SPARSE_API_RESPONSE
+    return payloads.FULL_API_RESPONSE
+
+
+def without_center_values(hazard_info):
+    """
+    APIレスポンスのhazard_infoから中心点の値を除く（スナップショットは中心点の値を返さない）。
+    """
+    if not isinstance(hazard_info, dict):
+        return hazard_info
+    stripped = {key: without_center_values(value) for key, value in hazard_info.items()
+                if key not in hazard_grid.CENTER_VALUE_KEYS}
+    return {key: value for key, value in stripped.items() if value != {}}
+
+
+@pytest.fixture
+def grid_path(tmp_path):
+    client = MagicMock()
+    client.get_hazard_info.side_effect = fake_response
+    writer = build_grid(client, [REGION], max_workers=2)
+    path = tmp_path / 'hazard_grid.bin'
+    writer.write(str(path), {'version': 'test-1', 'datum': 'wgs84', 'precision': None, 'step': 0.01})
+    return str(path)
+
+
+@pytest.fixture
+def shared_grid(grid_path):
+    grid = HazardGrid(grid_path)
+    hazard_grid.set_hazard_grid(grid)
+    yield grid
+    hazard_grid.set_hazard_grid(None)
+
+
+class TestHazardGrid:
+
+    def test_region_cells(self):
+        assert (REGION.rows, REGION.cols) == (2, 3)
+        assert REGION.cell_index(35.6001, 139.7001) == (0, 0)
+        assert REGION.cell_index(35.6199, 139.7299) == (1, 2)
+        assert REGION.cell_index(35.6201, 139.70) is None
+        assert REGION.cell_index(35.60, 139.6999) is None
+        assert REGION.cell_center(1, 2) == (35.615, 139.725)
+
+    def test_lookup_restores_api_response(self, grid_path):
+        grid = HazardGrid(grid_path)
+
+        full = grid.lookup(35.6051, 139.7052)
+        sparse = grid.lookup(35.6051, 139.7152)
+
+        assert full['hazard_info'] == without_center_values(payloads.FULL_API_RESPONSE['hazard_info'])
+        assert sparse['hazard_info'] == without_center_values(payloads.SPARSE_API_RESPONSE['hazard_info'])
+        assert full['snapshot']['version'] == 'test-1'
+        # 値はセルの代表点のもので、問い合わせ地点の座標を出典として名乗らない
+        assert full['snapshot']['cell_center'] == {'latitude': 35.605, 'longitude': 139.705}
+        assert full['source'].startswith('格子の代表点: 35.605, 139.705')
+
+    def test_snapshot_answer_is_displayed_as_approximation(self, grid_path):
+        full = HazardGrid(grid_path).lookup(35.6051, 139.7052)
+
+        formatted = display_formatter.format_api_response_for_display(full)
+        expected = display_formatter.format_api_response_for_display(payloads.FULL_API_RESPONSE)
+
+        assert formatted.keys() == expected.keys()
+        assert all('中心点' not in value for value in formatted.values())
+        assert '約1110m四方' in display_formatter.format_snapshot_notice(full)
+        assert display_formatter.format_snapshot_notice(payloads.FULL_API_RESPONSE) is None
+
+    def test_lookup_filters_hazard_types(self, grid_path):
+        response = HazardGrid(grid_path).lookup(35.6051, 139.7052, hazard_types=['earthquake', 'landslide'])
+
+        assert set(response['hazard_info']) == {'jshis_prob_50', 'jshis_prob_60', 'landslide'}
+
+    def test_misses_outside_coverage_and_unbuilt_cells(self, grid_path):
+        grid = HazardGrid(grid_path)
+
+        assert grid.lookup(34.70, 135.50) is None
+        assert grid.lookup(35.615, 139.725) is None
+        assert grid.lookup(35.605, 139.705, datum='tokyo') is None
+        assert grid.lookup(35.605, 139.705, precision='high') is None
+        assert grid.lookup(35.605, 139.705, precision='low') is not None
+
+        stats = grid.stats()
+        assert (stats['cells'], stats['built_cells']) == (6, 5)
+        assert stats['coverage'] == pytest.approx(5 / 6)
+        assert (stats['lookups'], stats['hits'], stats['outside']) == (3, 1, 1)
+        assert stats['hit_rate'] == pytest.approx(1 / 3)
+
+    def test_missing_or_invalid_file(self, tmp_path):
+        invalid = tmp_path / 'invalid.bin'
+        invalid.write_bytes(b'not a snapshot')
+
+        assert HazardGrid(str(tmp_path / 'missing.bin')).lookup(35.605, 139.705) is None
+        assert HazardGrid(str(invalid)).lookup(35.605, 139.705) is None
+        assert HazardGrid(str(invalid)).stats()['available'] is False
+
+    def test_parse_bbox(self):
+        assert parse_bbox('sendai:38.2,140.8,38.33,140.95') == ('sendai', (38.2, 140.8, 38.33, 140.95))
+        with pytest.raises(Exception):
+            parse_bbox('38.2,140.8,38.33,140.95')
+
+
+class TestHazardAPIClientSnapshot:
+
+    @responses.activate
+    def test_covered_point_is_served_without_api_call(self, shared_grid):
+        client = HazardAPIClient(api_url=API_URL, cache=TTLCache(maxsize=0))
+
+        response = client.get_hazard_info(35.6051, 139.7052)
+
+        assert response['hazard_info'] == without_center_values(payloads.FULL_API_RESPONSE['hazard_info'])
+        assert len(responses.calls) == 0
+        assert hazard_grid.get_snapshot_stats()['hits'] == 1
+
+    @responses.activate
+    def test_falls_back_to_api_outside_coverage(self, shared_grid):
+        responses.add(responses.GET, API_URL, json=payloads.SPARSE_API_RESPONSE, status=200)
+        client = HazardAPIClient(api_url=API_URL)
+
+        outside = client.get_hazard_info(34.70, 135.50)
+        unbuilt = client.get_hazard_info(35.615, 139.725)
+        bypassed = HazardAPIClient(api_url=API_URL, cache=TTLCache(maxsize=0), use_snapshot=False).get_hazard_info(
+            35.6051, 139.7052
+        )
+
+        assert outside == unbuilt == bypassed == payloads.SPARSE_API_RESPONSE
+        assert len(responses.calls) == 3
+
+    @responses.activate
+    def test_reply_carries_approximation_notice(self, shared_grid):
+        with patch.dict('os.environ', {'HAZARD_MAP_API_URL': API_URL}):
+            error, formatted, notice, snapshot_notice = _fetch_formatted_hazards(35.6051, 139.7052)
+
+        assert error is None
+        assert formatted
+        assert notice is None
+        assert snapshot_notice == display_formatter.format_snapshot_notice(shared_grid.lookup(35.6051, 139.7052))
+        assert len(responses.calls) == 0
@@ -0,0 +1,69 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+
+import pytest
+import responses
+
+from app import http_client
+
+
+class _KeepAliveHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        body = b'{"status": "OK"}'
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def local_server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _KeepAliveHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/"
+    server.shutdown()
+    server.server_close()
+
+
+class TestHttpClient:
+
+    def setup_method(self):
+        http_client.close_sessions()
+
+    def teardown_method(self):
+        http_client.close_sessions()
+
+    def test_session_is_reused_per_upstream(self):
+        assert http_client.get_session('hazard') is http_client.get_session('hazard')
+        assert http_client.get_session('hazard') is not http_client.get_session('line')
+
+    def test_timeout_defaults_and_override(self):
+        assert http_client.get_timeout('line') == 5.0
+        with patch.dict('os.environ', {'HAZARD_API_TIMEOUT_SECONDS': '12'}):
+            assert http_client.get_timeout('hazard') == 12.0
+
+    @responses.activate
+    def test_request_applies_upstream_timeout(self):
+        responses.add(responses.GET, "https://hazard.example.com/", json={}, status=200)
+
+        http_client.request('geocoding', 'GET', "https://hazard.example.com/")
+
+        assert responses.calls[0].request.req_kwargs['timeout'] == 10.0
+
+    def test_connections_are_kept_alive(self, local_server):
+        for _ in range(3):
+            response = http_client.request('hazard', 'GET', local_server)
+            assert response.json() == {'status': 'OK'}
+
+        stats = http_client.get_connection_stats()['hazard']
+        assert stats['requests'] == 3
+        assert stats['new_connections'] == 1
+        assert stats['reused_connections'] == 2
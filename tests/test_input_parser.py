@@ -1,4 +1,4 @@
-from app.input_parser import parse_input_type
+from app.input_parser import extract_coordinates, extract_hazard_types, parse_input_type, parse_latlon
 
 
 class TestInputParser:
@@ -46,4 +46,93 @@ class TestInputParser:
     
     def test_parse_empty_string(self):
         result = parse_input_type("")
-        assert result == ('address', "")
\ No newline at end of file
+        assert result == ('address', "")
+    
+    def test_parse_strips_hazard_keyword(self):
+        result = parse_input_type("津波 東京駅")
+        assert result == ('address', "東京駅")
+    
+    def test_parse_latlon_with_hazard_keyword(self):
+        result = parse_input_type("35.6586, 139.7454 の地震")
+        assert result == ('latlon', "35.6586, 139.7454")
+
+
+class TestExtractHazardTypes:
+    
+    def test_no_keyword(self):
+        assert extract_hazard_types("東京都新宿区西新宿1-1-1") == ("東京都新宿区西新宿1-1-1", None)
+    
+    def test_single_keyword(self):
+        assert extract_hazard_types("東京駅の津波リスク") == ("東京駅", ['tsunami'])
+    
+    def test_multiple_keywords(self):
+        location, hazard_types = extract_hazard_types("洪水と土砂 新宿区西新宿2-8-1")
+        assert location == "新宿区西新宿2-8-1"
+        assert hazard_types == ['flood', 'flood_keizoku', 'kaokutoukai_hanran', 'landslide']
+    
+    def test_compound_keyword_is_not_split(self):
+        assert extract_hazard_types("高潮浸水想定 大阪市北区") == ("大阪市北区", ['high_tide'])
+    
+    def test_url_is_left_untouched(self):
+        url = "https://example.com/津波"
+        assert extract_hazard_types(url) == (url, None)
+
+
+class TestExtractCoordinates:
+    
+    def test_google_maps_place_url_prefers_place_coordinates(self):
+        url = ("https://www.google.com/maps/place/%E6%9D%B1%E4%BA%AC/@35.6585805,139.7428526,17z"
+               "/data=!3m1!4b1!4m6!3m5!8m2!3d35.6585805!4d139.7454329")
+        assert extract_coordinates(url) == (35.6585805, 139.7454329)
+    
+    def test_google_maps_center_and_query_urls(self):
+        assert extract_coordinates("https://www.google.com/maps/@35.6586,139.7454,17z") == (35.6586, 139.7454)
+        assert extract_coordinates("https://www.google.com/maps/search/?api=1&query=35.6586,139.7454") == (35.6586, 139.7454)
+        assert extract_coordinates("https://maps.google.co.jp/maps?q=35.6586,139.7454") == (35.6586, 139.7454)
+    
+    def test_gsi_map_url(self):
+        url = "https://maps.gsi.go.jp/#16/35.658600/139.745400/&base=std&ls=std"
+        assert extract_coordinates(url) == (35.6586, 139.7454)
+    
+    def test_url_in_sentence(self):
+        assert extract_coordinates("ここです https://maps.gsi.go.jp/#16/35.6586/139.7454/") == (35.6586, 139.7454)
+    
+    def test_non_map_and_short_urls_are_ignored(self):
+        assert extract_coordinates("https://example.com/?q=35.6586,139.7454") is None
+        assert extract_coordinates("https://maps.app.goo.gl/abcdef") is None
+    
+    def test_kanji_notation(self):
+        lat, lon = extract_coordinates("北緯35度39分31秒 東経139度44分43秒")
+        assert round(lat, 6) == 35.658611
+        assert round(lon, 6) == 139.745278
+    
+    def test_kanji_notation_any_order_and_southern_hemisphere(self):
+        lat, lon = extract_coordinates("東経151度12分 南緯33度52分")
+        assert round(lat, 6) == -33.866667
+        assert round(lon, 6) == 151.2
+    
+    def test_dms_notation(self):
+        lat, lon = extract_coordinates("35°39'31.0\"N 139°44'43.4\"E")
+        assert round(lat, 6) == 35.658611
+        assert round(lon, 6) == 139.745389
+    
+    def test_fullwidth_decimal(self):
+        assert extract_coordinates("３５．６５８６，１３９．７４５４") == (35.6586, 139.7454)
+    
+    def test_out_of_range_values_are_rejected(self):
+        assert extract_coordinates("北緯95度 東経139度") is None
+        assert extract_coordinates("北緯35度70分 東経139度") is None
+        assert extract_coordinates("https://maps.gsi.go.jp/#16/135.0/139.0/") is None
+    
+    def test_address_is_not_coordinates(self):
+        assert extract_coordinates("東京都新宿区西新宿2-8-1") is None
+    
+    def test_parse_input_type_normalizes_map_url(self):
+        result = parse_input_type("https://www.google.com/maps/@35.6586,139.7454,17z")
+        assert result == ('latlon', "35.6586, 139.7454")
+    
+    def test_parse_latlon_range(self):
+        assert parse_latlon("35.6586, 139.7454") == (35.6586, 139.7454)
+        assert parse_latlon("95.0, 139.7454") is None
+        assert parse_latlon("invalid, coords") is None
+
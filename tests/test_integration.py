@@ -8,7 +8,7 @@ class TestIntegration:
     
     @responses.activate
     @patch('lambda_function.hazard_api_client.HazardAPIClient')
-    @patch('lambda_function.display_formatter.format_all_hazard_info_for_display')
+    @patch('lambda_function.display_formatter.format_api_response_for_display')
     def test_full_workflow_address_input(self, mock_format, mock_api_client):
         # モックの設定
         mock_api_instance = mock_api_client.return_value
@@ -1,5 +1,12 @@
-from unittest.mock import patch
-from lambda_function import get_formatted_hazard_data, get_hazard_response, lambda_handler
+import base64
+import hashlib
+import hmac
+import json
+from unittest.mock import MagicMock, patch
+
+import pytest
+from app import event_queue
+from lambda_function import get_formatted_hazard_data, get_hazard_response, lambda_handler, worker_handler
 
 
 class TestLambdaFunction:
@@ -7,7 +14,7 @@ class TestLambdaFunction:
     @patch('lambda_function.input_parser.parse_input_type')
     @patch('lambda_function.geocoding.geocode')
     @patch('lambda_function.hazard_api_client.HazardAPIClient')
-    @patch('lambda_function.display_formatter.format_all_hazard_info_for_display')
+    @patch('lambda_function.display_formatter.format_api_response_for_display')
     def test_get_formatted_hazard_data_address(self, mock_format, mock_api_client, mock_geocode, mock_parse):
         mock_parse.return_value = ('address', '東京都新宿区')
         mock_geocode.return_value = (35.6586, 139.7454)
@@ -26,6 +33,84 @@ class TestLambdaFunction:
         assert data == {'洪水': '低リスク'}
         assert info == '「東京都新宿区」周辺のハザード情報です。'
     
+    @patch('lambda_function.hazard_api_client.HazardAPIClient')
+    def test_get_formatted_hazard_data_narrows_hazard_types(self, mock_api_client):
+        mock_api_instance = mock_api_client.return_value
+        mock_api_instance.get_hazard_info.return_value = {
+            'status': 'success',
+            'hazard_info': {'tsunami': {'max_info': '0.3m未満', 'center_info': '0.3m未満'}}
+        }
+        
+        error, data, info = get_formatted_hazard_data('津波 35.6586, 139.7454')
+        
+        assert error is None
+        assert list(data) == ['津波浸水想定']
+        assert info == '座標「35.6586, 139.7454」のハザード情報です。'
+        mock_api_instance.get_hazard_info.assert_called_once_with(
+            35.6586, 139.7454, hazard_types=['tsunami'], precision=None
+        )
+    
+    @patch('lambda_function.geocoding.geocode')
+    @patch('lambda_function.hazard_api_client.HazardAPIClient')
+    def test_get_formatted_hazard_data_map_url_skips_geocoding(self, mock_api_client, mock_geocode):
+        mock_api_client.return_value.get_hazard_info.return_value = {'status': 'success', 'hazard_info': {}}
+        
+        error, data, info = get_formatted_hazard_data('https://maps.gsi.go.jp/#16/35.658600/139.745400/')
+        
+        assert error is None
+        mock_geocode.assert_not_called()
+        mock_api_client.return_value.get_hazard_info.assert_called_once_with(
+            35.6586, 139.7454, hazard_types=None, precision=None
+        )
+    
+    @patch('lambda_function.geocoding.geocode')
+    def test_get_formatted_hazard_data_keyword_without_location(self, mock_geocode):
+        error, data, info = get_formatted_hazard_data('地震')
+        
+        assert error == "場所を特定できませんでした。住所やURLを確認してください。"
+        mock_geocode.assert_not_called()
+    
+    @patch('lambda_function.hazard_api_client.HazardAPIClient')
+    def test_get_formatted_hazard_data_error_response(self, mock_api_client):
+        mock_api_client.return_value.get_hazard_info.return_value = {
+            'status': 'error', 'error_message': '503 Server Error', 'hazard_info': {}
+        }
+        
+        error, data, info = get_formatted_hazard_data('35.6586, 139.7454')
+        
+        assert error == "ハザード情報の取得に失敗しました。エラー: 503 Server Error"
+        assert data is None
+    
+    @patch('lambda_function.hazard_api_client.HazardAPIClient')
+    def test_get_formatted_hazard_data_stale_notice(self, mock_api_client):
+        mock_api_client.return_value.get_hazard_info.return_value = {
+            'status': 'success',
+            'hazard_info': {},
+            'stale': {'fetched_at': 0, 'error_message': 'Circuit for hazard is open'}
+        }
+        
+        error, data, info = get_formatted_hazard_data('35.6586, 139.7454')
+        
+        assert error is None
+        assert info.startswith('座標「35.6586, 139.7454」のハザード情報です。\n※ハザード情報APIに接続できないため')
+    
+    @patch('lambda_function.hazard_api_client.HazardAPIClient')
+    def test_get_formatted_hazard_data_fanout_partial(self, mock_api_client):
+        mock_api_client.return_value.get_hazard_info_fanout.return_value = {
+            'status': 'success',
+            'hazard_info': {'flood': {'max_info': '0.5m以上3m未満', 'center_info': '0.5m未満'}},
+            'partial': {'pending': ['landslide'], 'failed': []}
+        }
+
+        with patch.dict('os.environ', {'HAZARD_FANOUT': '1'}):
+            error, data, info = get_formatted_hazard_data('35.6586, 139.7454')
+
+        assert error is None
+        assert data['土砂災害警戒・特別警戒区域'] == '取得中'
+        assert data['想定最大浸水深'] == " 周辺100mの最大: 0.5m以上3m未満\n 中心点: 0.5m未満"
+        assert info.endswith('※一部のハザード情報を時間内に取得できませんでした（「取得中」「取得失敗」の項目）。')
+        mock_api_client.return_value.get_hazard_info.assert_not_called()
+    
     @patch('lambda_function.input_parser.parse_input_type')
     def test_get_formatted_hazard_data_invalid_latlon(self, mock_parse):
         mock_parse.return_value = ('latlon', 'invalid,coords')
@@ -84,4 +169,271 @@ class TestLambdaFunction:
         result = lambda_handler(event, None)
         
         assert result['statusCode'] == 400
-        assert result['body'] == '"Missing X-Line-Signature"'
\ No newline at end of file
+        assert result['body'] == '"Missing X-Line-Signature"'
+
+class TestWebhookIngestion:
+
+    SECRET = 'test_secret'
+
+    def _signed_event(self, body: bytes, base64_encoded: bool, header='x-line-signature'):
+        signature = base64.b64encode(hmac.new(self.SECRET.encode('utf-8'), body, hashlib.sha256).digest()).decode()
+        return {
+            'headers': {header: signature},
+            'body': base64.b64encode(body).decode('ascii') if base64_encoded else body.decode('utf-8'),
+            'isBase64Encoded': base64_encoded
+        }
+
+    def _body(self):
+        return json.dumps({'destination': 'U0', 'events': [{
+            'type': 'message',
+            'message': {'type': 'text', 'text': '東京都新宿区'},
+            'replyToken': 'test_reply_token'
+        }]}, ensure_ascii=False).encode('utf-8')
+
+    @patch('lambda_function.get_hazard_response', return_value='ハザード情報')
+    def test_base64_body_is_verified_over_raw_bytes(self, mock_response):
+        event = self._signed_event(self._body(), base64_encoded=True, header='X-LINE-Signature')
+        with patch.dict('os.environ', {'LINE_CHANNEL_SECRET': self.SECRET, 'LINE_CHANNEL_ACCESS_TOKEN': 'test_token'}):
+            result = lambda_handler(event, None)
+
+        assert result['statusCode'] == 200
+        mock_response.assert_called_once_with('東京都新宿区')
+
+    @patch('lambda_function.get_hazard_response')
+    def test_tampered_body_is_rejected(self, mock_response):
+        event = self._signed_event(self._body(), base64_encoded=False)
+        event['body'] = event['body'].replace('新宿区', '渋谷区')
+        with patch.dict('os.environ', {'LINE_CHANNEL_SECRET': self.SECRET}):
+            lambda_handler(event, None)
+
+        mock_response.assert_not_called()
+
+    def test_invalid_base64_body(self):
+        event = {'headers': {'x-line-signature': 'sig'}, 'body': '***', 'isBase64Encoded': True}
+
+        result = lambda_handler(event, None)
+
+        assert result['statusCode'] == 400
+
+
+class TestDeferredWebhookMode:
+
+    @pytest.fixture(autouse=True)
+    def durable_queue(self, tmp_path):
+        self.queue = event_queue.SQLiteEventQueue(str(tmp_path / 'queue.db'))
+        event_queue.set_event_queue(self.queue)
+        yield
+        event_queue.set_event_queue(None)
+        self.queue.close()
+
+    def _event(self, text):
+        return {
+            'headers': {'x-line-signature': 'test_signature'},
+            'body': json.dumps({
+                'events': [{
+                    'type': 'message',
+                    'message': {'type': 'text', 'text': text},
+                    'replyToken': 'test_reply_token'
+                }]
+            })
+        }
+
+    @patch('lambda_function.get_hazard_response')
+    def test_webhook_acks_without_processing(self, mock_response):
+        with patch.dict('os.environ', {'WEBHOOK_MODE': 'deferred', 'LINE_CHANNEL_SECRET': 'test_secret'}):
+            result = lambda_handler(self._event('東京都新宿区'), None)
+
+        assert result['statusCode'] == 200
+        assert json.loads(result['body'])['queued_events'] == 1
+        assert self.queue.depth() == 1
+        mock_response.assert_not_called()
+
+    def test_webhook_rejects_invalid_signature_without_enqueue(self):
+        event = self._event('東京都新宿区')
+        event['headers']['x-line-signature'] = 'invalid_signature'
+        with patch.dict('os.environ', {'WEBHOOK_MODE': 'deferred', 'LINE_CHANNEL_SECRET': 'test_secret'}):
+            result = lambda_handler(event, None)
+
+        assert result['statusCode'] == 200
+        assert json.loads(result['body']) == 'OK'
+        assert self.queue.depth() == 0
+
+    @patch('lambda_function.get_hazard_response')
+    def test_in_memory_queue_falls_back_to_sync(self, mock_response):
+        mock_response.return_value = 'ハザード情報'
+        memory_queue = event_queue.InMemoryEventQueue()
+        event_queue.set_event_queue(memory_queue)
+        with patch.dict('os.environ', {
+            'WEBHOOK_MODE': 'deferred',
+            'LINE_CHANNEL_SECRET': 'test_secret',
+            'LINE_CHANNEL_ACCESS_TOKEN': 'test_token'
+        }):
+            result = lambda_handler(self._event('東京都新宿区'), None)
+
+        assert json.loads(result['body'])['line_processing_result']['test_mode'] is True
+        assert memory_queue.depth() == 0
+        mock_response.assert_called_once_with('東京都新宿区')
+
+    @patch('lambda_function.get_hazard_response')
+    def test_worker_drains_queue_and_replies(self, mock_response):
+        mock_response.return_value = 'ハザード情報'
+        with patch.dict('os.environ', {
+            'WEBHOOK_MODE': 'deferred',
+            'LINE_CHANNEL_SECRET': 'test_secret',
+            'LINE_CHANNEL_ACCESS_TOKEN': 'test_token'
+        }):
+            lambda_handler(self._event('東京都新宿区'), None)
+            result = worker_handler({}, None)
+
+        assert result['processed_messages'] == 1
+        line_response = result['results'][0]['line_responses'][0]
+        assert line_response['bot_response'] == 'ハザード情報'
+        assert line_response['line_result']['test_mode'] is True
+        assert result['queue_metrics']['queue_depth'] == 0
+        assert result['queue_metrics']['dequeued'] == 1
+
+    @patch('lambda_function.get_hazard_response')
+    def test_worker_processes_sqs_records(self, mock_response):
+        mock_response.return_value = 'ハザード情報'
+        message = {
+            'events': json.loads(self._event('35.6586, 139.7454')['body'])['events'],
+            'signature': 'test_signature',
+            'enqueued_at': 0
+        }
+        with patch.dict('os.environ', {'LINE_CHANNEL_ACCESS_TOKEN': 'test_token'}):
+            result = worker_handler({'Records': [{'body': json.dumps(message)}]}, None)
+
+        assert result['processed_messages'] == 1
+        assert result['batchItemFailures'] == []
+        mock_response.assert_called_once_with('35.6586, 139.7454')
+
+    @patch('lambda_function.line_handler.process_queued_message')
+    def test_worker_reports_failed_sqs_records(self, mock_process):
+        mock_process.side_effect = [{'processed_events': 1, 'line_responses': []}, RuntimeError('boom')]
+        records = [
+            {'messageId': 'm1', 'body': json.dumps({'events': [], 'enqueued_at': 0})},
+            {'messageId': 'm2', 'body': json.dumps({'events': [], 'enqueued_at': 0})},
+            {'messageId': 'm3', 'body': 'not json'}
+        ]
+
+        result = worker_handler({'Records': records}, None)
+
+        assert result['processed_messages'] == 1
+        assert result['batchItemFailures'] == [{'itemIdentifier': 'm2'}, {'itemIdentifier': 'm3'}]
+
+    @patch('lambda_function.line_handler.process_queued_message')
+    def test_worker_acks_only_processed_messages(self, mock_process):
+        mock_process.side_effect = [{'processed_events': 1, 'line_responses': []}, RuntimeError('boom')]
+        queue = MagicMock()
+        queue.dequeue.return_value = [{'id': 1}, {'id': 2}]
+        queue.depth.return_value = 1
+        queue.stats = event_queue.EventQueueStats()
+        event_queue.set_event_queue(queue)
+
+        result = worker_handler({}, None)
+
+        assert result['processed_messages'] == 1
+        queue.ack.assert_called_once_with({'id': 1})
+        assert 'batchItemFailures' not in result
+
+    @patch('lambda_function.line_handler.process_queued_message')
+    def test_failed_message_stays_in_sqlite_queue(self, mock_process):
+        mock_process.side_effect = RuntimeError('boom')
+        self.queue.visibility_timeout = 0
+        self.queue.enqueue({'events': [], 'enqueued_at': 0})
+
+        result = worker_handler({}, None)
+
+        assert result['processed_messages'] == 0
+        # 処理に失敗したメッセージは削除されず、可視性タイムアウトの経過後に再び取り出される
+        assert self.queue.depth() == 1
+
+
+class TestProgressiveLookup:
+
+    LOW_RESPONSE = {
+        'status': 'success',
+        'hazard_info': {'flood': {'max_info': '0.5m未満', 'center_info': '0.5m未満'}}
+    }
+    HIGH_RESPONSE = {
+        'status': 'success',
+        'hazard_info': {'flood': {'max_info': '0.5m以上3m未満', 'center_info': '0.5m未満'}}
+    }
+
+    def _event(self, text):
+        return {
+            'headers': {'x-line-signature': 'test_signature'},
+            'body': json.dumps({
+                'events': [{
+                    'type': 'message',
+                    'message': {'type': 'text', 'text': text},
+                    'replyToken': 'test_reply_token',
+                    'source': {'type': 'user', 'userId': 'U1234'}
+                }]
+            })
+        }
+
+    def _run(self, responses_by_precision):
+        def fake_get_hazard_info(self, lat, lon, datum='wgs84', hazard_types=None, precision=None):
+            return responses_by_precision[precision]
+
+        with patch.dict('os.environ', {
+            'PROGRESSIVE_LOOKUP': '1',
+            'HAZARD_MAP_API_URL': 'https://hazard.example.com/',
+            'LINE_CHANNEL_SECRET': 'test_secret',
+            'LINE_CHANNEL_ACCESS_TOKEN': 'test_token'
+        }), patch('app.hazard_api_client.HazardAPIClient.get_hazard_info', fake_get_hazard_info):
+            result = lambda_handler(self._event('35.6586, 139.7454'), None)
+        return json.loads(result['body'])
+
+    def test_replies_with_low_and_pushes_differing_high(self):
+        body = self._run({'low': self.LOW_RESPONSE, 'high': self.HIGH_RESPONSE})
+
+        reply = body['line_processing_result']['line_responses'][0]['bot_response']
+        assert '想定最大浸水深' in reply and '0.5m未満' in reply
+        follow_up = body['follow_ups'][0]
+        assert follow_up['status'] == 'pushed'
+        pushed = follow_up['line_result']['line_payload']
+        assert pushed['to'] == 'U1234'
+        assert '0.5m以上3m未満' in pushed['messages'][0]['text']
+
+    def test_no_push_when_high_matches_low(self):
+        body = self._run({'low': self.LOW_RESPONSE, 'high': self.LOW_RESPONSE})
+
+        assert body['follow_ups'][0]['status'] == 'unchanged'
+        assert 'line_result' not in body['follow_ups'][0]
+
+    def test_failed_high_lookup_does_not_push(self):
+        error_response = {'status': 'error', 'error_message': 'timeout', 'hazard_info': {}}
+        body = self._run({'low': self.LOW_RESPONSE, 'high': error_response})
+
+        assert body['follow_ups'][0]['status'] == 'failed'
+
+    def test_snapshot_answer_is_followed_up_with_high_precision(self):
+        snapshot_response = {
+            'status': 'success',
+            'hazard_info': {'flood': {'max_info': '0.5m未満'}},
+            'snapshot': {'version': 'test-1', 'approximate': True, 'step': 0.001}
+        }
+        body = self._run({'low': snapshot_response, 'high': self.HIGH_RESPONSE})
+
+        reply = body['line_processing_result']['line_responses'][0]['bot_response']
+        assert '格子の代表点' in reply
+        assert body['follow_ups'][0]['status'] == 'pushed'
+
+    def test_stale_answer_is_not_followed_up(self):
+        stale_response = {**self.LOW_RESPONSE, 'stale': {'fetched_at': 0, 'error_message': 'timeout'}}
+        body = self._run({'low': stale_response, 'high': self.HIGH_RESPONSE})
+
+        assert 'follow_ups' not in body
+
+    def test_partial_high_lookup_does_not_push(self):
+        partial_response = {
+            **self.HIGH_RESPONSE,
+            'partial': {'pending': ['earthquake'], 'failed': ['tsunami']}
+        }
+        body = self._run({'low': self.LOW_RESPONSE, 'high': partial_response})
+
+        follow_up = body['follow_ups'][0]
+        assert follow_up['status'] == 'failed'
+        assert 'line_result' not in follow_up
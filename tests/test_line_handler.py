@@ -1,7 +1,8 @@
 import json
+import os
 import responses
 from unittest.mock import patch, MagicMock
-from app.line_handler import validate_signature, reply_message, handle_line_event
+from app.line_handler import validate_signature, reply_message, push_message, handle_line_event, get_push_target
 
 
 class TestLineHandler:
@@ -29,6 +30,46 @@ class TestLineHandler:
         result = validate_signature(body, signature, secret)
         assert result is False
     
+    def test_validate_signature_bytes(self):
+        body = json.dumps({"events": [], "text": "東京都"}, ensure_ascii=False).encode('utf-8')
+        secret = "test_secret"
+        
+        import hmac
+        import hashlib
+        import base64
+        
+        signature = base64.b64encode(hmac.new(secret.encode('utf-8'), body, hashlib.sha256).digest()).decode('utf-8')
+        
+        assert validate_signature(body, signature, secret) is True
+        assert validate_signature(body + b" ", signature, secret) is False
+    
+    def test_test_signature_substring_is_rejected(self):
+        with patch.dict('os.environ', {'LINE_CHANNEL_SECRET': 'test_secret'}):
+            result = handle_line_event('{"events": []}', "forged_test_signature_value", lambda x: x)
+        
+        assert result == {'error': 'Invalid signature'}
+    
+    def test_empty_test_signature_disables_test_mode(self):
+        with patch.dict('os.environ', {'LINE_CHANNEL_SECRET': 'test_secret', 'LINE_TEST_SIGNATURE': ''}):
+            result = handle_line_event('{"events": []}', "test_signature", lambda x: x)
+        
+        assert result == {'error': 'Invalid signature'}
+    
+    def test_test_mode_is_disabled_when_unset(self):
+        with patch.dict('os.environ', {'LINE_CHANNEL_SECRET': 'test_secret'}):
+            del os.environ['LINE_TEST_SIGNATURE']
+            result = handle_line_event('{"events": []}', "test_signature", lambda x: x)
+        
+        assert result == {'error': 'Invalid signature'}
+    
+    @patch('app.line_handler.json.loads')
+    def test_invalid_signature_is_rejected_before_parsing(self, mock_loads):
+        with patch.dict('os.environ', {'LINE_CHANNEL_SECRET': 'test_secret'}):
+            result = handle_line_event(b'{"events": []}', "invalid_signature", lambda x: x)
+        
+        assert result == {'error': 'Invalid signature'}
+        mock_loads.assert_not_called()
+    
     @responses.activate
     def test_reply_message_success(self):
         responses.add(
@@ -41,6 +82,33 @@ class TestLineHandler:
         with patch.dict('os.environ', {'LINE_CHANNEL_ACCESS_TOKEN': 'test_token'}):
             reply_message("test_token", "test_message")
     
+    @responses.activate
+    def test_push_message_success(self):
+        responses.add(
+            responses.POST,
+            "https://api.line.me/v2/bot/message/push",
+            json={},
+            status=200
+        )
+        
+        with patch.dict('os.environ', {'LINE_CHANNEL_ACCESS_TOKEN': 'test_token'}):
+            result = push_message("U1234", "test_message")
+        
+        assert result['success'] is True
+        assert json.loads(responses.calls[0].request.body)['to'] == "U1234"
+    
+    def test_push_message_test_target_is_not_sent(self):
+        with patch.dict('os.environ', {'LINE_CHANNEL_ACCESS_TOKEN': 'test_token'}):
+            result = push_message("test_user", "test_message")
+        
+        assert result['test_mode'] is True
+        assert result['line_payload']['to'] == "test_user"
+    
+    def test_get_push_target_prefers_group(self):
+        assert get_push_target({'source': {'type': 'group', 'groupId': 'C1', 'userId': 'U1'}}) == 'C1'
+        assert get_push_target({'source': {'type': 'user', 'userId': 'U1'}}) == 'U1'
+        assert get_push_target({}) is None
+    
     def test_reply_message_no_token(self):
         with patch.dict('os.environ', {}, clear=True):
             with patch('builtins.print') as mock_print:
@@ -109,4 +177,39 @@ class TestLineHandler:
         with patch.dict('os.environ', {'LINE_CHANNEL_SECRET': 'test_secret'}):
             handle_line_event(event_body, "test_signature", response_function)
         
-        response_function.assert_not_called()
\ No newline at end of file
+        response_function.assert_not_called()
+    
+    def test_handle_line_event_concurrent_preserves_order(self):
+        import time
+
+        texts = ["slow", "medium", "fast"]
+        delays = {"slow": 0.2, "medium": 0.1, "fast": 0.0}
+        event_body = json.dumps({
+            "events": [
+                {
+                    "type": "message",
+                    "message": {"type": "text", "text": text},
+                    "replyToken": f"reply_token_{i}"
+                }
+                for i, text in enumerate(texts)
+            ]
+        })
+
+        def response_function(text):
+            time.sleep(delays[text])
+            return f"response_{text}"
+
+        with patch.dict('os.environ', {
+            'LINE_CHANNEL_SECRET': 'test_secret',
+            'LINE_CHANNEL_ACCESS_TOKEN': 'test_token',
+            'LINE_EVENT_MAX_WORKERS': '3'
+        }):
+            started = time.monotonic()
+            result = handle_line_event(event_body, "test_signature", response_function)
+            elapsed = time.monotonic() - started
+
+        assert [r['user_message'] for r in result['line_responses']] == texts
+        assert [r['bot_response'] for r in result['line_responses']] == [f"response_{t}" for t in texts]
+        # テスト署名はワーカースレッドにも引き継がれ、LINE APIは呼び出されない
+        assert all(r['line_result']['test_mode'] for r in result['line_responses'])
+        assert elapsed < 0.3
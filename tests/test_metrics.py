@@ -0,0 +1,98 @@
+from unittest.mock import patch
+
+import pytest
+import responses
+
+from app import metrics
+from app.hazard_api_client import HazardAPIClient
+from lambda_function import get_formatted_hazard_data
+
+
+@pytest.fixture
+def sink():
+    list_sink = metrics.ListSink()
+    previous = metrics.get_sink()
+    metrics.set_sink(list_sink)
+    yield list_sink
+    metrics.set_sink(previous)
+
+
+class TestMetrics:
+
+    def test_span_emits_embedded_metric_format(self, sink):
+        with metrics.span('geocode', Upstream='geocoding') as s:
+            s.set(CacheStatus='miss')
+
+        record = sink.records[0]
+        definition = record['_aws']['CloudWatchMetrics'][0]
+        assert definition['Namespace'] == metrics.DEFAULT_NAMESPACE
+        assert definition['Metrics'] == [{'Name': 'StageLatency', 'Unit': 'Milliseconds'}]
+        assert definition['Dimensions'] == [['Stage'], ['Stage', 'CacheStatus']]
+        assert record['Stage'] == 'geocode'
+        assert record['CacheStatus'] == 'miss'
+        # ディメンションの組に含まれないキーはプロパティとして残す
+        assert record['Upstream'] == 'geocoding'
+        assert record['StageLatency'] >= 0
+
+    def test_dimension_sets_are_limited(self, sink):
+        with metrics.span('hazard_fetch', Strategy='server', Group='flood') as s:
+            s.set(CacheStatus='miss', Upstream='hazard', HttpStatus=200)
+
+        definition = sink.records[0]['_aws']['CloudWatchMetrics'][0]
+        assert definition['Dimensions'] == [['Stage'], ['Stage', 'CacheStatus'], ['Stage', 'Upstream', 'HttpStatus']]
+        assert (sink.records[0]['Strategy'], sink.records[0]['Group']) == ('server', 'flood')
+
+    def test_span_marks_errors(self, sink):
+        with pytest.raises(RuntimeError):
+            with metrics.span('hazard_fetch'):
+                raise RuntimeError('boom')
+
+        assert sink.records[0]['Outcome'] == 'error'
+
+    def test_annotate_outside_span_is_noop(self, sink):
+        metrics.annotate(CacheStatus='hit')
+        metrics.record_upstream_call('hazard', 200)
+
+        assert sink.records == []
+
+    def test_record_upstream_call_keeps_last_status(self, sink):
+        with metrics.span('hazard_fetch'):
+            metrics.record_upstream_call('hazard', 503)
+            metrics.record_upstream_call('hazard', 200)
+
+        record = sink.records[0]
+        assert (record['Upstream'], record['HttpStatus']) == ('hazard', '200')
+        assert 'RetryCount' not in record
+
+    def test_disabled_sink(self):
+        previous = metrics.get_sink()
+        metrics.set_sink(None)
+        try:
+            with metrics.span('parse'):
+                pass
+        finally:
+            metrics.set_sink(previous)
+
+    @responses.activate
+    def test_get_formatted_hazard_data_emits_stage_spans(self, sink):
+        api_url = "https://hazard.example.com/prod/hazardinfo"
+        responses.add(responses.GET, api_url, json={'status': 'success', 'hazard_info': {}}, status=200)
+
+        with patch.dict('os.environ', {'HAZARD_MAP_API_URL': api_url}):
+            error, _, _ = get_formatted_hazard_data('35.6586, 139.7454')
+
+        assert error is None
+        stages = [record['Stage'] for record in sink.stage_latencies()]
+        assert stages == ['parse', 'hazard_fetch', 'format']
+        fetch = sink.stage_latencies('hazard_fetch')[0]
+        assert fetch['HttpStatus'] == '200'
+        assert fetch['CacheStatus'] == 'miss'
+
+    def test_hazard_cache_hit_is_annotated(self, sink):
+        client = HazardAPIClient(api_url="https://hazard.example.com/")
+        with patch.object(client, '_make_request', return_value={'status': 'success', 'hazard_info': {}}):
+            client.get_hazard_info(35.0, 139.0)
+            with metrics.span('hazard_fetch'):
+                client.get_hazard_info(35.0, 139.0)
+
+        assert sink.stage_latencies('hazard_fetch')[0]['CacheStatus'] == 'hit'
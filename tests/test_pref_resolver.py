@@ -0,0 +1,102 @@
+import gzip
+import json
+import zipfile
+from unittest.mock import patch
+
+import pytest
+
+pytest.importorskip('shapely')
+
+from app import geocoding, pref_resolver  # noqa: E402
+from app.pref_resolver import PrefectureResolver  # noqa: E402
+from tools.build_pref_boundaries import build_dataset, read_geojson  # noqa: E402
+
+
+def _square(lon0, lat0, lon1, lat1):
+    return {
+        'type': 'Polygon',
+        'coordinates': [[[lon0, lat0], [lon1, lat0], [lon1, lat1], [lon0, lat1], [lon0, lat0]]]
+    }
+
+
+# 経度139.5を境に東京都(13)と神奈川県(14)が接する簡易的な境界
+N03_SAMPLE = {
+    'type': 'FeatureCollection',
+    'features': [
+        {'type': 'Feature', 'properties': {'N03_001': '東京都', 'N03_007': '13101'},
+         'geometry': _square(139.5, 35.5, 140.0, 36.0)},
+        {'type': 'Feature', 'properties': {'N03_001': '東京都', 'N03_007': '13102'},
+         'geometry': _square(139.5, 36.0, 140.0, 36.2)},
+        {'type': 'Feature', 'properties': {'N03_001': '神奈川県', 'N03_007': None},
+         'geometry': _square(139.0, 35.5, 139.5, 36.0)},
+    ]
+}
+
+
+@pytest.fixture
+def dataset_path(tmp_path):
+    dataset = build_dataset(N03_SAMPLE, tolerance=0.0001, margin=0.01, precision=4, version='test')
+    path = tmp_path / 'prefectures.json.gz'
+    with gzip.open(path, 'wt', encoding='utf-8') as f:
+        json.dump(dataset, f)
+    return str(path)
+
+
+class TestPrefectureResolver:
+
+    def test_build_dataset_merges_municipalities(self):
+        dataset = build_dataset(N03_SAMPLE, tolerance=0.0001, margin=0.01, precision=4, version='test')
+
+        assert sorted(feature['code'] for feature in dataset['features']) == ['13', '14']
+        assert dataset['margin_degrees'] == 0.01
+
+    def test_read_geojson_from_distributed_zip(self, tmp_path):
+        archive = tmp_path / 'N03-20240101_GML.zip'
+        with zipfile.ZipFile(archive, 'w') as f:
+            f.writestr('N03-20240101.geojson', json.dumps(N03_SAMPLE, ensure_ascii=False))
+
+        assert read_geojson(str(archive)) == N03_SAMPLE
+
+    def test_resolve_inside_prefecture(self, dataset_path):
+        resolver = PrefectureResolver(dataset_path)
+
+        assert resolver.resolve(35.7, 139.8) == '13'
+        assert resolver.resolve(36.1, 139.8) == '13'
+        assert resolver.resolve(35.7, 139.2) == '14'
+        assert resolver.version == 'test'
+
+    def test_resolve_near_border_returns_none(self, dataset_path):
+        resolver = PrefectureResolver(dataset_path)
+
+        assert resolver.resolve(35.7, 139.505) is None
+
+    def test_resolve_at_sea_returns_none(self, dataset_path):
+        resolver = PrefectureResolver(dataset_path)
+
+        assert resolver.resolve(35.0, 141.0) is None
+
+    def test_missing_dataset_is_unavailable(self, tmp_path):
+        resolver = PrefectureResolver(str(tmp_path / 'missing.json.gz'))
+
+        assert resolver.load() is False
+        assert resolver.resolve(35.7, 139.8) is None
+
+
+class TestGetPrefCodeWithResolver:
+
+    def teardown_method(self):
+        pref_resolver.set_resolver(None)
+
+    def test_local_resolution_skips_reverse_geocoding(self, dataset_path):
+        pref_resolver.set_resolver(PrefectureResolver(dataset_path))
+
+        with patch('app.geocoding.reverse_geocode') as mock_reverse:
+            assert geocoding.get_pref_code(35.7, 139.8) == '13'
+        mock_reverse.assert_not_called()
+
+    def test_border_falls_back_to_reverse_geocoding(self, dataset_path):
+        pref_resolver.set_resolver(PrefectureResolver(dataset_path))
+
+        with patch('app.geocoding.reverse_geocode', return_value='神奈川県川崎市') as mock_reverse:
+            assert geocoding.get_pref_code(35.7, 139.501) == '14'
+        mock_reverse.assert_called_once()
@@ -0,0 +1,139 @@
+import json
+import time
+from unittest.mock import patch
+
+import pytest
+import responses
+
+from app import geocoding, hazard_api_client, prewarm
+from benchmarks import payloads
+from tools.mine_hotspots import build_manifest, iter_messages, main, mine_hotspots
+
+
+API_URL = "https://hazard.example.com/prod/hazardinfo"
+DAY_MS = 24 * 60 * 60 * 1000
+
+
+def write_manifest(tmp_path, entries):
+    path = tmp_path / 'prewarm.json'
+    path.write_text(json.dumps({'version': prewarm.MANIFEST_VERSION, 'entries': entries}, ensure_ascii=False),
+                    encoding='utf-8')
+    return str(path)
+
+
+class TestMineHotspots:
+
+    def test_ranks_by_frequency_and_recency(self):
+        now = 100 * DAY_MS
+        messages = [
+            ('東京都新宿区西新宿2-8-1', now - 30 * DAY_MS),
+            ('東京都新宿区西新宿２丁目８番１号', now - 30 * DAY_MS),
+            ('東京都新宿区西新宿2-8-1 洪水', now - 30 * DAY_MS),
+            ('大阪府大阪市北区梅田1-1-1', now),
+            ('大阪府大阪市北区梅田1-1-1', now),
+            ('35.68961, 139.69171', now),
+            ('35.68962, 139.69172', now - DAY_MS),
+            ('こんにちは', now),
+        ]
+
+        spots = mine_hotspots(messages, half_life_days=7, now_ms=now)
+
+        assert [spot['address'] for spot in spots][:2] == ['大阪府大阪市北区梅田1-1-1', None]
+        assert spots[1]['count'] == 2
+        shinjuku = next(spot for spot in spots if spot['address'] and '新宿' in spot['address'])
+        assert shinjuku['count'] == 3
+        assert shinjuku['score'] < 1
+
+    def test_iter_messages_skips_non_text_events(self):
+        webhook = json.loads(payloads.build_webhook_body(['東京都千代田区']))
+        webhook['events'].append({'type': 'follow', 'timestamp': 1})
+
+        assert list(iter_messages([webhook])) == [('東京都千代田区', 1640995200000)]
+
+    def test_build_manifest_resolves_addresses(self):
+        spots = [
+            {'address': '東京都千代田区', 'lat': None, 'lon': None, 'score': 2.0, 'count': 2},
+            {'address': '存在しない住所', 'lat': None, 'lon': None, 'score': 1.5, 'count': 2},
+            {'address': None, 'lat': 35.0, 'lon': 139.0, 'score': 1.0, 'count': 1},
+        ]
+        with patch.object(geocoding, 'geocode', side_effect=[(35.694, 139.7536), None]):
+            manifest = build_manifest(spots, top=3)
+
+        assert manifest['entries'] == [
+            ['東京都千代田区', 35.694, 139.7536, 2.0],
+            ['存在しない住所', None, None, 1.5],
+            [None, 35.0, 139.0, 1.0]
+        ]
+        assert manifest['unresolved_addresses'] == 1
+
+    def test_main_writes_manifest(self, tmp_path):
+        log = tmp_path / 'webhooks.jsonl'
+        log.write_text('\n'.join(
+            json.dumps({'body': payloads.build_webhook_body([text])}, ensure_ascii=False)
+            for text in ['35.6896, 139.6917', '35.6896, 139.6917', '東京都千代田区']
+        ), encoding='utf-8')
+        output = tmp_path / 'prewarm.json'
+
+        assert main([str(log), '--no-resolve', '--top', '1', '--output', str(output)]) == 0
+        manifest = prewarm.load_manifest(str(output))
+        assert [entry[:3] for entry in manifest['entries']] == [[None, 35.6896, 139.6917]]
+
+
+class TestPrewarm:
+
+    @responses.activate
+    def test_primes_geocode_and_hazard_caches(self, tmp_path):
+        responses.add(responses.GET, API_URL, json=payloads.FULL_API_RESPONSE, status=200)
+        path = write_manifest(tmp_path, [['東京都新宿区西新宿2-8-1', 35.6896, 139.6917, 3.0], [None, 35.0, 135.0, 1.0]])
+
+        with patch.dict('os.environ', {'HAZARD_MAP_API_URL': API_URL, 'GOOGLE_API_KEY': 'test_key'}):
+            stats = prewarm.prewarm_from_file(path, budget_seconds=5)
+            calls_after_prewarm = len(responses.calls)
+
+            coordinates, source = geocoding.geocode_with_source('東京都新宿区西新宿２丁目８番１号')
+            hazard_api_client.HazardAPIClient().get_hazard_info(*coordinates)
+
+        assert stats['entries'] == 2
+        assert stats['geocode_primed'] == 1
+        assert stats['warmed'] == 2
+        assert (coordinates, source) == ((35.6896, 139.6917), 'cache')
+        assert calls_after_prewarm == len(responses.calls) == 2
+
+    def test_stops_at_time_budget(self, tmp_path):
+        path = write_manifest(tmp_path, [[None, 35.0 + i / 100, 135.0, 1.0] for i in range(20)])
+
+        def slow_lookup(*args, **kwargs):
+            time.sleep(0.1)
+            return payloads.FULL_API_RESPONSE
+
+        with patch.dict('os.environ', {'HAZARD_MAP_API_URL': API_URL}), \
+             patch.object(hazard_api_client.HazardAPIClient, 'get_hazard_info', side_effect=slow_lookup):
+            started = time.monotonic()
+            stats = prewarm.prewarm(prewarm.load_manifest(path), budget_seconds=0.15, max_workers=2)
+            elapsed = time.monotonic() - started
+
+        assert elapsed < 0.5
+        assert 0 < stats['warmed'] < 20
+        assert stats['warmed'] + stats['failed'] + stats['skipped'] == 20
+
+    @pytest.mark.parametrize('content', ['not json', '{"version": 99, "entries": []}'])
+    def test_invalid_manifest_is_ignored(self, tmp_path, content):
+        path = tmp_path / 'prewarm.json'
+        path.write_text(content, encoding='utf-8')
+
+        assert prewarm.prewarm_from_file(str(path)) is None
+
+    def test_init_hook(self, tmp_path):
+        import lambda_function
+
+        path = write_manifest(tmp_path, [['東京都千代田区', 35.694, 139.7536, 1.0]])
+
+        # ハザード情報APIが未設定でも、住所の座標はキャッシュに登録する
+        with patch.dict('os.environ', {'PREWARM_MANIFEST_PATH': path, 'HAZARD_MAP_API_URL': ''}):
+            stats = lambda_function._prewarm_on_init()
+        with patch.dict('os.environ', {'PREWARM_MANIFEST_PATH': str(tmp_path / 'missing.json')}):
+            missing = lambda_function._prewarm_on_init()
+
+        assert stats['geocode_primed'] == 1
+        assert stats['skipped'] == 1
+        assert missing is None
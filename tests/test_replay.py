@@ -0,0 +1,126 @@
+import json
+import random
+
+import pytest
+
+from app import line_handler, metrics
+from benchmarks import payloads, replay
+from benchmarks.stub_servers import LatencyModel, StubServer, UpstreamBehavior
+
+
+class TestStubServers:
+
+    def test_latency_specs(self):
+        rng = random.Random(0)
+
+        assert LatencyModel('fixed:50').sample(rng) == 0.05
+        assert 0.02 <= LatencyModel('uniform:20:80').sample(rng) <= 0.08
+        assert LatencyModel('normal:-100:1').sample(rng) == 0.0
+        assert LatencyModel('lognormal:100:0.5').sample(rng) > 0
+
+    @pytest.mark.parametrize('spec', ['gamma:1', 'fixed', 'uniform:1', 'fixed:fast'])
+    def test_invalid_latency_spec(self, spec):
+        with pytest.raises(ValueError):
+            LatencyModel(spec)
+
+    def test_counts_calls_and_injected_errors(self):
+        import requests
+
+        behaviors = {'hazard': UpstreamBehavior(error_rate=1.0), 'geocoding': UpstreamBehavior()}
+        with StubServer(behaviors) as stub:
+            hazard = requests.get(stub.url('hazard'), params={'lat': 35.0, 'lon': 139.0})
+            geocode = requests.get(stub.url('geocoding'), params={'address': '東京都新宿区'}).json()
+            reply = requests.post(stub.url('line_reply'), data=b'{}')
+
+            assert hazard.status_code == 503
+            assert geocode['status'] == 'OK'
+            assert reply.status_code == 200
+            assert stub.call_counts() == {
+                'line': {'calls': 1, 'errors': 0},
+                'geocoding': {'calls': 1, 'errors': 0},
+                'hazard': {'calls': 1, 'errors': 1}
+            }
+
+
+class TestReplay:
+
+    def test_percentile_and_histogram(self):
+        values = list(range(1, 101))
+
+        assert replay.percentile(values, 50) == 50
+        assert replay.percentile(values, 99) == 99
+        assert replay.percentile([], 95) == 0.0
+        assert replay.histogram([3, 7, 20000], bounds=[5, 10]) == [(5, 1), (10, 1), (None, 1)]
+
+    def test_load_corpus(self, tmp_path):
+        corpus = tmp_path / 'corpus.jsonl'
+        lambda_event = {'headers': {}, 'body': payloads.build_webhook_body(['東京都千代田区'])}
+        corpus.write_text('\n'.join([
+            json.dumps(lambda_event, ensure_ascii=False),
+            json.dumps({'events': []}),
+            json.dumps({'text': '35.6896, 139.6917'}, ensure_ascii=False),
+            json.dumps({'request_id': 'x', 'body': 'not a webhook'}),
+            'not json'
+        ]), encoding='utf-8')
+
+        webhooks, skipped = replay.load_corpus([str(corpus), 'lambda-test-events/address-input-test.json'])
+
+        assert len(webhooks) == 4
+        assert skipped == 2
+        assert webhooks[2]['events'][0]['message']['text'] == '35.6896, 139.6917'
+
+    def test_build_event_resigns_and_replaces_test_reply_tokens(self):
+        webhooks, _ = replay.load_corpus(['lambda-test-events/address-input-test.json'])
+
+        event = replay.build_event(webhooks[0], 7)
+
+        body = json.loads(event['body'])
+        assert body['events'][0]['replyToken'] == 'replay0000000700'
+        assert line_handler.validate_signature(event['body'], event['headers']['x-line-signature'], payloads.CHANNEL_SECRET)
+
+    def test_replay_reports_latency_stages_and_upstream_calls(self):
+        webhooks = [json.loads(payloads.build_webhook_body([text])) for text in ('東京都新宿区西新宿2-8-1', '35.6896, 139.6917')]
+        behaviors = {name: UpstreamBehavior('fixed:0') for name in ('line', 'geocoding')}
+        behaviors['hazard'] = UpstreamBehavior('fixed:0', error_rate=1.0)
+        original_url = line_handler.LINE_REPLY_API_URL
+        original_sink = metrics.get_sink()
+
+        report = replay.replay(webhooks, requests=6, concurrency=2, behaviors=behaviors, disable_cache=True, seed=1)
+
+        assert report['requests'] == 6
+        assert report['status_codes'] == {'200': 6}
+        assert report['latency_ms']['count'] == 6
+        assert sum(bucket['count'] for bucket in report['histogram']) == 6
+        assert {'webhook_parse', 'geocode', 'hazard_fetch', 'reply'} <= set(report['stages_ms'])
+        assert report['upstream_calls']['line'] == {'calls': 6, 'errors': 0}
+        assert report['upstream_calls']['geocoding']['calls'] == 3
+        assert report['upstream_calls']['hazard']['errors'] == report['upstream_calls']['hazard']['calls'] > 0
+        assert 'upstream calls:' in replay.format_report(report)
+        # スタブ向けの設定は終了後に元に戻る
+        assert line_handler.LINE_REPLY_API_URL == original_url
+        assert metrics.get_sink() is original_sink
+
+    def test_replay_with_server_side_geocoding(self):
+        webhooks = [json.loads(payloads.build_webhook_body([text])) for text in ('東京都新宿区西新宿2-8-1', '大阪府大阪市北区梅田1-1-1')]
+        behaviors = {name: UpstreamBehavior('fixed:0') for name in ('line', 'geocoding', 'hazard')}
+
+        report = replay.replay(webhooks, requests=2, concurrency=1, behaviors=behaviors, seed=1, address_strategy='server')
+
+        assert report['status_codes'] == {'200': 2}
+        assert report['address_strategy'] == 'server'
+        assert report['upstream_calls']['geocoding']['calls'] == 0
+        assert report['upstream_calls']['hazard']['calls'] == 2
+        assert 'geocode_server' in report['stages_ms']
+
+    def test_main_writes_json_report(self, tmp_path, capsys):
+        output = tmp_path / 'report.json'
+
+        exit_code = replay.main([
+            'lambda-test-events/address-input-test.json', '--requests', '2', '--concurrency', '1',
+            '--latency', 'hazard=fixed:0', '--latency', 'geocoding=fixed:0', '--latency', 'line=fixed:0',
+            '--json', str(output)
+        ])
+
+        assert exit_code == 0
+        assert json.loads(output.read_text(encoding='utf-8'))['requests'] == 2
+        assert 'throughput' in capsys.readouterr().out
@@ -0,0 +1,228 @@
+from unittest.mock import MagicMock, patch
+
+import pytest
+import responses
+
+from app import deadline, geocoding, hazard_api_client, shared_cache
+from app.shared_cache import (
+    DynamoDBSharedCache, SharedCache, SQLiteSharedCache, create_shared_cache, decode_value, encode_value, make_key
+)
+from benchmarks import payloads
+
+
+API_URL = "https://hazard.example.com/prod/hazardinfo"
+
+
+class FakeClock:
+
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def sqlite_cache(tmp_path):
+    cache = SharedCache(SQLiteSharedCache(str(tmp_path / 'shared.db')))
+    shared_cache.set_shared_cache(cache)
+    yield cache
+    cache.backend.close()
+
+
+class TestEncoding:
+
+    def test_round_trip(self):
+        value = {'status': 'success', 'hazard_info': {'flood': [1.5, None]}}
+
+        assert decode_value(encode_value(value)) == value
+        assert decode_value(encode_value(None)) is None
+
+    def test_large_values_are_compressed(self):
+        value = payloads.FULL_API_RESPONSE
+        encoded = encode_value(value)
+
+        assert encoded[:1] == b'\x01'
+        assert decode_value(encoded) == value
+
+    def test_unknown_format(self):
+        with pytest.raises(ValueError):
+            decode_value(b'\x09{}')
+
+    def test_make_key(self):
+        assert make_key('hazard', (35.6895, 139.6917, 'wgs84')) == 'v1:hazard:[35.6895,139.6917,"wgs84"]'
+        assert make_key('geocode', '東京都千代田区') == 'v1:geocode:東京都千代田区'
+
+
+class TestSQLiteSharedCache:
+
+    def test_expired_entries_are_not_returned(self, tmp_path):
+        clock = FakeClock()
+        backend = SQLiteSharedCache(str(tmp_path / 'shared.db'), clock=clock)
+        backend.set_many([('a', b'\x001', 10), ('b', b'\x002', 100)])
+
+        clock.now += 50
+
+        assert backend.get_many(['a', 'b', 'c']) == {'b': b'\x002'}
+        backend.close()
+
+    def test_shared_between_connections(self, tmp_path):
+        path = str(tmp_path / 'shared.db')
+        writer = SharedCache(SQLiteSharedCache(path))
+        reader = SharedCache(SQLiteSharedCache(path))
+
+        writer.put('hazard', (1, 2), {'status': 'success'}, ttl=60)
+        assert writer.flush(timeout=2) == 0
+
+        assert reader.get('hazard', (1, 2)) == {'status': 'success'}
+        assert reader.stats.snapshot()['hits'] == 1
+
+
+class TestDynamoDBSharedCache:
+
+    def test_batch_get_retries_unprocessed_keys_and_checks_expiry(self):
+        client = MagicMock()
+        client.batch_get_item.side_effect = [
+            {
+                'Responses': {'cache': [
+                    {'cache_key': {'S': 'a'}, 'value': {'B': b'\x001'}, 'expires_at': {'N': '2000'}},
+                    {'cache_key': {'S': 'b'}, 'value': {'B': b'\x002'}, 'expires_at': {'N': '500'}}
+                ]},
+                'UnprocessedKeys': {'cache': {'Keys': [{'cache_key': {'S': 'c'}}]}}
+            },
+            {'Responses': {'cache': [
+                {'cache_key': {'S': 'c'}, 'value': {'B': b'\x003'}, 'expires_at': {'N': '2000'}}
+            ]}}
+        ]
+        backend = DynamoDBSharedCache('cache', client=client, clock=FakeClock(1000.0))
+
+        assert backend.get_many(['a', 'b', 'c']) == {'a': b'\x001', 'c': b'\x003'}
+        assert client.batch_get_item.call_count == 2
+        keys = client.batch_get_item.call_args_list[0].kwargs['RequestItems']['cache']['Keys']
+        assert keys == [{'cache_key': {'S': key}} for key in ['a', 'b', 'c']]
+
+    def test_batch_write_chunks_requests(self):
+        client = MagicMock()
+        client.batch_write_item.return_value = {}
+        backend = DynamoDBSharedCache('cache', client=client, clock=FakeClock(1000.0))
+
+        backend.set_many([(f'k{i}', b'\x00{}', 60) for i in range(30)])
+
+        requests = [call.kwargs['RequestItems']['cache'] for call in client.batch_write_item.call_args_list]
+        assert [len(r) for r in requests] == [25, 5]
+        assert requests[0][0]['PutRequest']['Item']['expires_at'] == {'N': '1060'}
+
+    def test_backend_errors_are_treated_as_misses(self):
+        client = MagicMock()
+        client.batch_get_item.side_effect = RuntimeError('throttled')
+        client.batch_write_item.side_effect = RuntimeError('throttled')
+        cache = SharedCache(DynamoDBSharedCache('cache', client=client))
+
+        assert cache.get_many('hazard', ['a']) == {}
+        cache.put('hazard', 'a', {}, ttl=60)
+        assert cache.flush(timeout=2) == 0
+
+        stats = cache.stats.snapshot()
+        assert stats['read_errors'] == 1
+        assert stats['write_errors'] == 1
+
+
+class TestSharedCache:
+
+    def test_skips_reads_when_deadline_exhausted(self, sqlite_cache):
+        sqlite_cache.put('hazard', 'a', 1, ttl=60)
+        sqlite_cache.flush(timeout=2)
+
+        with deadline.time_budget(0):
+            assert sqlite_cache.get_many('hazard', ['a']) == {}
+        assert sqlite_cache.get_many('hazard', ['a']) == {'a': 1}
+
+    def test_module_flush_waits_for_writes(self, sqlite_cache):
+        for i in range(40):
+            sqlite_cache.put('hazard', i, {'i': i}, ttl=60)
+
+        assert shared_cache.flush() == 0
+        assert shared_cache.get_shared_cache_stats()['writes'] == 40
+
+    def test_create_shared_cache(self, tmp_path):
+        with patch.dict('os.environ', {'SHARED_CACHE_BACKEND': 'none'}):
+            assert create_shared_cache() is None
+        with patch.dict('os.environ', {'SHARED_CACHE_SQLITE_PATH': str(tmp_path / 'shared.db')}):
+            cache = create_shared_cache('sqlite')
+            assert isinstance(cache.backend, SQLiteSharedCache)
+            cache.backend.close()
+        with patch.dict('os.environ', {'SHARED_CACHE_TABLE': ''}):
+            with pytest.raises(ValueError):
+                create_shared_cache('dynamodb')
+        with pytest.raises(ValueError):
+            create_shared_cache('redis')
+
+    def test_invalid_configuration_disables_cache(self):
+        shared_cache.reset_shared_cache()
+        with patch.dict('os.environ', {'SHARED_CACHE_BACKEND': 'dynamodb', 'SHARED_CACHE_TABLE': ''}):
+            assert shared_cache.get_shared_cache() is None
+
+
+class TestReadThrough:
+
+    @responses.activate
+    def test_hazard_info_shared_between_containers(self, sqlite_cache):
+        responses.add(responses.GET, API_URL, json=payloads.FULL_API_RESPONSE, status=200)
+
+        with patch.dict('os.environ', {'HAZARD_MAP_API_URL': API_URL}):
+            first = hazard_api_client.HazardAPIClient(use_snapshot=False).get_hazard_info(35.6895, 139.6917)
+            shared_cache.flush()
+            # 別のコンテナ（インメモリキャッシュが空）からの問い合わせ
+            hazard_api_client.get_hazard_cache().clear()
+            second = hazard_api_client.HazardAPIClient(use_snapshot=False).get_hazard_info(35.6895, 139.6917)
+
+        assert len(responses.calls) == 1
+        assert second == first
+        assert sqlite_cache.stats.snapshot()['hits'] == 1
+
+    @responses.activate
+    def test_batch_prefetches_from_shared_cache(self, sqlite_cache):
+        responses.add(responses.GET, API_URL, json=payloads.FULL_API_RESPONSE, status=200)
+        points = [(35.0 + i / 100, 135.0) for i in range(3)]
+
+        with patch.dict('os.environ', {'HAZARD_MAP_API_URL': API_URL}):
+            client = hazard_api_client.HazardAPIClient(use_snapshot=False)
+            client.get_hazard_info_batch(points[:2])
+            shared_cache.flush()
+            hazard_api_client.get_hazard_cache().clear()
+            with patch.object(sqlite_cache.backend, 'get_many', wraps=sqlite_cache.backend.get_many) as get_many:
+                client.get_hazard_info_batch(points)
+
+        assert len(responses.calls) == 3
+        # 一括取得では共有キャッシュを1回の読み込みでまとめて参照する
+        assert len(get_many.call_args_list[0].args[0]) == 3
+
+    @responses.activate
+    def test_geocode_shared_hit_skips_google(self, sqlite_cache):
+        responses.add(
+            responses.GET, geocoding.GEOCODING_API_URL,
+            json={'status': 'OK', 'results': [{'geometry': {'location': {'lat': 35.6896, 'lng': 139.6917}}}]},
+            status=200
+        )
+
+        with patch.dict('os.environ', {'GOOGLE_API_KEY': 'test_key'}):
+            first = geocoding.geocode_with_source('東京都新宿区西新宿2-8-1')
+            shared_cache.flush()
+            geocoding.get_geocode_cache().clear()
+            second = geocoding.geocode_with_source('東京都新宿区西新宿２丁目８番１号')
+
+        assert first == ((35.6896, 139.6917), 'google')
+        assert second == ((35.6896, 139.6917), 'shared')
+        assert len(responses.calls) == 1
+
+    @responses.activate
+    def test_geocode_negative_result_is_shared(self, sqlite_cache):
+        responses.add(responses.GET, geocoding.GEOCODING_API_URL, json={'status': 'ZERO_RESULTS', 'results': []})
+
+        with patch.dict('os.environ', {'GOOGLE_API_KEY': 'test_key'}):
+            assert geocoding.geocode('存在しない住所1-2-3') is None
+            shared_cache.flush()
+            geocoding.get_geocode_cache().clear()
+            assert geocoding.geocode('存在しない住所1-2-3') is None
+
+        assert len(responses.calls) == 1
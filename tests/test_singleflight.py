@@ -0,0 +1,156 @@
+import threading
+import time
+
+import pytest
+import responses
+
+from app import deadline
+from app.geocoding import geocode, get_geocode_coalescing_stats
+from app.hazard_api_client import HazardAPIClient, get_hazard_coalescing_stats
+from app.singleflight import SingleFlight
+
+
+API_URL = "https://hazard.example.com/prod/hazardinfo"
+GEOCODING_API_URL = "https://maps.googleapis.com/maps/api/geocode/json"
+
+
+def run_concurrently(func, count):
+    """
+    funcをcount個のスレッドから同時に呼び出し、結果を返す。
+    """
+    barrier = threading.Barrier(count)
+    results = [None] * count
+
+    def worker(index):
+        barrier.wait()
+        results[index] = func()
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+class TestSingleFlight:
+
+    def test_concurrent_callers_share_one_execution(self):
+        flight = SingleFlight()
+        calls = []
+
+        def slow():
+            calls.append(1)
+            time.sleep(0.1)
+            return 'value'
+
+        results = run_concurrently(lambda: flight.do('key', slow), 5)
+
+        assert len(calls) == 1
+        assert [value for value, _ in results] == ['value'] * 5
+        assert sum(shared for _, shared in results) == 4
+        assert flight.stats() == {'in_flight': 0, 'executions': 1, 'coalesced': 4, 'errors': 0}
+
+    def test_sequential_calls_are_not_coalesced(self):
+        flight = SingleFlight()
+
+        flight.do('key', lambda: 1)
+        value, shared = flight.do('key', lambda: 2)
+
+        assert (value, shared) == (2, False)
+        assert flight.stats()['executions'] == 2
+
+    def test_error_is_shared_with_waiters(self):
+        flight = SingleFlight()
+        started = threading.Event()
+
+        def failing():
+            started.set()
+            time.sleep(0.1)
+            raise RuntimeError('boom')
+
+        errors = []
+
+        def call():
+            try:
+                flight.do('key', failing)
+            except RuntimeError as e:
+                errors.append(str(e))
+
+        leader = threading.Thread(target=call)
+        leader.start()
+        started.wait()
+        call()
+        leader.join()
+
+        assert errors == ['boom', 'boom']
+        assert flight.stats()['errors'] == 1
+
+    def test_waiter_respects_request_deadline(self):
+        flight = SingleFlight()
+        started = threading.Event()
+        release = threading.Event()
+
+        def blocking():
+            started.set()
+            release.wait()
+            return 'late'
+
+        leader = threading.Thread(target=flight.do, args=('key', blocking))
+        leader.start()
+        started.wait()
+
+        class Context:
+            def get_remaining_time_in_millis(self):
+                return (deadline.DEADLINE_REPLY_RESERVE_SECONDS + 0.05) * 1000
+
+        try:
+            with deadline.request_deadline(Context()):
+                with pytest.raises(deadline.DeadlineExceeded):
+                    flight.do('key', blocking)
+        finally:
+            release.set()
+            leader.join()
+
+
+class TestCoalescedUpstreamCalls:
+
+    @responses.activate
+    def test_hazard_lookups_are_coalesced(self):
+        def slow_response(request):
+            time.sleep(0.1)
+            return 200, {}, '{"status": "success", "hazard_info": {}}'
+
+        responses.add_callback(responses.GET, API_URL, callback=slow_response)
+        client = HazardAPIClient(api_url=API_URL)
+
+        results = run_concurrently(lambda: client.get_hazard_info(35.6586, 139.7454), 4)
+
+        assert all(result['status'] == 'success' for result in results)
+        assert len(responses.calls) == 1
+        stats = get_hazard_coalescing_stats()
+        assert stats['executions'] == 1
+        assert stats['coalesced'] == 3
+
+    @responses.activate
+    def test_geocoding_is_coalesced_by_canonical_address(self):
+        def slow_response(request):
+            time.sleep(0.1)
+            return 200, {}, '{"status": "OK", "results": [{"geometry": {"location": {"lat": 35.6896, "lng": 139.6917}}}]}'
+
+        responses.add_callback(responses.GET, GEOCODING_API_URL, callback=slow_response)
+        addresses = iter(['東京都新宿区西新宿2-8-1', '東京都新宿区西新宿２丁目８−１', '東京都新宿区西新宿 2-8-1'])
+        lock = threading.Lock()
+
+        def call():
+            with lock:
+                address = next(addresses)
+            return geocode(address)
+
+        with pytest.MonkeyPatch.context() as mp:
+            mp.setenv('GOOGLE_API_KEY', 'test_key')
+            results = run_concurrently(call, 3)
+
+        assert results == [(35.6896, 139.6917)] * 3
+        assert len(responses.calls) == 1
+        assert get_geocode_coalescing_stats()['coalesced'] == 2
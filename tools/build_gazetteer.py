@@ -0,0 +1,144 @@
+"""
+国土交通省「位置参照情報」（大字・町丁目レベル）のCSVから、
+app/gazetteer.py が読み込む地名辞書（mmap用のバイナリファイル）を生成する。
+
+使い方:
+    python tools/build_gazetteer.py 13000-21.0b/13_2022.csv 14000-21.0b/14_2022.csv \
+        --output app/data/gazetteer.bin --version 21.0b
+"""
+import argparse
+import csv
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app.gazetteer import LEVEL_CHOME, LEVEL_CITY, LEVEL_TOWN, write_gazetteer  # noqa: E402
+from app.geocoding import canonicalize_address  # noqa: E402
+
+
+SOURCE = '国土交通省 位置参照情報（大字・町丁目レベル）'
+
+# 「西新宿二丁目」→「西新宿」
+_CHOME_PATTERN = re.compile(r'^(.+?)[0-9０-９一二三四五六七八九十]+丁目$')
+# 「西多摩郡瑞穂町」→「瑞穂町」
+_DISTRICT_PATTERN = re.compile(r'^.+?郡(.+[町村])$')
+# 「大字上尾村」→「上尾村」
+_AZA_PREFIX_PATTERN = re.compile(r'^(?:大字|字)')
+
+
+def read_rows(path: str, encoding: str):
+    """
+    位置参照情報のCSVから (都道府県名, 市区町村名, 大字町丁目名, 緯度, 経度) を読み出す。
+    """
+    with open(path, encoding=encoding, newline='') as f:
+        reader = csv.DictReader(f)
+        for row in reader:
+            try:
+                yield (
+                    row['都道府県名'],
+                    row['市区町村名'],
+                    row['大字町丁目名'],
+                    float(row['緯度']),
+                    float(row['経度'])
+                )
+            except (KeyError, ValueError):
+                continue
+
+
+def _city_names(city: str) -> list:
+    names = [city]
+    match = _DISTRICT_PATTERN.match(city)
+    if match:
+        names.append(match.group(1))
+    return names
+
+
+def _town_names(town: str) -> list:
+    names = [town]
+    stripped = _AZA_PREFIX_PATTERN.sub('', town)
+    if stripped != town and stripped:
+        names.append(stripped)
+    return names
+
+
+def build_entries(rows) -> tuple:
+    """
+    地名ごとの代表点を求め、表記のバリエーションをキーとする辞書を作る。
+    市区町村・大字の代表点は、配下の町丁目の代表点の平均とする。
+    都道府県名を省いたキーが複数の地名に当たる場合（「中央区」など）は、そのキーを登録しない。
+
+    Returns:
+        ({正規化済みの地名: (緯度, 経度, 階層)}, 除外した曖昧なキーの数) のタプル
+    """
+    points = {}  # (都道府県, 市区町村, 大字, 丁目) -> [緯度の合計, 経度の合計, 件数]
+
+    def add(place, lat, lon):
+        total = points.setdefault(place, [0.0, 0.0, 0])
+        total[0] += lat
+        total[1] += lon
+        total[2] += 1
+
+    for pref, city, town, lat, lon in rows:
+        add((pref, city, None, None), lat, lon)
+        match = _CHOME_PATTERN.match(town)
+        if match:
+            add((pref, city, match.group(1), town), lat, lon)
+            add((pref, city, match.group(1), None), lat, lon)
+        else:
+            add((pref, city, town, None), lat, lon)
+
+    candidates = {}  # キー -> {地名: (緯度, 経度, 階層)}
+    for place, (lat_sum, lon_sum, count) in points.items():
+        pref, city, town, chome = place
+        value = (lat_sum / count, lon_sum / count,
+                 LEVEL_CHOME if chome else LEVEL_TOWN if town else LEVEL_CITY)
+        for city_name in _city_names(city):
+            if chome:
+                suffixes = _town_names(chome)
+            elif town:
+                suffixes = _town_names(town)
+            else:
+                suffixes = ['']
+            for suffix in suffixes:
+                for prefix in (pref + city_name, city_name):
+                    key = canonicalize_address(prefix + suffix)
+                    candidates.setdefault(key, {})[place] = value
+
+    entries = {}
+    ambiguous = 0
+    for key, places in candidates.items():
+        if len(places) == 1:
+            entries[key] = next(iter(places.values()))
+        else:
+            ambiguous += 1
+    return entries, ambiguous
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description='Build the mmap-able gazetteer from 位置参照情報 CSV files.')
+    parser.add_argument('inputs', nargs='+', help='大字・町丁目レベル位置参照情報 CSV files')
+    parser.add_argument('--output', default=os.path.join('app', 'data', 'gazetteer.bin'))
+    parser.add_argument('--encoding', default='cp932', help='CSV encoding (the official files are Shift_JIS)')
+    parser.add_argument('--version', default='unknown', help='dataset version recorded in the header')
+    args = parser.parse_args(argv)
+
+    rows = (row for path in args.inputs for row in read_rows(path, args.encoding))
+    entries, ambiguous = build_entries(rows)
+
+    os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+    count = write_gazetteer(args.output, entries, {
+        'source': SOURCE,
+        'version': args.version,
+        'built_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'ambiguous_keys_dropped': ambiguous
+    })
+
+    print(f"Wrote {count} names to {args.output} ({ambiguous} ambiguous keys dropped)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,126 @@
+"""
+主要な都市圏のハザード情報を格子状に事前計算し、app/hazard_grid.py が読み込むスナップショットを生成する。
+各セルの代表点について HazardAPIClient.get_hazard_info を呼び出す（HAZARD_MAP_API_URL / HAZARD_MAP_API_KEY が必要）。
+
+使い方:
+    python tools/build_hazard_grid.py --output app/data/hazard_grid.bin --version 2024-06
+    python tools/build_hazard_grid.py --bbox sendai:38.20,140.80,38.33,140.95 --step 0.001 --version 2024-06
+
+取得に失敗したセルは未構築として記録し、実行時はライブのAPIにフォールバックする。
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app.cache import TTLCache  # noqa: E402
+from app.hazard_api_client import HAZARD_BATCH_MAX_WORKERS, HazardAPIClient  # noqa: E402
+from app.hazard_grid import HazardGridWriter, iter_cells, make_region  # noqa: E402
+
+
+# 既定の対象範囲（南, 西, 北, 東）。利用の多い都市圏の市街地をおおまかに覆う。
+DEFAULT_BBOXES = {
+    'tokyo23': (35.52, 139.56, 35.82, 139.92),
+    'osaka': (34.57, 135.40, 34.77, 135.57),
+    'nagoya': (35.05, 136.79, 35.26, 137.06),
+}
+
+# 既定の刻み幅（度）。約100m四方。
+DEFAULT_STEP = 0.001
+
+# 1回の一括取得で問い合わせるセル数
+CHUNK_SIZE = 500
+
+
+def parse_bbox(value: str) -> tuple:
+    """
+    「名前:南,西,北,東」の形式の範囲指定を解析する。
+    """
+    name, sep, coordinates = value.partition(':')
+    try:
+        south, west, north, east = (float(v) for v in coordinates.split(','))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected NAME:SOUTH,WEST,NORTH,EAST: {value}") from None
+    if not sep or not name:
+        raise argparse.ArgumentTypeError(f"expected NAME:SOUTH,WEST,NORTH,EAST: {value}")
+    return name, (south, west, north, east)
+
+
+def build_grid(client: HazardAPIClient, regions, datum: str = 'wgs84', precision=None,
+               chunk_size: int = CHUNK_SIZE, max_workers=None) -> HazardGridWriter:
+    """
+    すべてのセルの代表点についてハザード情報を取得し、スナップショットを組み立てる。
+
+    Args:
+        client: スナップショットを参照しないハザード情報APIクライアント
+        regions: 対象の領域（hazard_grid.Region）のリスト
+        datum: 座標系
+        precision: 検索精度（Noneの場合はAPIのデフォルト）
+        chunk_size: 1回の一括取得で問い合わせるセル数
+        max_workers: 同時リクエスト数の上限
+
+    Returns:
+        値を書き込んだ HazardGridWriter
+    """
+    writer = HazardGridWriter(regions)
+    cells = list(iter_cells(regions))
+    failed = 0
+
+    # get_hazard_info_batch は旧フォーマットに変換して返すため、APIレスポンスをそのまま受け取れるよう個別に呼ぶ
+    def fetch(cell):
+        _, _, _, lat, lon = cell
+        try:
+            return client.get_hazard_info(lat, lon, datum=datum, precision=precision)
+        except Exception as e:
+            print(f"Error fetching hazard info for ({lat}, {lon}): {e}")
+            return {'status': 'error', 'error_message': str(e)}
+
+    with ThreadPoolExecutor(max_workers=max_workers or HAZARD_BATCH_MAX_WORKERS) as executor:
+        for start in range(0, len(cells), chunk_size):
+            chunk = cells[start:start + chunk_size]
+            for (region_index, row, col, _, _), response in zip(chunk, executor.map(fetch, chunk)):
+                if response.get('status') == 'error':
+                    failed += 1
+                writer.set_cell(region_index, row, col, response)
+            print(f"{min(start + chunk_size, len(cells))}/{len(cells)} cells ({failed} failed)")
+    return writer
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description='Precompute hazard info on a grid over metro bounding boxes.')
+    parser.add_argument('--bbox', action='append', type=parse_bbox, metavar='NAME:S,W,N,E',
+                        help='bounding box to cover (default: Tokyo 23 wards, Osaka, Nagoya)')
+    parser.add_argument('--step', type=float, default=DEFAULT_STEP, help='grid step in degrees')
+    parser.add_argument('--output', default=os.path.join('app', 'data', 'hazard_grid.bin'))
+    parser.add_argument('--version', default='unknown', help='hazard dataset version recorded in the header')
+    parser.add_argument('--datum', default='wgs84')
+    parser.add_argument('--precision', choices=['low', 'high'], default=None)
+    parser.add_argument('--max-workers', type=int, default=None, help='concurrent API requests')
+    args = parser.parse_args(argv)
+
+    bboxes = dict(args.bbox) if args.bbox else DEFAULT_BBOXES
+    regions = [make_region(name, *bbox, step=args.step) for name, bbox in bboxes.items()]
+    print(f"Building {sum(r.rows * r.cols for r in regions)} cells over {', '.join(bboxes)} (step {args.step})")
+
+    # 既存のスナップショットやキャッシュの結果を使わず、すべてのセルをAPIから取得する
+    client = HazardAPIClient(cache=TTLCache(maxsize=0), use_snapshot=False)
+    writer = build_grid(client, regions, datum=args.datum, precision=args.precision, max_workers=args.max_workers)
+
+    os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+    header = writer.write(args.output, {
+        'version': args.version,
+        'built_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'datum': args.datum,
+        'precision': args.precision,
+        'step': args.step
+    })
+    cells = sum(r.rows * r.cols for r in regions)
+    print(f"Wrote {args.output}: {header['built_cells']}/{cells} cells, {len(header['values'])} distinct values")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
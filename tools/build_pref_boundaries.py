@@ -0,0 +1,116 @@
+"""
+国土数値情報「行政区域データ」(N03) のGeoJSONから、
+app/pref_resolver.py が読み込む都道府県境界データセットを生成する。
+
+使い方:
+    python tools/build_pref_boundaries.py N03-20240101.geojson \
+        --output app/data/prefectures.json.gz --version N03-2024
+    python tools/build_pref_boundaries.py N03-20240101_GML.zip --version N03-2024  # 配布zipをそのまま渡せる
+"""
+import argparse
+import gzip
+import json
+import os
+import sys
+import zipfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from shapely.geometry import shape  # noqa: E402
+from shapely.ops import unary_union  # noqa: E402
+
+from app.geocoding import PREF_CODES  # noqa: E402
+
+
+PREF_NAME_TO_CODE = {name: code for code, name in PREF_CODES.items()}
+
+
+def _feature_pref_code(properties: dict) -> str | None:
+    """
+    N03の属性から都道府県コードを取得する（行政区域コードの先頭2桁、なければ都道府県名）。
+    """
+    admin_code = properties.get('N03_007')
+    if admin_code:
+        return str(admin_code)[:2]
+    return PREF_NAME_TO_CODE.get(properties.get('N03_001'))
+
+
+def _encode_ring(coords, scale: int) -> list:
+    flat = []
+    for lon, lat in coords:
+        flat.append(round(lon * scale))
+        flat.append(round(lat * scale))
+    return flat
+
+
+def read_geojson(path: str) -> dict:
+    """
+    N03のGeoJSONを読み込む。配布されているzipの場合は、含まれるGeoJSONを読み込む。
+    """
+    if not zipfile.is_zipfile(path):
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    with zipfile.ZipFile(path) as archive:
+        names = [name for name in archive.namelist() if name.lower().endswith('.geojson')]
+        if not names:
+            raise ValueError(f"no GeoJSON file in {path}")
+        with archive.open(names[0]) as f:
+            return json.load(f)
+
+
+def build_dataset(geojson: dict, tolerance: float, margin: float, precision: int, version: str) -> dict:
+    """
+    都道府県ごとにポリゴンを統合し、境界から内側にmarginだけ縮小・簡略化したデータセットを作る。
+    """
+    shapes_by_pref = {}
+    for feature in geojson['features']:
+        code = _feature_pref_code(feature.get('properties') or {})
+        if code is None or feature.get('geometry') is None:
+            continue
+        shapes_by_pref.setdefault(code, []).append(shape(feature['geometry']))
+
+    scale = 10 ** precision
+    features = []
+    for code in sorted(shapes_by_pref):
+        merged = unary_union(shapes_by_pref[code])
+        core = merged.buffer(-margin).simplify(tolerance, preserve_topology=True)
+        parts = getattr(core, 'geoms', [core])
+        for part in parts:
+            if part.is_empty or part.area == 0:
+                continue
+            rings = [_encode_ring(part.exterior.coords, scale)]
+            rings.extend(_encode_ring(interior.coords, scale) for interior in part.interiors)
+            features.append({'code': code, 'rings': rings})
+
+    return {
+        'version': version,
+        'margin_degrees': margin,
+        'precision': precision,
+        'features': features
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description='Build the compact prefecture boundary dataset.')
+    parser.add_argument('input', help='N03 GeoJSON file, or the distributed zip containing it')
+    parser.add_argument('--output', default=os.path.join('app', 'data', 'prefectures.json.gz'))
+    parser.add_argument('--tolerance', type=float, default=0.001, help='simplification tolerance in degrees')
+    parser.add_argument('--margin', type=float, default=0.005, help='inner buffer from borders in degrees')
+    parser.add_argument('--precision', type=int, default=4, help='decimal places kept for coordinates')
+    parser.add_argument('--version', default='unknown', help='dataset version recorded in the header')
+    args = parser.parse_args(argv)
+
+    geojson = read_geojson(args.input)
+
+    dataset = build_dataset(geojson, args.tolerance, args.margin, args.precision, args.version)
+
+    os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+    with gzip.open(args.output, 'wt', encoding='utf-8') as f:
+        json.dump(dataset, f, separators=(',', ':'))
+
+    print(f"Wrote {len(dataset['features'])} polygons to {args.output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,144 @@
+"""
+Webhookのリクエストログから利用の多い住所・座標を集計し、コンテナ初期化時の事前読み込み用のマニフェストを生成する。
+ログは benchmarks/replay.py のコーパスと同じ形式（Lambdaのイベント・WebhookボディのJSONL）。
+
+使い方:
+    python tools/mine_hotspots.py webhook-log-2024-06.jsonl --top 200 --output app/data/prewarm.json
+    python tools/mine_hotspots.py webhook-log-*.jsonl --half-life-days 3 --no-resolve
+
+各地点のスコアは出現ごとに 0.5 ** (経過時間 / 半減期) を足したもの（新しい利用ほど重く数える）。
+住所は既定でジオコーディングして座標をマニフェストに記録する（初期化時にGoogleを呼ばずに済む）。
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from typing import Dict, Iterable, List, Optional
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app import geocoding, input_parser  # noqa: E402
+from app.cache import quantize_coordinates  # noqa: E402
+from app.hazard_api_client import HAZARD_CACHE_GRID_DEGREES  # noqa: E402
+from app.prewarm import DEFAULT_PREWARM_MANIFEST_PATH, MANIFEST_VERSION  # noqa: E402
+from benchmarks.replay import load_corpus  # noqa: E402
+
+
+DEFAULT_TOP = 200
+DEFAULT_HALF_LIFE_DAYS = 7.0
+
+
+def iter_messages(webhooks: Iterable[Dict]):
+    """
+    Webhookボディからテキストメッセージの (本文, タイムスタンプ(ミリ秒)) を取り出す。
+    """
+    for webhook in webhooks:
+        for event in webhook.get('events', []):
+            message = event.get('message') or {}
+            if event.get('type') == 'message' and message.get('type') == 'text' and message.get('text'):
+                yield message['text'], event.get('timestamp')
+
+
+def mine_hotspots(messages, half_life_days: float = DEFAULT_HALF_LIFE_DAYS, now_ms: Optional[float] = None) -> List[Dict]:
+    """
+    メッセージから地点ごとのスコアを集計し、スコアの高い順に返す。
+
+    Args:
+        messages: (本文, タイムスタンプ(ミリ秒)) の列
+        half_life_days: スコアの半減期（日）
+        now_ms: 基準時刻（ミリ秒）。Noneの場合はログ内の最新のタイムスタンプ。
+
+    Returns:
+        {'address', 'lat', 'lon', 'score', 'count'} のリスト。座標の入力は address がNone。
+    """
+    parsed = []
+    for text, timestamp in messages:
+        location, _ = input_parser.extract_hazard_types(text)
+        input_type, value = input_parser.parse_input_type(location)
+        if input_type == 'latlon':
+            coordinates = input_parser.parse_latlon(value)
+            if coordinates is None:
+                continue
+            # ハザード情報キャッシュと同じグリッドのセルごとに集計する
+            key = ('latlon',) + quantize_coordinates(*coordinates, HAZARD_CACHE_GRID_DEGREES)
+            parsed.append((key, None, coordinates, timestamp))
+        elif input_type == 'address' and value.strip():
+            parsed.append((('address', geocoding.canonicalize_address(value)), value, None, timestamp))
+
+    timestamps = [timestamp for *_, timestamp in parsed if isinstance(timestamp, (int, float))]
+    if now_ms is None:
+        now_ms = max(timestamps) if timestamps else 0
+    half_life_ms = half_life_days * 24 * 60 * 60 * 1000
+
+    spots: Dict[tuple, Dict] = {}
+    for key, address, coordinates, timestamp in parsed:
+        age = max(0.0, now_ms - timestamp) if isinstance(timestamp, (int, float)) else half_life_ms
+        spot = spots.setdefault(key, {
+            'address': address,
+            'lat': coordinates[0] if coordinates else None,
+            'lon': coordinates[1] if coordinates else None,
+            'score': 0.0,
+            'count': 0
+        })
+        spot['score'] += 0.5 ** (age / half_life_ms) if half_life_ms > 0 else 1.0
+        spot['count'] += 1
+
+    return sorted(spots.values(), key=lambda spot: (-spot['score'], -spot['count']))
+
+
+def build_manifest(spots: List[Dict], top: int = DEFAULT_TOP, resolve: bool = True) -> Dict:
+    """
+    上位の地点から事前読み込みのマニフェストを作る。
+
+    Args:
+        spots: mine_hotspots の結果
+        top: マニフェストに含める地点数
+        resolve: 住所をジオコーディングして座標を記録するかどうか
+
+    Returns:
+        マニフェストの辞書（entries は [住所, 緯度, 経度, スコア] のリスト）
+    """
+    entries = []
+    unresolved = 0
+    for spot in spots[:top]:
+        lat, lon = spot['lat'], spot['lon']
+        if spot['address'] and resolve:
+            coordinates = geocoding.geocode(spot['address'])
+            if coordinates is None:
+                unresolved += 1
+            else:
+                lat, lon = coordinates
+        entries.append([spot['address'], lat, lon, round(spot['score'], 3)])
+    return {
+        'version': MANIFEST_VERSION,
+        'generated_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'unresolved_addresses': unresolved,
+        'entries': entries
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description='Mine hot locations from webhook logs into a prewarm manifest.')
+    parser.add_argument('logs', nargs='+', help='JSON / JSONL webhook logs')
+    parser.add_argument('--top', type=int, default=DEFAULT_TOP, help='number of locations to keep')
+    parser.add_argument('--half-life-days', type=float, default=DEFAULT_HALF_LIFE_DAYS, help='recency half-life')
+    parser.add_argument('--no-resolve', action='store_true', help='do not geocode addresses at build time')
+    parser.add_argument('--output', default=DEFAULT_PREWARM_MANIFEST_PATH)
+    args = parser.parse_args(argv)
+
+    webhooks, skipped = load_corpus(args.logs)
+    spots = mine_hotspots(iter_messages(webhooks), args.half_life_days)
+    manifest = build_manifest(spots, args.top, resolve=not args.no_resolve)
+
+    os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, separators=(',', ':'))
+
+    print(f"Wrote {len(manifest['entries'])} of {len(spots)} locations to {args.output} "
+          f"({skipped} log lines skipped, {manifest['unresolved_addresses']} addresses unresolved)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())